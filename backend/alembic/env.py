@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DATABASE_URL, engine  # noqa: E402
+from models import Base  # noqa: E402
+
+config = context.config
+
+# init_db() roda as migrações dentro do app: não reconfigura o logging do processo
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Serializa migrações de vários workers/containers subindo ao mesmo tempo (Postgres)
+MIGRATION_LOCK_ID = 7_340_012
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _acquire_lock(connection) -> None:
+    """Lock de sessão (não de transação), mantido entre as transações das migrações.
+
+    Tenta em loop em vez de esperar em pg_advisory_lock: a espera manteria um
+    snapshot aberto, e o CREATE INDEX CONCURRENTLY de quem tem o lock esperaria
+    por ele (deadlock).
+    """
+    while not connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}).scalar():
+        connection.commit()
+        time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+    connection.commit()
+
+
+def _run(connection) -> None:
+    # Uma transação por migração: as que criam índices com CONCURRENTLY fazem commit no meio
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        transaction_per_migration=True,
+    )
+    postgres = connection.dialect.name == "postgresql"
+    if postgres:
+        _acquire_lock(connection)
+    try:
+        with context.begin_transaction():
+            context.run_migrations()
+    finally:
+        if postgres:
+            connection.rollback()
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,84 @@
+"""deposits.request_number indexado (único) com backfill a partir de metadata_json
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+deposits = sa.table(
+    "deposits",
+    sa.column("id", sa.Integer),
+    sa.column("metadata_json", sa.Text),
+    sa.column("request_number", sa.String),
+)
+
+
+def _backfill(bind) -> None:
+    """Copia metadata_json["request_number"] para a coluna (em lotes, por id)"""
+    seen = set(bind.execute(
+        sa.select(deposits.c.request_number).where(deposits.c.request_number.isnot(None))
+    ).scalars())
+    update = (
+        sa.update(deposits)
+        .where(deposits.c.id == sa.bindparam("_id"))
+        .values(request_number=sa.bindparam("_request_number"))
+    )
+    last_id = 0
+    duplicates = 0
+    while True:
+        rows = bind.execute(
+            sa.select(deposits.c.id, deposits.c.metadata_json)
+            .where(deposits.c.id > last_id, deposits.c.request_number.is_(None), deposits.c.metadata_json.isnot(None))
+            .order_by(deposits.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = []
+        for row in rows:
+            try:
+                request_number = (json.loads(row.metadata_json) or {}).get("request_number")
+            except (ValueError, AttributeError):
+                continue
+            if not request_number:
+                continue
+            if request_number in seen:
+                # Números antigos podiam repetir (mesmo usuário, mesmo segundo): mantém o primeiro
+                duplicates += 1
+                continue
+            seen.add(request_number)
+            values.append({"_id": row.id, "_request_number": request_number})
+        if values:
+            bind.execute(update, values)
+    if duplicates:
+        print(f"deposits.request_number: {duplicates} depósito(s) com request_number repetido ficaram sem a coluna")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "deposits" not in sa.inspect(bind).get_table_names():
+        # Banco novo: init_db/create_all já cria a tabela com a coluna e o índice
+        return
+    if "request_number" not in {c["name"] for c in sa.inspect(bind).get_columns("deposits")}:
+        op.add_column("deposits", sa.Column("request_number", sa.String(255), nullable=True))
+    _backfill(bind)
+    if "ix_deposits_request_number" not in {i["name"] for i in sa.inspect(bind).get_indexes("deposits")}:
+        op.create_index("ix_deposits_request_number", "deposits", ["request_number"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_deposits_request_number", table_name="deposits")
+    with op.batch_alter_table("deposits") as batch:
+        batch.drop_column("request_number")
@@ -0,0 +1,43 @@
+"""webhook_inbox: webhooks recebidos para processamento em background
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+webhook_status = sa.Enum("PENDING", "PROCESSING", "DONE", "DEAD", name="webhookstatus")
+
+
+def upgrade() -> None:
+    if "webhook_inbox" in sa.inspect(op.get_bind()).get_table_names():
+        # Já criada por init_db/create_all
+        return
+    op.create_table(
+        "webhook_inbox",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("source", sa.String(50), nullable=False),
+        sa.Column("dedupe_key", sa.String(255), nullable=False),
+        sa.Column("payload", sa.Text, nullable=False),
+        sa.Column("status", webhook_status, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime, nullable=False),
+        sa.Column("locked_at", sa.DateTime),
+        sa.Column("last_error", sa.Text),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("processed_at", sa.DateTime),
+    )
+    op.create_index("ix_webhook_inbox_id", "webhook_inbox", ["id"])
+    op.create_index("ix_webhook_inbox_dedupe_key", "webhook_inbox", ["dedupe_key"], unique=True)
+    op.create_index("ix_webhook_inbox_claim", "webhook_inbox", ["status", "next_attempt_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("webhook_inbox")
+    webhook_status.drop(op.get_bind(), checkfirst=True)
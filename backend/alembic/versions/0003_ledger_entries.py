@@ -0,0 +1,54 @@
+"""ledger_entries: lançamentos da carteira, com saldo de abertura dos usuários existentes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ledger_entry_type = sa.Enum(
+    "OPENING", "DEPOSIT", "DEPOSIT_REVERSAL", "WITHDRAWAL", "WITHDRAWAL_REFUND", "ADJUSTMENT",
+    name="ledgerentrytype",
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "ledger_entries" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "ledger_entries",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("type", ledger_entry_type, nullable=False),
+            sa.Column("amount", sa.Float, nullable=False),
+            sa.Column("balance_after", sa.Float, nullable=False),
+            sa.Column("reference_type", sa.String(50)),
+            sa.Column("reference_id", sa.Integer),
+            sa.Column("idempotency_key", sa.String(255), unique=True),
+            sa.Column("description", sa.String(255)),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+        op.create_index("ix_ledger_entries_id", "ledger_entries", ["id"])
+        op.create_index("ix_ledger_entries_user_id_id", "ledger_entries", ["user_id", "id"])
+
+    # Saldo de abertura: a soma dos lançamentos de cada usuário passa a bater com users.balance
+    bind.execute(sa.text("""
+        INSERT INTO ledger_entries (user_id, type, amount, balance_after, reference_type, description, created_at)
+        SELECT u.id, 'OPENING', u.balance, u.balance, 'migration', 'Saldo existente na criação do ledger', :now
+        FROM users u
+        WHERE u.balance <> 0
+          AND NOT EXISTS (SELECT 1 FROM ledger_entries l WHERE l.user_id = u.id)
+    """), {"now": datetime.utcnow()})
+
+
+def downgrade() -> None:
+    op.drop_table("ledger_entries")
+    ledger_entry_type.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,42 @@
+"""daily_rollups: agregados diários de depósitos, saques, apostas e FTDs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import rollups
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "daily_rollups" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "daily_rollups",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("day", sa.Date, nullable=False),
+            sa.Column("metric", sa.String(20), nullable=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("gateway_id", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("provider", sa.String(100), nullable=False, server_default=""),
+            sa.Column("count", sa.Integer, nullable=False, server_default="0"),
+            sa.Column("amount", sa.Float, nullable=False, server_default="0"),
+            sa.Column("win_amount", sa.Float, nullable=False, server_default="0"),
+            sa.UniqueConstraint("day", "metric", "status", "gateway_id", "provider", name="uq_daily_rollups_bucket"),
+        )
+        op.create_index("ix_daily_rollups_id", "daily_rollups", ["id"])
+
+    # Backfill a partir das tabelas de transações (a tabela pode ter sido criada vazia pelo create_all)
+    if not bind.execute(sa.text("SELECT 1 FROM daily_rollups LIMIT 1")).first():
+        rollups.rebuild(bind)
+
+
+def downgrade() -> None:
+    op.drop_table("daily_rollups")
@@ -0,0 +1,89 @@
+"""índices compostos para as listagens do admin, relatórios e mídias
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+No Postgres os índices são criados com CREATE INDEX CONCURRENTLY (fora de
+transação), sem bloquear escritas nas tabelas durante o build.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_deposits_created_at", "deposits", ["created_at"]),
+    ("ix_deposits_status_created_at", "deposits", ["status", "created_at"]),
+    ("ix_deposits_user_id_created_at", "deposits", ["user_id", "created_at"]),
+    ("ix_withdrawals_created_at", "withdrawals", ["created_at"]),
+    ("ix_withdrawals_status_created_at", "withdrawals", ["status", "created_at"]),
+    ("ix_withdrawals_user_id_created_at", "withdrawals", ["user_id", "created_at"]),
+    ("ix_ftds_created_at", "ftds", ["created_at"]),
+    ("ix_ftds_user_id_created_at", "ftds", ["user_id", "created_at"]),
+    ("ix_bets_created_at", "bets", ["created_at"]),
+    ("ix_bets_status_created_at", "bets", ["status", "created_at"]),
+    ("ix_bets_user_id_created_at", "bets", ["user_id", "created_at"]),
+    ("ix_notifications_user_id_created_at", "notifications", ["user_id", "created_at"]),
+    ("ix_notifications_global_created_at", "notifications", ["created_at"]),
+    ("ix_media_assets_type_is_active_position", "media_assets", ["type", "is_active", "position"]),
+)
+
+
+# Índices parciais: nome -> condição
+PARTIAL = {
+    "ix_notifications_global_created_at": sa.text("user_id IS NULL"),
+}
+
+
+def _where(name: str) -> dict:
+    if name not in PARTIAL:
+        return {}
+    return {"postgresql_where": PARTIAL[name], "sqlite_where": PARTIAL[name]}
+
+
+def _existing(bind) -> set:
+    inspector = sa.inspect(bind)
+    return {index["name"] for table in {t for _, t, _ in INDEXES} for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        existing = _existing(bind)
+        for name, table, columns in INDEXES:
+            if name not in existing:
+                op.create_index(name, table, columns, **_where(name))
+        return
+
+    names = [name for name, _, _ in INDEXES]
+    with op.get_context().autocommit_block():
+        # Builds longos não podem cair no statement_timeout do pool
+        op.execute("SET statement_timeout = 0")
+        # Um CONCURRENTLY interrompido deixa o índice inválido (e IF NOT EXISTS o ignoraria)
+        invalid = bind.execute(sa.text("""
+            SELECT c.relname FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+        """), {"names": names}).scalars().all()
+        for name in invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **_where(name))
+        op.execute("RESET statement_timeout")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        existing = _existing(bind)
+        for name, table, _ in INDEXES:
+            if name in existing:
+                op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,104 @@
+"""índices (…, created_at, id) para a paginação por cursor das listagens do admin
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+As listagens passam a ordenar por (created_at DESC, id DESC) e a paginar com
+(created_at, id) < cursor. Cada índice de created_at da 0005 ganha id como
+última coluna, para o banco ler a página direto do índice, sem ordenar os
+empates; o antigo é removido depois que o novo fica pronto. No Postgres tudo
+roda com CONCURRENTLY, sem bloquear escritas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# (índice novo, índice da 0005 que ele substitui ou None, tabela, colunas)
+INDEXES = (
+    ("ix_users_created_at_id", None, "users", ["created_at", "id"]),
+    ("ix_deposits_created_at_id", "ix_deposits_created_at", "deposits", ["created_at", "id"]),
+    ("ix_deposits_status_created_at_id", "ix_deposits_status_created_at", "deposits",
+     ["status", "created_at", "id"]),
+    ("ix_deposits_user_id_created_at_id", "ix_deposits_user_id_created_at", "deposits",
+     ["user_id", "created_at", "id"]),
+    ("ix_withdrawals_created_at_id", "ix_withdrawals_created_at", "withdrawals", ["created_at", "id"]),
+    ("ix_withdrawals_status_created_at_id", "ix_withdrawals_status_created_at", "withdrawals",
+     ["status", "created_at", "id"]),
+    ("ix_withdrawals_user_id_created_at_id", "ix_withdrawals_user_id_created_at", "withdrawals",
+     ["user_id", "created_at", "id"]),
+    ("ix_ftds_created_at_id", "ix_ftds_created_at", "ftds", ["created_at", "id"]),
+    ("ix_ftds_user_id_created_at_id", "ix_ftds_user_id_created_at", "ftds", ["user_id", "created_at", "id"]),
+    ("ix_bets_created_at_id", "ix_bets_created_at", "bets", ["created_at", "id"]),
+    ("ix_bets_status_created_at_id", "ix_bets_status_created_at", "bets", ["status", "created_at", "id"]),
+    ("ix_bets_user_id_created_at_id", "ix_bets_user_id_created_at", "bets", ["user_id", "created_at", "id"]),
+    ("ix_notifications_user_id_created_at_id", "ix_notifications_user_id_created_at", "notifications",
+     ["user_id", "created_at", "id"]),
+    ("ix_notifications_global_created_at_id", "ix_notifications_global_created_at", "notifications",
+     ["created_at", "id"]),
+)
+
+# Índices parciais: nome -> condição
+PARTIAL = {
+    "ix_notifications_global_created_at_id": sa.text("user_id IS NULL"),
+    "ix_notifications_global_created_at": sa.text("user_id IS NULL"),
+}
+
+
+def _where(name: str) -> dict:
+    if name not in PARTIAL:
+        return {}
+    return {"postgresql_where": PARTIAL[name], "sqlite_where": PARTIAL[name]}
+
+
+def _existing(bind) -> set:
+    inspector = sa.inspect(bind)
+    return {index["name"] for table in {t for _, _, t, _ in INDEXES} for index in inspector.get_indexes(table)}
+
+
+def _swap(create: list, drop: list) -> None:
+    """Cria os índices de create [(nome, tabela, colunas)] e depois remove os de drop [(nome, tabela)]"""
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        existing = _existing(bind)
+        for name, table, columns in create:
+            if name not in existing:
+                op.create_index(name, table, columns, **_where(name))
+        for name, table in drop:
+            if name in existing:
+                op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        # Builds longos não podem cair no statement_timeout do pool
+        op.execute("SET statement_timeout = 0")
+        # Um CONCURRENTLY interrompido deixa o índice inválido (e IF NOT EXISTS o ignoraria)
+        invalid = bind.execute(sa.text("""
+            SELECT c.relname FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+        """), {"names": [name for name, _, _ in create]}).scalars().all()
+        for name in invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+        for name, table, columns in create:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **_where(name))
+        for name, table in drop:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.execute("RESET statement_timeout")
+
+
+def upgrade() -> None:
+    _swap(
+        [(name, table, columns) for name, _, table, columns in INDEXES],
+        [(old, table) for _, old, table, _ in INDEXES if old],
+    )
+
+
+def downgrade() -> None:
+    _swap(
+        [(old, table, columns[:-1]) for _, old, table, columns in INDEXES if old],
+        [(name, table) for name, _, table, _ in INDEXES],
+    )
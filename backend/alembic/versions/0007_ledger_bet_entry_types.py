@@ -0,0 +1,31 @@
+"""ledgerentrytype: lançamentos de aposta da carteira seamless (BET, BET_WIN, BET_ROLLBACK)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+No SQLite o enum é um VARCHAR sem CHECK: não há o que migrar. No Postgres o
+ADD VALUE roda fora de transação (o valor novo não pode ser usado na mesma
+transação em que foi criado).
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+VALUES = ("BET", "BET_WIN", "BET_ROLLBACK")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for value in VALUES:
+            op.execute(f"ALTER TYPE ledgerentrytype ADD VALUE IF NOT EXISTS '{value}'")
+
+
+def downgrade() -> None:
+    # O Postgres não remove valores de um enum; os lançamentos existentes continuam válidos
+    pass
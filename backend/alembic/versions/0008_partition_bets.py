@@ -0,0 +1,131 @@
+"""bets particionada por mês (RANGE created_at) no Postgres
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+Sem copiar dados: a tabela atual vira a partição bets_legacy, cobrindo tudo até
+o fim do mês seguinte (folga para a virada do mês durante o deploy). Antes da
+troca, fora de transação, são criados CONCURRENTLY os índices que a partição
+precisa ter iguais aos da tabela-mãe, e um CHECK do intervalo é validado sem
+bloquear escritas; assim o ATTACH não constrói índice nem varre a tabela. A
+troca em si (renomear, criar a tabela-mãe, ATTACH) segura o lock exclusivo de
+bets por poucos milissegundos. As partições mensais seguintes são criadas pelo
+partitions.ensure_partitions (lifespan / scripts/bets_partitions.py).
+
+A chave primária passa a ser (id, created_at) e transaction_id deixa de ter um
+índice único global: é único em cada partição. No SQLite nada muda.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+# Índices da tabela-mãe (os mesmos nomes do models.Bet), menos a unicidade de transaction_id
+INDEXES = (
+    ("ix_bets_id", ["id"]),
+    ("ix_bets_transaction_id", ["transaction_id"]),
+    ("ix_bets_external_id", ["external_id"]),
+    ("ix_bets_created_at_id", ["created_at", "id"]),
+    ("ix_bets_status_created_at_id", ["status", "created_at", "id"]),
+    ("ix_bets_user_id_created_at_id", ["user_id", "created_at", "id"]),
+)
+# Índices da bets atual que não batem com os da tabela-mãe e são criados antes da troca
+LEGACY_PKEY = "bets_legacy_pkey"
+LEGACY_TRANSACTION_ID = "bets_legacy_transaction_id_idx"
+
+
+def _legacy_name(name: str) -> str:
+    return name.replace("ix_bets_", "bets_legacy_", 1)
+
+
+def _partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('bets'))"
+    )).scalar()
+
+
+def _month_after_next(now: datetime) -> datetime:
+    index = now.year * 12 + now.month + 1
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or _partitioned(bind):
+        return
+    bound = f"'{_month_after_next(datetime.utcnow()).isoformat(sep=' ')}'"
+
+    with op.get_context().autocommit_block():
+        op.execute("SET statement_timeout = 0")
+        names = [LEGACY_PKEY, LEGACY_TRANSACTION_ID] + [name for name, _ in INDEXES]
+        invalid = bind.execute(sa.text("""
+            SELECT c.relname FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+        """), {"names": names}).scalars().all()
+        for name in invalid:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {LEGACY_PKEY} ON bets (id, created_at)")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {LEGACY_TRANSACTION_ID} ON bets (transaction_id)")
+        for name, columns in INDEXES:
+            if name != "ix_bets_transaction_id":
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON bets ({', '.join(columns)})")
+        op.execute("ALTER TABLE bets DROP CONSTRAINT IF EXISTS bets_legacy_range")
+        op.execute(f"ALTER TABLE bets ADD CONSTRAINT bets_legacy_range CHECK (created_at < {bound}) NOT VALID")
+        op.execute("ALTER TABLE bets VALIDATE CONSTRAINT bets_legacy_range")
+        op.execute("RESET statement_timeout")
+
+    # Troca: tudo abaixo só mexe em catálogo
+    op.execute("SET LOCAL lock_timeout = '30s'")
+    op.execute("LOCK TABLE bets IN ACCESS EXCLUSIVE MODE")
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('bets', 'id')")).scalar()
+    pkey = bind.execute(sa.text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = 'bets'::regclass AND contype = 'p'"
+    )).scalar()
+    op.execute("ALTER TABLE bets RENAME TO bets_legacy")
+    op.execute(f'ALTER TABLE bets_legacy DROP CONSTRAINT "{pkey}", '
+               f"ADD CONSTRAINT {LEGACY_PKEY} PRIMARY KEY USING INDEX {LEGACY_PKEY}")
+    op.execute("ALTER INDEX IF EXISTS ix_bets_transaction_id RENAME TO bets_legacy_transaction_id_key")
+    for name, _ in INDEXES:
+        if name != "ix_bets_transaction_id":
+            op.execute(f"ALTER INDEX {name} RENAME TO {_legacy_name(name)}")
+
+    op.execute("CREATE TABLE bets (LIKE bets_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+    op.execute("ALTER TABLE bets ADD CONSTRAINT bets_pkey PRIMARY KEY (id, created_at)")
+    op.execute("ALTER TABLE bets ADD CONSTRAINT bets_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    for name, columns in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON bets ({', '.join(columns)})")
+    op.execute(f"ALTER TABLE bets ATTACH PARTITION bets_legacy FOR VALUES FROM (MINVALUE) TO ({bound})")
+    op.execute("ALTER TABLE bets_legacy DROP CONSTRAINT bets_legacy_range")
+    op.execute("CREATE TABLE bets_default PARTITION OF bets DEFAULT")
+    op.execute("ALTER TABLE bets_default ADD CONSTRAINT bets_default_transaction_id_key UNIQUE (transaction_id)")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY bets.id")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _partitioned(bind):
+        return
+    # Copia as partições ativas de volta para uma tabela comum (as arquivadas ficam em bets_archive)
+    op.execute("SET LOCAL statement_timeout = 0")
+    op.execute("LOCK TABLE bets IN EXCLUSIVE MODE")
+    sequence = bind.execute(sa.text("SELECT pg_get_serial_sequence('bets', 'id')")).scalar()
+    op.execute("CREATE TABLE bets_unpartitioned (LIKE bets INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO bets_unpartitioned SELECT * FROM bets")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute("DROP TABLE bets")
+    op.execute("ALTER TABLE bets_unpartitioned RENAME TO bets")
+    op.execute("ALTER TABLE bets ADD CONSTRAINT bets_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE bets ADD CONSTRAINT bets_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    for name, columns in INDEXES:
+        unique = "UNIQUE " if name == "ix_bets_transaction_id" else ""
+        op.execute(f"CREATE {unique}INDEX {name} ON bets ({', '.join(columns)})")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY bets.id")
@@ -0,0 +1,164 @@
+"""gateway_payloads: payloads brutos do gateway fora de deposits/withdrawals
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+Move suitpay_response e webhook_data de metadata_json para gateway_payloads
+(comprimidos, ver gateway_payloads.py) e descarta pix_qr_code, que já está na
+resposta da SuitPay. O espaço liberado nas tabelas é reaproveitado pelas novas
+linhas; para devolvê-lo ao disco no Postgres, VACUUM FULL (com lock) fora do
+horário de pico.
+"""
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+import gateway_payloads
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+# Chaves de metadata_json que saem da linha
+BULKY_KEYS = (gateway_payloads.SUITPAY_RESPONSE, gateway_payloads.WEBHOOK_DATA, "pix_qr_code")
+
+payloads = sa.table(
+    "gateway_payloads",
+    sa.column("reference_type", sa.String),
+    sa.column("reference_id", sa.Integer),
+    sa.column("kind", sa.String),
+    sa.column("compressed", sa.Boolean),
+    sa.column("data", sa.LargeBinary),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def _received_at(metadata: dict, default: datetime) -> datetime:
+    try:
+        return datetime.fromisoformat(metadata["webhook_received_at"])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def _payload(reference_type: str, reference_id: int, kind: str, payload, created_at: datetime) -> dict:
+    data, compressed = gateway_payloads.encode(payload)
+    return {
+        "reference_type": reference_type, "reference_id": reference_id, "kind": kind,
+        "compressed": compressed, "data": data, "created_at": created_at,
+    }
+
+
+def _backfill(bind, table_name: str, reference_type: str) -> None:
+    """Move as chaves volumosas de metadata_json de table_name (em lotes, por id)"""
+    table = sa.table(
+        table_name, sa.column("id", sa.Integer), sa.column("metadata_json", sa.Text), sa.column("created_at", sa.DateTime)
+    )
+    update = (
+        sa.update(table)
+        .where(table.c.id == sa.bindparam("_id"))
+        .values(metadata_json=sa.bindparam("_metadata_json"))
+    )
+    bulky = sa.or_(*(table.c.metadata_json.like(f'%"{key}"%') for key in BULKY_KEYS))
+    last_id = 0
+    moved = 0
+    while True:
+        rows = bind.execute(
+            sa.select(table.c.id, table.c.metadata_json, table.c.created_at)
+            .where(table.c.id > last_id, bulky)
+            .order_by(table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values, inserts = [], []
+        for row in rows:
+            try:
+                metadata = json.loads(row.metadata_json)
+            except ValueError:
+                continue
+            if not isinstance(metadata, dict):
+                continue
+            response = metadata.pop(gateway_payloads.SUITPAY_RESPONSE, None)
+            webhook = metadata.pop(gateway_payloads.WEBHOOK_DATA, None)
+            metadata.pop("pix_qr_code", None)
+            if response is not None:
+                inserts.append(_payload(
+                    reference_type, row.id, gateway_payloads.SUITPAY_RESPONSE, response, row.created_at
+                ))
+            if webhook is not None:
+                inserts.append(_payload(
+                    reference_type, row.id, gateway_payloads.WEBHOOK_DATA, webhook,
+                    _received_at(metadata, row.created_at)
+                ))
+            values.append({"_id": row.id, "_metadata_json": json.dumps(metadata)})
+        if inserts:
+            bind.execute(payloads.insert(), inserts)
+        if values:
+            bind.execute(update, values)
+        moved += len(values)
+    if moved:
+        print(f"{table_name}: payloads do gateway de {moved} linha(s) movidos para gateway_payloads")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "gateway_payloads" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "gateway_payloads",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("reference_type", sa.String(50), nullable=False),
+            sa.Column("reference_id", sa.Integer, nullable=False),
+            sa.Column("kind", sa.String(50), nullable=False),
+            sa.Column("compressed", sa.Boolean, nullable=False),
+            sa.Column("data", sa.LargeBinary, nullable=False),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+        op.create_index("ix_gateway_payloads_id", "gateway_payloads", ["id"])
+        op.create_index("ix_gateway_payloads_reference", "gateway_payloads", ["reference_type", "reference_id", "id"])
+
+    _backfill(bind, "deposits", "deposit")
+    _backfill(bind, "withdrawals", "withdrawal")
+
+
+def _restore(bind, table_name: str, reference_type: str) -> None:
+    """Devolve a resposta e o último webhook de cada linha para metadata_json"""
+    table = sa.table(table_name, sa.column("id", sa.Integer), sa.column("metadata_json", sa.Text))
+    restored = {}
+    rows = bind.execute(
+        sa.select(payloads.c.reference_id, payloads.c.kind, payloads.c.data, payloads.c.compressed)
+        .where(payloads.c.reference_type == reference_type)
+        .order_by(sa.text("id"))
+    )
+    for reference_id, kind, data, compressed in rows:
+        restored.setdefault(reference_id, {})[kind] = gateway_payloads.decode(data, compressed)
+    ids = list(restored)
+    for start in range(0, len(ids), BATCH_SIZE):
+        values = []
+        for id, metadata_json in bind.execute(
+            sa.select(table.c.id, table.c.metadata_json).where(table.c.id.in_(ids[start:start + BATCH_SIZE]))
+        ):
+            try:
+                metadata = json.loads(metadata_json) if metadata_json else {}
+            except ValueError:
+                continue
+            if isinstance(metadata, dict):
+                values.append({"_id": id, "_metadata_json": json.dumps({**metadata, **restored[id]})})
+        if values:
+            bind.execute(
+                sa.update(table).where(table.c.id == sa.bindparam("_id"))
+                .values(metadata_json=sa.bindparam("_metadata_json")),
+                values,
+            )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    _restore(bind, "deposits", "deposit")
+    _restore(bind, "withdrawals", "withdrawal")
+    op.drop_table("gateway_payloads")
@@ -0,0 +1,54 @@
+"""bet_transactions: unicidade global de bets.transaction_id
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+Com bets particionada (0008) transaction_id só é único dentro de cada partição,
+então o ON CONFLICT do buffer de apostas não pegava uma re-tentativa que caísse
+em outra partição. bet_transactions guarda o transaction_id de cada aposta
+gravada com chave primária global; o buffer reserva ali antes de inserir em
+bets. O backfill copia os transaction_id das apostas existentes (partições
+ativas; as arquivadas ficam de fora) em lotes, por id.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "bet_transactions" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "bet_transactions",
+            sa.Column("transaction_id", sa.String(255), primary_key=True),
+            sa.Column("created_at", sa.DateTime, nullable=False),
+        )
+
+    last_id = bind.execute(sa.text("SELECT min(id) - 1 FROM bets")).scalar()
+    max_id = bind.execute(sa.text("SELECT max(id) FROM bets")).scalar()
+    if last_id is None:
+        return
+    copied = 0
+    while last_id < max_id:
+        # NOT EXISTS: idempotente e sem conflito com as linhas que o app já reservou
+        copied += bind.execute(sa.text("""
+            INSERT INTO bet_transactions (transaction_id, created_at)
+            SELECT b.transaction_id, min(b.created_at) FROM bets b
+            WHERE b.id > :lo AND b.id <= :hi AND b.transaction_id IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM bet_transactions t WHERE t.transaction_id = b.transaction_id)
+            GROUP BY b.transaction_id
+        """), {"lo": last_id, "hi": last_id + BATCH_SIZE}).rowcount
+        last_id += BATCH_SIZE
+    if copied:
+        print(f"bet_transactions: {copied} transaction_id de apostas existentes copiados")
+
+
+def downgrade() -> None:
+    op.drop_table("bet_transactions")
@@ -1,8 +1,12 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User, UserRole
 import os
 
@@ -10,7 +14,16 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Custo do bcrypt; hashes com outro custo são refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# O bcrypt roda em um executor dedicado (fora do event loop) com tamanho e fila limitados:
+# uma rajada de logins espera (ou recebe 503) em vez de travar webhooks e demais rotas.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -21,6 +34,31 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_hasher(fn, *args):
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"},
+        )
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash fora do event loop"""
+    return await _run_hasher(pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verifica fora do event loop; retorna o novo hash se o atual usa custo/esquema desatualizado"""
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,38 +70,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     # Tenta encontrar por username primeiro
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).where(User.username == username))
     # Se não encontrou, tenta por email
     if not user:
-        user = db.query(User).filter(User.email == username).first()
+        user = await db.scalar(select(User).where(User.email == username))
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = await verify_and_update_password(password, user.password_hash)
+    if not valid:
         return None
+    if new_hash:
+        # Rehash transparente quando BCRYPT_ROUNDS mudou
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.username == username))
 
 
-def create_admin_user(db: Session):
+async def create_admin_user(db: AsyncSession):
     """Create default admin user if doesn't exist"""
-    admin = db.query(User).filter(User.username == "admin").first()
+    admin = await db.scalar(select(User).where(User.username == "admin"))
     if not admin:
         admin = User(
             username="admin",
             email="admin@fortunevegas.com",
-            password_hash=get_password_hash("admin123"),
+            password_hash=await hash_password("admin123"),
             role=UserRole.ADMIN,
             is_active=True,
             is_verified=True,
             balance=0.0
         )
         db.add(admin)
-        db.commit()
-        db.refresh(admin)
+        await db.commit()
+        await db.refresh(admin)
         return admin
     return admin
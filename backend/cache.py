@@ -0,0 +1,202 @@
+"""
+Utilitários de cache em processo.
+
+- TTLCache: dicionário LRU limitado com expiração por entrada.
+- SingleFlight: chamadas concorrentes com a mesma chave compartilham uma única
+  execução (e seu resultado).
+- CoalescingCache: combina os dois; quando uma entrada expira, apenas uma
+  tarefa recarrega enquanto as demais aguardam o mesmo resultado. Uma carga
+  iniciada antes de invalidate() não grava o valor (que pode estar velho), e
+  quem chega depois do invalidate() não a aguarda: começa uma carga nova.
+- StaleWhileRevalidateCache: como o CoalescingCache, mas por um tempo depois de
+  expirar a entrada antiga continua sendo servida enquanto uma única tarefa
+  recalcula em background.
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU limitado com TTL por entrada (não é thread-safe; use no event loop)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[1] <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[2]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.monotonic()
+        self._data[key] = (now, now + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Coalesce chamadas concorrentes idênticas em uma única execução"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def forget(self, key: Optional[Hashable] = None) -> None:
+        """Próximas chamadas de key (ou de todas) não aguardam a execução em andamento"""
+        if key is None:
+            self._inflight.clear()
+        else:
+            self._inflight.pop(key, None)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        # Depois de um forget() a chave pode já ser de outra execução
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        # shield: se um dos chamadores for cancelado, a chamada compartilhada continua
+        return await asyncio.shield(task)
+
+
+class CoalescingCache:
+    """TTLCache + SingleFlight: recarrega cada chave uma única vez por expiração"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.flight = SingleFlight()
+        # Gerações: invalidate(key) troca a da chave, invalidate() a global; uma carga só grava
+        # se nenhuma das duas mudou desde que começou
+        self._counter = itertools.count(1)
+        self._generation = 0
+        self._key_generations: Dict[Hashable, int] = {}
+
+    def _version(self, key: Hashable) -> Tuple[int, int]:
+        return self._generation, self._key_generations.get(key, 0)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        cache_if: Callable[[Any], bool] = lambda value: True,
+        refresh: bool = False,
+    ) -> Any:
+        """Valor em cache ou carregado (uma vez) por loader; refresh=True ignora o cache na leitura"""
+        if not refresh and (ttl is None or ttl > 0):
+            value = self.cache.get(key)
+            if value is not MISSING:
+                return value
+
+        async def load():
+            version = self._version(key)
+            value = await loader()
+            if (ttl is None or ttl > 0) and cache_if(value) and self._version(key) == version:
+                self.cache.set(key, value, ttl)
+            return value
+
+        return await self.flight.do(key, load)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self.cache.clear()
+            self._generation = next(self._counter)
+            self._key_generations.clear()
+        else:
+            self.cache.delete(key)
+            # Só importa para cargas em andamento: sem nenhuma, não há o que descartar
+            if self.flight.in_flight(key):
+                self._key_generations[key] = next(self._counter)
+        self.flight.forget(key)
+
+
+class StaleWhileRevalidateCache:
+    """Cache com stale-while-revalidate e single-flight (use no event loop).
+
+    Entradas com menos de ttl segundos são servidas direto ("hit"). Até
+    ttl + stale_ttl são servidas como "stale" enquanto uma tarefa em background
+    recalcula. Depois disso, ou com refresh=True, o chamador aguarda o recálculo
+    ("miss"/"refresh"), compartilhado com chamadas concorrentes da mesma chave.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0, stale_ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # chave -> (instante monotônico do cálculo, time.time() do cálculo, valor)
+        self._data: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+        self.flight = SingleFlight()
+        self._background: Set[asyncio.Task] = set()
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[float, float, Any]:
+        entry = (time.monotonic(), time.time(), await loader())
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return entry
+
+    def _revalidate(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        if self.flight.in_flight(key):
+            return
+        task = asyncio.ensure_future(self.flight.do(key, lambda: self._load(key, loader)))
+        self._background.add(task)
+        task.add_done_callback(self._revalidated)
+
+    def _revalidated(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Erro ao recalcular entrada do cache: {task.exception()}")
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        refresh: bool = False,
+    ) -> Tuple[Any, float, float, str]:
+        """(valor, idade em segundos, time.time() do cálculo, status: hit | stale | miss | refresh)"""
+        entry = self._data.get(key)
+        if entry is not None and not refresh:
+            age = time.monotonic() - entry[0]
+            if age < self.ttl:
+                self._data.move_to_end(key)
+                return entry[2], age, entry[1], "hit"
+            if age < self.ttl + self.stale_ttl:
+                self._revalidate(key, loader)
+                return entry[2], age, entry[1], "stale"
+        loaded_at, computed_at, value = await self.flight.do(key, lambda: self._load(key, loader))
+        return value, time.monotonic() - loaded_at, computed_at, "refresh" if refresh else "miss"
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._data.clear()
+        else:
+            self._data.pop(key, None)
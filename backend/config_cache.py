@@ -0,0 +1,105 @@
+"""
+Cache em processo da configuração das integrações ativas (agente IGameWin e
+gateway PIX), com credenciais já parseadas e clientes prontos.
+
+As rotas de admin que alteram gateways/agentes chamam publish(), que invalida o
+cache local e, no Postgres, envia NOTIFY para que os outros workers (que escutam
+o canal via LISTEN) invalidem também. O TTL limita a defasagem caso alguma
+notificação se perca.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from cache import CoalescingCache
+
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "60"))
+NOTIFY_CHANNEL = "config_cache"
+
+IGAMEWIN_AGENT = "igamewin_agent"
+PIX_GATEWAY = "pix_gateway"
+# "user:<username>": usuário alterado ou removido (caches por usuário em cada worker)
+USER_PREFIX = "user:"
+
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+class ConfigCache:
+    def __init__(self, ttl: float = CONFIG_CACHE_TTL):
+        self._cache = CoalescingCache(maxsize=32, ttl=ttl)
+        self._callbacks: List[Callable[[Optional[str]], None]] = []
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(self, name: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Configuração em cache ou carregada (uma vez, mesmo com chamadas simultâneas)"""
+        return await self._cache.get_or_load(name, loader)
+
+    def on_invalidate(self, callback: Callable[[Optional[str]], None]) -> None:
+        self._callbacks.append(callback)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Invalida uma configuração (ou todas) apenas neste worker
+
+        Uma carga que começou antes (com o gateway/agente antigo) não é gravada nem
+        compartilhada com quem chega depois.
+        """
+        self._cache.invalidate(name)
+        for callback in self._callbacks:
+            try:
+                callback(name)
+            except Exception as e:
+                print(f"Erro em callback de invalidação do config cache: {e}")
+
+    async def publish(self, db: AsyncSession, name: str) -> None:
+        """Invalida neste worker e notifica os demais (Postgres). Chamar após o commit."""
+        self.invalidate(name)
+        if _is_postgres(db):
+            await db.execute(text("SELECT pg_notify(:channel, :name)"), {"channel": NOTIFY_CHANNEL, "name": name})
+            await db.commit()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.invalidate(payload or None)
+
+    async def _listen(self, engine: AsyncEngine) -> None:
+        reconnecting = False
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                    if reconnecting:
+                        # Notificações podem ter se perdido enquanto estávamos desconectados
+                        self.invalidate()
+                    reconnecting = True
+                    while not driver.is_closed():
+                        await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro no listener do config cache: {e}")
+            await asyncio.sleep(5)
+
+    def start_listener(self, engine: AsyncEngine) -> None:
+        """Escuta invalidações de outros workers (apenas Postgres/asyncpg)"""
+        if engine.dialect.name != "postgresql":
+            return
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(engine))
+
+    async def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+config_cache = ConfigCache()
@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from models import Base
+from sql_metrics import instrument_engine
+from db_pool import pool_settings, pool_status, TimedQueuePool, TimedAsyncQueuePool
 import os
 
 # Obter DATABASE_URL e normalizar postgres:// para postgresql://
@@ -9,18 +12,103 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fortunevegas.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
-    echo=True
-)
+
+def _async_url(url: str) -> str:
+    """Converte a URL síncrona para o driver async equivalente (asyncpg / aiosqlite)"""
+    scheme, sep, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0]
+    if driver == "postgresql":
+        return f"postgresql+asyncpg{sep}{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+
+DB_POOL = pool_settings("DB")
+# Pool pequeno e com statement_timeout curto para relatórios pesados do admin
+REPORT_DB_POOL = pool_settings("REPORT_DB", pool_size=2, max_overflow=0, statement_timeout_ms=15000)
+
+
+def _engine_kwargs(url: str, settings: dict, is_async: bool) -> dict:
+    """Monta os argumentos de create_engine para um papel de banco"""
+    kwargs: dict = {}
+    connect_args: dict = {}
+    if url.startswith("sqlite"):
+        if not is_async:
+            connect_args["check_same_thread"] = False
+        if ":memory:" in url or url.rstrip("/").endswith(":"):
+            # Banco em memória usa pool próprio do SQLAlchemy
+            return {"connect_args": connect_args}
+    timeout_ms = settings["statement_timeout_ms"]
+    if timeout_ms and url.startswith("postgresql"):
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(timeout_ms)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout_ms}"
+    kwargs.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings["pool_size"],
+        max_overflow=settings["max_overflow"],
+        pool_timeout=settings["pool_timeout"],
+        pool_recycle=settings["pool_recycle"],
+        pool_pre_ping=settings["pool_pre_ping"],
+        connect_args=connect_args,
+    )
+    return kwargs
+
+
+# Engine síncrono: usado apenas fora do event loop (init_db, scripts)
+engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL, DB_POOL, is_async=False))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine async: usado por todas as rotas
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, DB_POOL, is_async=True))
+
+# Engine async para relatórios (/stats, /ggr/report)
+report_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL, REPORT_DB_POOL, is_async=True))
+
+# Contagem/tempo de SQL por requisição e log de queries lentas (substitui echo=True)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+instrument_engine(report_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+ReportSessionLocal = async_sessionmaker(
+    report_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables and apply pending Alembic migrations"""
     Base.metadata.create_all(bind=engine)
+    run_migrations()
+
+
+def run_migrations():
+    """alembic upgrade head na conexão do app (migrações são idempotentes com create_all)
+
+    A conexão é entregue fora de transação: o env.py abre uma por migração.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
 
 
 def get_db():
@@ -30,3 +118,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting async DB session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_report_db():
+    """Dependency for getting async DB session from the report pool"""
+    async with ReportSessionLocal() as db:
+        yield db
+
+
+def get_pool_metrics() -> dict:
+    """Estado dos pools de cada papel de banco"""
+    return {
+        "default": pool_status(async_engine.sync_engine.pool),
+        "report": pool_status(report_engine.sync_engine.pool),
+        "sync": pool_status(engine.pool),
+    }
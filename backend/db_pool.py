@@ -0,0 +1,118 @@
+"""
+Configuração e métricas dos pools de conexão.
+
+Cada papel de banco (default, report) lê suas configurações de variáveis de
+ambiente com prefixo próprio, por exemplo DB_POOL_SIZE / REPORT_DB_POOL_SIZE.
+Os pools registram o tempo de espera por conexão para que /api/admin/db/pool
+mostre saturação (checked out, overflow, espera) e ajude a dimensionar workers.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings(prefix: str, **defaults: Any) -> Dict[str, Any]:
+    """Lê as configurações de pool de um papel (prefixo) com defaults"""
+    return {
+        "pool_size": _env_int(f"{prefix}_POOL_SIZE", defaults.get("pool_size", 10)),
+        "max_overflow": _env_int(f"{prefix}_MAX_OVERFLOW", defaults.get("max_overflow", 10)),
+        "pool_timeout": _env_int(f"{prefix}_POOL_TIMEOUT", defaults.get("pool_timeout", 30)),
+        "pool_recycle": _env_int(f"{prefix}_POOL_RECYCLE", defaults.get("pool_recycle", 1800)),
+        "pool_pre_ping": _env_bool(f"{prefix}_POOL_PRE_PING", defaults.get("pool_pre_ping", True)),
+        "statement_timeout_ms": _env_int(f"{prefix}_STATEMENT_TIMEOUT_MS", defaults.get("statement_timeout_ms", 0)),
+    }
+
+
+class PoolMetrics:
+    """Contadores de espera por conexão de um pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
+
+
+class _TimedPoolMixin:
+    """Mede quanto tempo cada checkout esperou por uma conexão livre"""
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - started) * 1000)
+        return record
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Estado atual de um pool (conexões em uso, overflow e espera)"""
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
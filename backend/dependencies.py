@@ -1,19 +1,63 @@
+from dataclasses import dataclass
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from database import get_db
+from database import get_async_db
 from models import User, UserRole
 from auth import SECRET_KEY, ALGORITHM
+from cache import CoalescingCache
+from config_cache import config_cache, USER_PREFIX
 import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Cache do usuário autenticado (principal) por subject do token; evita um SELECT em users
+# a cada requisição. Alterações do usuário invalidam a entrada em todos os workers.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+_principals = CoalescingCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
 
-async def get_current_user(
+
+@dataclass(frozen=True)
+class Principal:
+    """Identidade do usuário autenticado (sem saldo e dados pessoais)"""
+    id: int
+    username: str
+    role: UserRole
+    is_active: bool
+
+
+def _on_config_invalidated(name: Optional[str]) -> None:
+    if name is None:
+        _principals.invalidate()
+    elif name.startswith(USER_PREFIX):
+        _principals.invalidate(name[len(USER_PREFIX):])
+
+
+config_cache.on_invalidate(_on_config_invalidated)
+
+
+async def invalidate_principal(db: AsyncSession, username: str) -> None:
+    """Invalida o principal em cache (todos os workers). Chamar após o commit."""
+    await config_cache.publish(db, f"{USER_PREFIX}{username}")
+
+
+async def _load_principal(db: AsyncSession, username: str) -> Optional[Principal]:
+    row = (await db.execute(
+        select(User.id, User.username, User.role, User.is_active).where(User.username == username)
+    )).first()
+    if row is None:
+        return None
+    return Principal(id=row.id, username=row.username, role=row.role, is_active=row.is_active)
+
+
+async def get_current_principal(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,15 +70,35 @@ async def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    principal = await _principals.get_or_load(
+        username,
+        lambda: _load_principal(db, username),
+        cache_if=lambda value: value is not None,
+    )
+    if principal is None:
         raise credentials_exception
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Linha completa do usuário (para rotas que leem/alteram saldo ou retornam o perfil)"""
+    user = await db.get(User, principal.id)
+    if user is None:
+        _principals.invalidate(principal.username)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -44,8 +108,8 @@ async def get_current_admin_user(
 
 
 # Helper function to get user by username (used in auth routes)
-def get_user_by_username_dep(username: str, db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.username == username).first()
+async def get_user_by_username_dep(username: str, db: AsyncSession = Depends(get_async_db)) -> User:
+    user = await db.scalar(select(User).where(User.username == username))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
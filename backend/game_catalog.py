@@ -0,0 +1,269 @@
+"""
+Catálogo local de provedores e jogos da IGameWin.
+
+Mantém em memória um snapshot de provider_list + game_list (já normalizados)
+que é atualizado em background a cada GAME_CATALOG_REFRESH_SECONDS. As rotas de
+jogos servem a partir do snapshot, então a latência (e as quedas) da IGameWin
+não afetam o lobby. Os game_list de cada provedor são buscados em paralelo,
+limitados por GAME_CATALOG_CONCURRENCY.
+
+Só os provedores do snapshot são servidos: requisições não disparam chamadas à
+IGameWin por códigos desconhecidos. Sem snapshot (a primeira sincronização
+falhou), uma nova tentativa sob demanda só acontece depois de
+GAME_CATALOG_RETRY_SECONDS desde a anterior.
+
+Há no máximo uma sincronização em andamento por worker: quem precisa do
+resultado (primeira carga, refresh do admin) aguarda a mesma task.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config_cache import config_cache, IGAMEWIN_AGENT
+from database import AsyncSessionLocal
+from igamewin_api import IGameWinAPI, get_igamewin_api
+
+REFRESH_SECONDS = float(os.getenv("GAME_CATALOG_REFRESH_SECONDS", "300"))
+SYNC_CONCURRENCY = int(os.getenv("GAME_CATALOG_CONCURRENCY", "4"))
+# Intervalo mínimo entre sincronizações disparadas por game_code desconhecido
+MISS_REFRESH_SECONDS = float(os.getenv("GAME_CATALOG_MISS_REFRESH_SECONDS", "60"))
+# Intervalo mínimo entre tentativas sob demanda enquanto não há snapshot (IGameWin fora do ar)
+RETRY_SECONDS = float(os.getenv("GAME_CATALOG_RETRY_SECONDS", "30"))
+
+
+def provider_code_of(provider: Dict[str, Any]) -> Optional[str]:
+    return provider.get("code") or provider.get("provider_code")
+
+
+def choose_provider(providers: list, provider_code: Optional[str]) -> Optional[str]:
+    chosen = provider_code
+    if not chosen:
+        active = [p for p in providers if str(p.get("status", 1)) in ["1", "true", "True"]]
+        if active:
+            chosen = provider_code_of(active[0])
+        elif providers:
+            chosen = provider_code_of(providers[0])
+    return chosen
+
+
+def game_code_of(game: Dict[str, Any]) -> Optional[str]:
+    code = game.get("game_code") or game.get("code") or game.get("game_id") or game.get("id")
+    return str(code) if code is not None else None
+
+
+def normalize_games(games: list, chosen_provider: Optional[str]) -> list:
+    if chosen_provider:
+        for g in games:
+            if not g.get("provider_code"):
+                g["provider_code"] = chosen_provider
+    return games
+
+
+def to_public_games(games: list, chosen_provider: Optional[str]) -> list:
+    """Filtra jogos ativos e mapeia para o formato público do lobby"""
+    public_games = []
+    for g in games:
+        status_val = g.get("status")
+        is_active = (status_val == 1) or (status_val is True) or (str(status_val).lower() == "active")
+        if not is_active:
+            continue
+        public_games.append({
+            "name": g.get("game_name") or g.get("name") or g.get("title") or g.get("gameTitle"),
+            "code": g.get("game_code") or g.get("code") or g.get("game_id") or g.get("id") or g.get("slug"),
+            "provider": g.get("provider_code") or g.get("provider") or g.get("provider_name") or g.get("vendor") or g.get("vendor_name") or chosen_provider,
+            "banner": g.get("banner") or g.get("image") or g.get("icon"),
+            "status": "active"
+        })
+    return public_games
+
+
+class GameCatalog:
+    """Snapshot em memória do catálogo com sincronização periódica"""
+
+    def __init__(self, refresh_seconds: float = REFRESH_SECONDS, concurrency: int = SYNC_CONCURRENCY):
+        self.refresh_seconds = refresh_seconds
+        self.concurrency = max(1, concurrency)
+        self.providers: Optional[List[Dict[str, Any]]] = None
+        self.games: Dict[str, list] = {}
+        self.public_games: Dict[str, list] = {}
+        # game_code -> jogo normalizado (inclui provider_code)
+        self.game_index: Dict[str, Dict[str, Any]] = {}
+        self.synced_at: Optional[datetime] = None
+        # Início da última tentativa de sincronização, com ou sem sucesso
+        self.last_attempt_at: Optional[datetime] = None
+        self.configured = True
+        self.last_error: Optional[str] = None
+        # Sincronização em andamento, compartilhada por todos que a aguardam
+        self._sync_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resync_task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.providers is not None
+
+    async def _get_api(self) -> Optional[IGameWinAPI]:
+        async with AsyncSessionLocal() as db:
+            api = await get_igamewin_api(db)
+        if api:
+            # A sincronização sempre busca dados novos na IGameWin
+            api.read_cache = False
+        return api
+
+    async def _fetch_provider_games(self, api: IGameWinAPI, provider_code: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            # Cada chamada usa sua própria instância para não compartilhar last_error
+            provider_api = IGameWinAPI(api.agent_code, api.agent_key, api.api_url, api.credentials, read_cache=False)
+            games = await provider_api.get_games(provider_code=provider_code)
+            return provider_code, games, provider_api.last_error
+
+    @property
+    def syncing(self) -> bool:
+        return self._sync_task is not None and not self._sync_task.done()
+
+    def _start_sync(self) -> asyncio.Task:
+        if not self.syncing:
+            self._sync_task = asyncio.create_task(self._sync())
+        return self._sync_task
+
+    async def sync(self, fresh: bool = False) -> bool:
+        """Busca provedores e jogos na IGameWin e troca o snapshot. Retorna True se sincronizou.
+
+        Se já houver uma sincronização em andamento, aguarda a mesma; com fresh=True
+        (configuração alterada) aguarda ela terminar e começa outra.
+        """
+        if fresh and self.syncing:
+            await asyncio.shield(self._sync_task)
+        # shield: uma requisição cancelada não cancela a sincronização dos demais
+        return await asyncio.shield(self._start_sync())
+
+    def refresh_in_background(self) -> None:
+        """Agenda uma sincronização sem aguardá-la (no-op se já houver uma em andamento)"""
+        self._start_sync()
+
+    async def _sync(self) -> bool:
+        try:
+            return await self._fetch_snapshot()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Erro ao sincronizar catálogo de jogos: {e}")
+            return False
+
+    async def _fetch_snapshot(self) -> bool:
+        self.last_attempt_at = datetime.utcnow()
+        api = await self._get_api()
+        if not api:
+            self.configured = False
+            self.last_error = "Nenhum agente IGameWin ativo configurado"
+            return False
+        self.configured = True
+
+        providers = await api.get_providers()
+        if providers is None:
+            self.last_error = f"Não foi possível obter provedores da IGameWin ({api.last_error or 'erro desconhecido'})"
+            return False
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        codes = [code for code in (provider_code_of(p) for p in providers) if code]
+        results = await asyncio.gather(*(self._fetch_provider_games(api, code, semaphore) for code in codes))
+
+        games: Dict[str, list] = {}
+        public_games: Dict[str, list] = {}
+        errors = []
+        for code, provider_games, error in results:
+            if provider_games is None:
+                # Mantém a versão anterior do provedor se a busca falhou
+                errors.append(f"{code}: {error or 'erro desconhecido'}")
+                if code in self.games:
+                    games[code] = self.games[code]
+                    public_games[code] = self.public_games[code]
+                continue
+            games[code] = normalize_games(provider_games, code)
+            public_games[code] = to_public_games(games[code], code)
+
+        self.providers = providers
+        self.games = games
+        self.public_games = public_games
+        self.game_index = self._build_index(games)
+        self.synced_at = datetime.utcnow()
+        self.last_error = "; ".join(errors) or None
+        return True
+
+    @staticmethod
+    def _build_index(games: Dict[str, list]) -> Dict[str, Dict[str, Any]]:
+        index: Dict[str, Dict[str, Any]] = {}
+        for provider_games in games.values():
+            for game in provider_games:
+                code = game_code_of(game)
+                if code and code not in index:
+                    index[code] = game
+        return index
+
+    async def find_game(self, game_code: str) -> Optional[Dict[str, Any]]:
+        """Jogo pelo game_code, do snapshot atual
+
+        Em caso de miss agenda uma sincronização em background (no máximo uma a cada
+        MISS_REFRESH_SECONDS desde a última tentativa) sem bloquear quem chamou.
+        """
+        await self.ensure_loaded()
+        game = self.game_index.get(game_code)
+        if game is None and not self._attempted_within(MISS_REFRESH_SECONDS):
+            self.refresh_in_background()
+        return game
+
+    def _attempted_within(self, seconds: float) -> bool:
+        if self.last_attempt_at is None:
+            return False
+        return (datetime.utcnow() - self.last_attempt_at).total_seconds() < seconds
+
+    async def ensure_loaded(self) -> bool:
+        """Garante um snapshot (sincroniza na primeira chamada se o background ainda não rodou)
+
+        Com a IGameWin fora do ar, retorna o estado atual (sem snapshot) em vez de
+        tentar de novo a cada requisição: no máximo uma tentativa por RETRY_SECONDS.
+        """
+        if not self.loaded and (self.syncing or not self._attempted_within(RETRY_SECONDS)):
+            await self.sync()
+        return self.loaded
+
+    async def _run(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def on_config_invalidated(self, name: Optional[str]) -> None:
+        """Agente IGameWin alterado: re-sincroniza em background com a nova configuração"""
+        if name not in (None, IGAMEWIN_AGENT):
+            return
+        # Fora do app (sem sincronização em background) o próximo acesso sincroniza sob demanda
+        if self._task is None or self._task.done():
+            return
+        if self._resync_task is None or self._resync_task.done():
+            self._resync_task = asyncio.create_task(self.sync(fresh=True))
+
+    async def stop(self) -> None:
+        if self._resync_task is not None:
+            self._resync_task.cancel()
+            self._resync_task = None
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def synced_at_iso(self) -> Optional[str]:
+        return self.synced_at.isoformat() if self.synced_at else None
+
+
+catalog = GameCatalog()
+config_cache.on_invalidate(catalog.on_config_invalidated)
@@ -0,0 +1,66 @@
+"""
+Payloads brutos do gateway fora das linhas de depósitos e saques.
+
+A resposta completa da SuitPay na criação (incluindo o QR code) e cada webhook
+recebido ficam em gateway_payloads, ligados à transação por (reference_type,
+reference_id) como no ledger. metadata_json de deposits/withdrawals guarda só os
+campos pequenos que o app lê (pix_code, request_number, dados de destino do
+saque), então listagens, contagens e /stats não arrastam kilobytes de JSON por
+linha. Só as rotas de detalhe carregam os payloads (load()).
+
+O JSON é gravado em zlib a partir de GATEWAY_PAYLOAD_COMPRESS_MIN_BYTES
+(GATEWAY_PAYLOAD_COMPRESSION=false grava sempre sem compressão); a leitura
+aceita os dois formatos.
+
+As funções não fazem commit: o payload entra na transação de quem chama.
+"""
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import GatewayPayload
+
+GATEWAY_PAYLOAD_COMPRESSION = os.getenv("GATEWAY_PAYLOAD_COMPRESSION", "true").lower() == "true"
+GATEWAY_PAYLOAD_COMPRESS_MIN_BYTES = int(os.getenv("GATEWAY_PAYLOAD_COMPRESS_MIN_BYTES", "512"))
+
+SUITPAY_RESPONSE = "suitpay_response"
+WEBHOOK_DATA = "webhook_data"
+
+
+def encode(payload: Any) -> Tuple[bytes, bool]:
+    """(bytes, comprimido) do payload em JSON"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    if GATEWAY_PAYLOAD_COMPRESSION and len(data) >= GATEWAY_PAYLOAD_COMPRESS_MIN_BYTES:
+        return zlib.compress(data), True
+    return data, False
+
+
+def decode(data: bytes, compressed: bool) -> Any:
+    return json.loads(zlib.decompress(data) if compressed else data)
+
+
+def add(db: AsyncSession, reference_type: str, reference_id: int, kind: str, payload: Any) -> GatewayPayload:
+    """Adiciona um payload de kind ao depósito/saque reference_id na sessão"""
+    data, compressed = encode(payload)
+    row = GatewayPayload(
+        reference_type=reference_type, reference_id=reference_id, kind=kind, data=data, compressed=compressed
+    )
+    db.add(row)
+    return row
+
+
+async def load(db: AsyncSession, reference_type: str, reference_id: int) -> List[Dict[str, Any]]:
+    """Payloads do depósito/saque em ordem de chegada: [{"kind", "payload", "created_at"}]"""
+    rows = await db.execute(
+        select(GatewayPayload.kind, GatewayPayload.data, GatewayPayload.compressed, GatewayPayload.created_at)
+        .where(GatewayPayload.reference_type == reference_type, GatewayPayload.reference_id == reference_id)
+        .order_by(GatewayPayload.id)
+    )
+    return [
+        {"kind": kind, "payload": decode(data, compressed), "created_at": created_at}
+        for kind, data, compressed, created_at in rows
+    ]
@@ -0,0 +1,83 @@
+"""
+Clientes HTTP compartilhados pelo processo.
+
+Os clientes são criados no lifespan do FastAPI e reutilizados por todas as
+instâncias de API (keep-alive, sem novo handshake TCP+TLS a cada chamada).
+Fora do app (scripts) são criados sob demanda no primeiro uso.
+"""
+import os
+from typing import Dict
+
+import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client(prefix: str) -> httpx.AsyncClient:
+    """Cria um cliente com pool/keep-alive configurado por variáveis {prefix}_*"""
+    limits = httpx.Limits(
+        max_connections=_env_int(f"{prefix}_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=_env_int(f"{prefix}_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float(f"{prefix}_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(
+        _env_float(f"{prefix}_READ_TIMEOUT", 30.0),
+        connect=_env_float(f"{prefix}_CONNECT_TIMEOUT", 5.0),
+        pool=_env_float(f"{prefix}_POOL_TIMEOUT", 5.0),
+    )
+    http2 = os.getenv(f"{prefix}_HTTP2", "").strip().lower() in ("1", "true", "yes", "on")
+    if http2 and not _http2_available():
+        print(f"{prefix}_HTTP2 ativo mas o pacote 'h2' não está instalado; usando HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _get_client(prefix: str) -> httpx.AsyncClient:
+    client = _clients.get(prefix)
+    if client is None or client.is_closed:
+        client = _build_client(prefix)
+        _clients[prefix] = client
+    return client
+
+
+def get_igamewin_client() -> httpx.AsyncClient:
+    """Cliente compartilhado para a API IGameWin"""
+    return _get_client("IGAMEWIN")
+
+
+def get_suitpay_http_client() -> httpx.AsyncClient:
+    """Cliente compartilhado para a API SuitPay"""
+    return _get_client("SUITPAY")
+
+
+async def start_http_clients() -> None:
+    """Cria os clientes compartilhados (chamado no startup do app)"""
+    get_igamewin_client()
+    get_suitpay_http_client()
+
+
+async def close_http_clients() -> None:
+    """Fecha os clientes compartilhados (chamado no shutdown do app)"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -1,8 +1,37 @@
 import httpx
 import json
+import os
 from typing import Optional, Dict, Any, List
 from models import IGameWinAgent
-from sqlalchemy.orm import Session
+from http_clients import get_igamewin_client
+from cache import CoalescingCache
+from config_cache import config_cache, IGAMEWIN_AGENT
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Timeout de leitura por método (segundos); o connect timeout vem do cliente compartilhado
+METHOD_TIMEOUTS: Dict[str, float] = {
+    "money_info": 5.0,
+    "game_launch": 10.0,
+    "user_create": 10.0,
+    "provider_list": 15.0,
+    "game_list": 20.0,
+    "user_deposit": 30.0,
+    "user_withdraw": 30.0,
+}
+DEFAULT_TIMEOUT = 30.0
+
+# Métodos somente leitura cujas chamadas idênticas e simultâneas são coalescidas em uma
+# única requisição. O valor é o TTL (s) do cache de resultado; 0 = apenas coalescer.
+_LIST_CACHE_TTL = float(os.getenv("IGAMEWIN_LIST_CACHE_TTL", "10"))
+COALESCED_METHODS: Dict[str, float] = {
+    "provider_list": _LIST_CACHE_TTL,
+    "game_list": _LIST_CACHE_TTL,
+    "money_info": float(os.getenv("IGAMEWIN_BALANCE_CACHE_TTL", "0")),
+}
+
+_read_cache = CoalescingCache(maxsize=512)
 
 
 class IGameWinAPI:
@@ -11,7 +40,9 @@ class IGameWinAPI:
         agent_code: str,
         agent_key: str,
         api_url: str = "https://igamewin.com",
-        credentials: Optional[Dict[str, Any]] = None
+        credentials: Optional[Dict[str, Any]] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        read_cache: bool = True
     ):
         self.agent_code = agent_code
         self.agent_key = agent_key  # maps to agent_token in requests
@@ -25,6 +56,9 @@ class IGameWinAPI:
             self.base_url = f"{self.api_url}/api/v1"
         self.credentials = credentials or {}
         self.last_error: Optional[str] = None
+        self._http_client = http_client
+        # False: sempre busca dados novos (ainda coalescendo chamadas simultâneas) e atualiza o cache
+        self.read_cache = read_cache
     
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -131,32 +165,51 @@ class IGameWinAPI:
         
         return None
     
-    async def _post(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        self.last_error = None
-        async with httpx.AsyncClient() as client:
+    async def _post(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        method = payload.get("method")
+        ttl = COALESCED_METHODS.get(method)
+        if ttl is None:
+            data, error = await self._send(payload, timeout)
+        else:
+            # Chave: endpoint + payload normalizado (inclui agente, usuário e provider)
+            key = (self.base_url, json.dumps(payload, sort_keys=True, default=str))
+            data, error = await _read_cache.get_or_load(
+                key,
+                lambda: self._send(payload, timeout),
+                ttl=ttl,
+                cache_if=lambda result: result[0] is not None,
+                refresh=not self.read_cache
+            )
+        self.last_error = error
+        return data
+
+    async def _send(self, payload: Dict[str, Any], timeout: Optional[float] = None):
+        """Executa a chamada HTTP; retorna (dados, erro)"""
+        client = self._http_client or get_igamewin_client()
+        if timeout is None:
+            timeout = METHOD_TIMEOUTS.get(payload.get("method"), DEFAULT_TIMEOUT)
+        try:
+            response = await client.post(
+                self.base_url,
+                headers=self._get_headers(),
+                json=payload,
+                timeout=httpx.Timeout(timeout, connect=client.timeout.connect, pool=client.timeout.pool)
+            )
+            response.raise_for_status()
+            data = response.json()
+            # API de business retorna status 1/0
+            if isinstance(data, dict) and data.get("status") not in (None, 1):
+                return None, f"status={data.get('status')} msg={data.get('msg')}"
+            return data, None
+        except httpx.HTTPError as e:
+            body_preview = ""
             try:
-                response = await client.post(
-                    self.base_url,
-                    headers=self._get_headers(),
-                    json=payload,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                # API de business retorna status 1/0
-                if isinstance(data, dict) and data.get("status") not in (None, 1):
-                    self.last_error = f"status={data.get('status')} msg={data.get('msg')}"
-                    return None
-                return data
-            except httpx.HTTPError as e:
-                body_preview = ""
-                try:
-                    body_preview = e.response.text[:500] if hasattr(e, "response") and e.response else ""
-                except Exception:
-                    pass
-                self.last_error = f"{e} {body_preview}"
-                print(f"Error calling igamewin: {self.last_error}")
-                return None
+                body_preview = e.response.text[:500] if hasattr(e, "response") and e.response else ""
+            except Exception:
+                pass
+            error = f"{e} {body_preview}"
+            print(f"Error calling igamewin: {error}")
+            return None, error
 
     async def get_providers(self) -> Optional[List[Dict[str, Any]]]:
         payload = {
@@ -213,9 +266,8 @@ class IGameWinAPI:
         return None
 
 
-def get_igamewin_api(db: Session) -> Optional[IGameWinAPI]:
-    """Get active igamewin agent and return API instance"""
-    agent = db.query(IGameWinAgent).filter(IGameWinAgent.is_active == True).first()
+async def _load_active_agent(db: AsyncSession) -> Optional[Dict[str, Any]]:
+    agent = await db.scalar(select(IGameWinAgent).where(IGameWinAgent.is_active == True).limit(1))
     if not agent:
         return None
     credentials_dict: Dict[str, Any] = {}
@@ -224,9 +276,28 @@ def get_igamewin_api(db: Session) -> Optional[IGameWinAPI]:
             credentials_dict = json.loads(agent.credentials)
         except Exception:
             credentials_dict = {}
+    return {
+        "agent_code": agent.agent_code,
+        "agent_key": agent.agent_key,
+        "api_url": agent.api_url,
+        "credentials": credentials_dict,
+    }
+
+
+async def get_agent_config(db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Config do agente ativo (cacheada): agent_code, agent_key, api_url, credentials"""
+    return await config_cache.get(IGAMEWIN_AGENT, lambda: _load_active_agent(db))
+
+
+async def get_igamewin_api(db: AsyncSession) -> Optional[IGameWinAPI]:
+    """Get active igamewin agent (cached config) and return API instance"""
+    config = await get_agent_config(db)
+    if not config:
+        return None
+    # Instância nova por chamada: last_error não é compartilhado entre requisições
     return IGameWinAPI(
-        agent_code=agent.agent_code,
-        agent_key=agent.agent_key,
-        api_url=agent.api_url,
-        credentials=credentials_dict
+        agent_code=config["agent_code"],
+        agent_key=config["agent_key"],
+        api_url=config["api_url"],
+        credentials=dict(config["credentials"])
     )
@@ -1,14 +1,46 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import init_db, get_db
+from database import init_db, AsyncSessionLocal, async_engine
 from auth import create_admin_user
-from sqlalchemy.orm import Session
+import sql_metrics
+from http_clients import start_http_clients, close_http_clients
+from game_catalog import catalog
+from config_cache import config_cache
+from webhook_inbox import webhook_inbox
+from seamless_wallet import bet_buffer
+from partitions import partition_maintenance
+import rollups  # noqa: F401  (listener que mantém daily_rollups)
 import os
 
 # Import routes
-from routes import auth, admin, media, payments
+from routes import auth, admin, media, payments, igamewin
 
-app = FastAPI(title="Fortune Vegas API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database, admin user, shared HTTP clients, config cache listener, webhook workers, bet buffer, bets partition maintenance and game catalog sync"""
+    init_db()
+    # Create admin user
+    async with AsyncSessionLocal() as db:
+        await create_admin_user(db)
+    await start_http_clients()
+    config_cache.start_listener(async_engine)
+    catalog.start()
+    webhook_inbox.start()
+    bet_buffer.start()
+    partition_maintenance.start()
+    try:
+        yield
+    finally:
+        await partition_maintenance.stop()
+        await bet_buffer.stop()
+        await webhook_inbox.stop()
+        await catalog.stop()
+        await config_cache.stop_listener()
+        await close_http_clients()
+
+
+app = FastAPI(title="Fortune Vegas API", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS - permite variáveis de ambiente para produção
 cors_origins_env = os.getenv("CORS_ORIGINS", "").strip()
@@ -35,8 +67,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # paginação por cursor das listagens do admin
 )
 
+
+@app.middleware("http")
+async def sql_timing_middleware(request: Request, call_next):
+    """Expõe quantidade e tempo de SQL da requisição no header Server-Timing"""
+    stats = sql_metrics.start_request()
+    response = await call_next(request)
+    response.headers.append("Server-Timing", sql_metrics.server_timing_header(stats))
+    return response
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(admin.router)
@@ -45,18 +88,7 @@ app.include_router(media.router)
 app.include_router(media.public_router)
 app.include_router(payments.router)
 app.include_router(payments.webhook_router)
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database and create admin user on startup"""
-    init_db()
-    # Create admin user
-    db = next(get_db())
-    try:
-        create_admin_user(db)
-    finally:
-        db.close()
+app.include_router(igamewin.router)
 
 
 @app.get("/")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Text, Enum, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -42,6 +42,11 @@ class User(Base):
     ftds = relationship("FTD", back_populates="user")
     bets = relationship("Bet")
     notifications = relationship("Notification")
+    
+    __table_args__ = (
+        # Listagem do admin por cursor (created_at, id)
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
 
 class Gateway(Base):
@@ -79,13 +84,20 @@ class Deposit(Base):
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING, nullable=False)
     transaction_id = Column(String(255), unique=True, index=True)
     external_id = Column(String(255), index=True)  # ID from gateway
-    metadata_json = Column(Text)  # JSON string with additional data
+    request_number = Column(String(255), unique=True, index=True)  # requestNumber enviado ao gateway
+    metadata_json = Column(Text)  # JSON enxuto (pix_code, request_number); payloads do gateway em gateway_payloads
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="deposits")
     gateway = relationship("Gateway")
+    
+    __table_args__ = (
+        Index("ix_deposits_created_at_id", "created_at", "id"),
+        Index("ix_deposits_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_deposits_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
 
 class Withdrawal(Base):
@@ -98,13 +110,19 @@ class Withdrawal(Base):
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING, nullable=False)
     transaction_id = Column(String(255), unique=True, index=True)
     external_id = Column(String(255), index=True)
-    metadata_json = Column(Text)
+    metadata_json = Column(Text)  # JSON enxuto (dados de destino); payloads do gateway em gateway_payloads
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="withdrawals")
     gateway = relationship("Gateway")
+    
+    __table_args__ = (
+        Index("ix_withdrawals_created_at_id", "created_at", "id"),
+        Index("ix_withdrawals_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_withdrawals_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
 
 class FTD(Base):
@@ -122,6 +140,11 @@ class FTD(Base):
     
     # Relationships
     user = relationship("User", back_populates="ftds")
+    
+    __table_args__ = (
+        Index("ix_ftds_created_at_id", "created_at", "id"),
+        Index("ix_ftds_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
 
 class FTDSettings(Base):
@@ -153,6 +176,10 @@ class MediaAsset(Base):
     position = Column(Integer, default=0, nullable=False)  # Ordem para banners
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_media_assets_type_is_active_position", "type", "is_active", "position"),
+    )
 
 
 class BetStatus(str, enum.Enum):
@@ -163,6 +190,9 @@ class BetStatus(str, enum.Enum):
 
 
 class Bet(Base):
+    """Apostas. No Postgres a tabela é particionada por mês em created_at (migração 0008, partitions.py):
+    a chave primária lá é (id, created_at) e transaction_id é único em cada partição; a unicidade
+    global fica em bet_transactions."""
     __tablename__ = "bets"
     
     id = Column(Integer, primary_key=True, index=True)
@@ -181,6 +211,20 @@ class Bet(Base):
     
     # Relationships
     user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_bets_created_at_id", "created_at", "id"),
+        Index("ix_bets_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_bets_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+class BetTransaction(Base):
+    """transaction_id das apostas gravadas pelo buffer da carteira seamless, único entre todas as partições"""
+    __tablename__ = "bet_transactions"
+    
+    transaction_id = Column(String(255), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # da aposta (limpeza no arquivamento)
 
 
 class NotificationType(str, enum.Enum):
@@ -208,3 +252,106 @@ class Notification(Base):
     
     # Relationships
     user = relationship("User")
+    
+    __table_args__ = (
+        Index("ix_notifications_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Notificações globais (user_id nulo), listadas pelo admin por data
+        Index("ix_notifications_global_created_at_id", "created_at", "id",
+              postgresql_where=user_id.is_(None), sqlite_where=user_id.is_(None)),
+    )
+
+
+class WebhookStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    DEAD = "dead"  # esgotou as tentativas; reprocessar manualmente pelo admin
+
+
+class WebhookInbox(Base):
+    """Webhooks recebidos (payload bruto), processados em background por webhook_inbox.py"""
+    __tablename__ = "webhook_inbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50), nullable=False)  # ex: suitpay_pix_cashin
+    dedupe_key = Column(String(255), unique=True, index=True, nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(Enum(WebhookStatus), default=WebhookStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_webhook_inbox_claim", "status", "next_attempt_at"),
+    )
+
+
+class LedgerEntryType(str, enum.Enum):
+    OPENING = "opening"  # saldo existente quando o ledger foi criado
+    DEPOSIT = "deposit"
+    DEPOSIT_REVERSAL = "deposit_reversal"  # chargeback
+    WITHDRAWAL = "withdrawal"
+    WITHDRAWAL_REFUND = "withdrawal_refund"
+    ADJUSTMENT = "adjustment"  # ajuste manual do admin
+    BET = "bet"  # débito de aposta (carteira seamless do IGameWin)
+    BET_WIN = "bet_win"  # prêmio creditado pelo provider
+    BET_ROLLBACK = "bet_rollback"  # estorno de uma aposta/prêmio
+
+
+class LedgerEntry(Base):
+    """Lançamentos da carteira (append-only); users.balance é o saldo após o último lançamento"""
+    __tablename__ = "ledger_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    type = Column(Enum(LedgerEntryType), nullable=False)
+    amount = Column(Float, nullable=False)  # positivo = crédito, negativo = débito
+    balance_after = Column(Float, nullable=False)
+    reference_type = Column(String(50))  # deposit, withdrawal, admin
+    reference_id = Column(Integer)
+    idempotency_key = Column(String(255), unique=True)  # evita aplicar o mesmo evento duas vezes
+    description = Column(String(255))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_ledger_entries_user_id_id", "user_id", "id"),
+    )
+
+
+class GatewayPayload(Base):
+    """Payloads brutos do gateway (resposta da criação, webhooks) de um depósito/saque, mantidos por gateway_payloads.py"""
+    __tablename__ = "gateway_payloads"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    reference_type = Column(String(50), nullable=False)  # deposit, withdrawal
+    reference_id = Column(Integer, nullable=False)
+    kind = Column(String(50), nullable=False)  # suitpay_response, webhook_data
+    compressed = Column(Boolean, default=False, nullable=False)  # data em zlib
+    data = Column(LargeBinary, nullable=False)  # JSON em UTF-8
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_gateway_payloads_reference", "reference_type", "reference_id", "id"),
+    )
+
+
+class DailyRollup(Base):
+    """Agregados diários de depósitos, saques, apostas e FTDs, mantidos por rollups.py"""
+    __tablename__ = "daily_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)  # dia (UTC) de created_at da transação
+    metric = Column(String(20), nullable=False)  # deposit, withdrawal, bet, ftd
+    status = Column(String(20), nullable=False)  # nome do status (APPROVED, WON, ...)
+    gateway_id = Column(Integer, default=0, nullable=False)  # 0 = sem gateway
+    provider = Column(String(100), default="", nullable=False)  # apostas; "" = sem provider
+    count = Column(Integer, default=0, nullable=False)
+    amount = Column(Float, default=0.0, nullable=False)
+    win_amount = Column(Float, default=0.0, nullable=False)  # apostas
+    
+    __table_args__ = (
+        UniqueConstraint("day", "metric", "status", "gateway_id", "provider", name="uq_daily_rollups_bucket"),
+    )
@@ -0,0 +1,113 @@
+"""
+Paginação por cursor (keyset) das listagens do admin.
+
+As listagens ordenam por (created_at DESC, id DESC). Com OFFSET, a página N
+obriga o banco a ler e descartar todas as linhas anteriores; com cursor, a
+consulta continua a partir da última linha vista, (created_at, id) < cursor,
+pelo mesmo índice, e cada página custa o mesmo que a primeira. O id desempata
+linhas com o mesmo created_at, e inserções novas (mais recentes que o cursor)
+não deslocam as páginas seguintes.
+
+O modo antigo (?skip=) continua valendo. Nos dois modos, quando a página vem
+cheia, o header X-Next-Cursor traz o cursor da próxima página (?cursor=...);
+sem o header, a listagem acabou.
+
+/users não tinha ordem de criação: sem cursor ela mantém a ordem antiga (id
+crescente, offset_order) e não envia X-Next-Cursor; ?cursor= vazio começa a
+paginação por cursor, mais novos primeiro como as demais.
+
+As listagens do admin usam paginate_rows(): a consulta seleciona só as colunas
+do schema da resposta (columns()) e as linhas voltam como dicts, validados
+direto pelo response_model. Nada de entidades no identity map, nem colunas Text
+grandes (metadata_json, credenciais) lidas para serem descartadas.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel
+from sqlalchemy import desc, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) do cursor; 400 se ele não veio de encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def columns(model, schema: Type[BaseModel]) -> list:
+    """Colunas de model com os nomes dos campos de schema (a projeção de uma listagem)"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def _keyset(cursor: Optional[str], offset_order: Optional[list]) -> bool:
+    """Se a página segue a ordem (created_at DESC, id DESC) que o cursor continua"""
+    return cursor is not None or offset_order is None
+
+
+def _page(
+    query: Select, model, skip: int, limit: int, cursor: Optional[str], offset_order: Optional[list] = None
+) -> Select:
+    if not _keyset(cursor, offset_order):
+        return query.order_by(*offset_order).offset(skip).limit(limit)
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        # O limite simples em created_at é redundante, mas é o que o Postgres usa para
+        # descartar as partições mais novas que o cursor (bets é particionada por mês)
+        query = query.where(model.created_at <= created_at, tuple_(model.created_at, model.id) < tuple_(created_at, id))
+    else:
+        query = query.offset(skip)
+    return query.order_by(desc(model.created_at), desc(model.id)).limit(limit)
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    response: Optional[Response] = None,
+) -> list:
+    """Uma página de query (entidades de model), por cursor se informado, senão por skip"""
+    rows = (await db.scalars(_page(query, model, skip, limit, cursor))).all()
+    if response is not None and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
+
+
+async def paginate_rows(
+    db: AsyncSession,
+    query: Select,
+    model,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    response: Optional[Response] = None,
+    offset_order: Optional[list] = None,
+) -> List[dict]:
+    """Como paginate(), para query de colunas (com id e created_at de model): a página como dicts
+
+    offset_order: ordem das páginas sem cursor (?skip=), para listagens que já tinham
+    outra ordem; essas páginas não trazem X-Next-Cursor.
+    """
+    page = _page(query, model, skip, limit, cursor, offset_order)
+    rows = [dict(row) for row in (await db.execute(page)).mappings()]
+    if response is not None and len(rows) == limit and _keyset(cursor, offset_order):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows
@@ -0,0 +1,227 @@
+"""
+Particionamento mensal da tabela bets (Postgres).
+
+A migração 0008 transforma bets numa tabela particionada por RANGE (created_at)
+sem copiar dados: a tabela antiga vira a partição bets_legacy (apostas até o fim
+do mês seguinte ao da migração), cada mês depois dela ganha a sua partição
+bets_AAAA_MM e bets_default recebe o que cair fora delas (rede de segurança: um
+INSERT nunca falha por falta de partição).
+
+Consultas com created_at no WHERE (listagens por cursor ou por período,
+exportações, pontas do GGR) leem só as partições do intervalo (partition
+pruning), e arquivar um mês é um DETACH, sem DELETE em massa.
+
+A manutenção roda em background (partition_maintenance, no lifespan) e pelo
+scripts/bets_partitions.py:
+- cria as partições do mês atual e dos próximos BETS_PARTITION_MONTHS_AHEAD
+  meses (movendo para elas apostas que tenham caído na bets_default);
+- arquiva as partições que terminam antes de BETS_RETENTION_MONTHS meses atrás
+  (0 desliga): DETACH e mudança para o schema bets_archive, onde continuam
+  consultáveis; o script pode exportá-las para CSV gzip e removê-las.
+
+Os totais de apostas dos dias arquivados continuam em daily_rollups: não rode
+rollups.rebuild() para períodos já arquivados.
+
+No Postgres transaction_id é único por partição (a chave de particionamento
+teria de fazer parte de um índice único global); a unicidade global fica em
+bet_transactions (ver seamless_wallet), cujas linhas dos meses arquivados são
+removidas junto com o arquivamento. No SQLite bets é uma tabela comum e tudo
+aqui é no-op.
+"""
+import asyncio
+import os
+import re
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from database import async_engine
+
+BETS_PARTITION_MONTHS_AHEAD = int(os.getenv("BETS_PARTITION_MONTHS_AHEAD", "3"))
+BETS_RETENTION_MONTHS = int(os.getenv("BETS_RETENTION_MONTHS", "12"))
+BETS_PARTITION_CHECK_SECONDS = float(os.getenv("BETS_PARTITION_CHECK_SECONDS", "21600"))
+# DDL de partição espera no máximo isso pelos locks; se não conseguir, tenta no próximo ciclo
+BETS_PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("BETS_PARTITION_LOCK_TIMEOUT_MS", "5000"))
+
+PARENT = "bets"
+DEFAULT_PARTITION = "bets_default"
+ARCHIVE_SCHEMA = "bets_archive"
+# Um worker por vez faz a manutenção (pg_try_advisory_xact_lock)
+MAINTENANCE_LOCK_ID = 7_340_013
+
+Partition = Tuple[str, Optional[datetime], Optional[datetime]]
+
+_RANGE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def _literal(moment: datetime) -> str:
+    return f"'{moment.isoformat(sep=' ')}'"
+
+
+def _bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": PARENT}).scalar()
+
+
+def partitions(conn: Connection) -> List[Partition]:
+    """(nome, início, fim) das partições de bets por início; None = sem limite. A DEFAULT fica de fora."""
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": PARENT}).all()
+    result = []
+    for name, bound in rows:
+        match = _RANGE.search(bound)
+        if match:
+            result.append((name, _bound(match.group(1)), _bound(match.group(2))))
+    return sorted(result, key=lambda p: p[1] or datetime.min)
+
+
+def _lock_timeout(conn: Connection) -> None:
+    conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{BETS_PARTITION_LOCK_TIMEOUT_MS}ms'")
+
+
+def _create_partition(conn: Connection, start: datetime, end: datetime) -> str:
+    name, lo, hi = partition_name(start), _literal(start), _literal(end)
+    # Tabela avulsa com um CHECK do intervalo: o ATTACH não precisa varrê-la e só pega
+    # SHARE UPDATE EXCLUSIVE em bets (leituras e escritas continuam)
+    conn.exec_driver_sql(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+    conn.exec_driver_sql(f"ALTER TABLE {name} ADD CONSTRAINT {name}_range "
+                         f"CHECK (created_at >= {lo} AND created_at < {hi})")
+    conn.exec_driver_sql(f"ALTER TABLE {name} ADD CONSTRAINT {name}_transaction_id_key UNIQUE (transaction_id)")
+    # Apostas que caíram na DEFAULT enquanto o mês não tinha partição; o lock impede que
+    # caiam outras até o ATTACH (que falharia ao achá-las lá)
+    conn.exec_driver_sql(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE")
+    conn.exec_driver_sql(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= {lo} AND created_at < {hi} RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """)
+    conn.exec_driver_sql(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ({lo}) TO ({hi})")
+    conn.exec_driver_sql(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range")
+    return name
+
+
+def ensure_partitions(
+    conn: Connection, months_ahead: int = BETS_PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None
+) -> List[str]:
+    """Cria as partições que faltam do mês atual até months_ahead meses à frente; retorna os nomes"""
+    if not is_partitioned(conn):
+        return []
+    _lock_timeout(conn)
+    existing = partitions(conn)
+    current = month_start(now or datetime.utcnow())
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        if any((lo is None or lo <= start) and (hi is None or start < hi) for _, lo, hi in existing):
+            continue
+        created.append(_create_partition(conn, start, add_months(start, 1)))
+    return created
+
+
+def archive_partitions(
+    conn: Connection, retention_months: int = BETS_RETENTION_MONTHS, now: Optional[datetime] = None
+) -> List[str]:
+    """Move para bets_archive as partições que terminam antes de retention_months meses atrás"""
+    if retention_months <= 0 or not is_partitioned(conn):
+        return []
+    _lock_timeout(conn)
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    archived = []
+    for name, _, end in partitions(conn):
+        if end is None or end > cutoff:
+            continue
+        conn.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+        conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+        conn.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+        archived.append(name)
+    if archived:
+        # Re-tentativas de callback não chegam meses depois: as reservas desses meses já não servem
+        conn.execute(text("DELETE FROM bet_transactions WHERE created_at < :cutoff"), {"cutoff": cutoff})
+    return archived
+
+
+def archived_partitions(conn: Connection) -> List[str]:
+    """Tabelas já arquivadas em bets_archive"""
+    if conn.dialect.name != "postgresql":
+        return []
+    return conn.execute(text(
+        "SELECT tablename FROM pg_tables WHERE schemaname = :schema ORDER BY tablename"
+    ), {"schema": ARCHIVE_SCHEMA}).scalars().all()
+
+
+class PartitionMaintenance:
+    """Cria e arquiva partições de bets periodicamente, em background"""
+
+    def __init__(self, interval: float = BETS_PARTITION_CHECK_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _locked(self, step: Callable[[Connection], List[str]]) -> List[str]:
+        async with async_engine.begin() as conn:
+            if not await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": MAINTENANCE_LOCK_ID}):
+                return []  # outro worker está cuidando
+            return await conn.run_sync(step)
+
+    async def run_once(self) -> Tuple[List[str], List[str]]:
+        """(partições criadas, partições arquivadas); cada etapa na sua transação"""
+        return await self._locked(ensure_partitions), await self._locked(archive_partitions)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                created, archived = await self.run_once()
+                if created:
+                    print(f"Partições de apostas criadas: {', '.join(created)}")
+                if archived:
+                    print(f"Partições de apostas arquivadas em {ARCHIVE_SCHEMA}: {', '.join(archived)}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro na manutenção das partições de apostas: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is not None or async_engine.dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+partition_maintenance = PartitionMaintenance()
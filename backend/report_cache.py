@@ -0,0 +1,55 @@
+"""
+Cache em processo dos relatórios do admin (/stats, /ggr/report).
+
+Vários operadores deixam o dashboard aberto fazendo polling; com o cache, a
+agregação de cada combinação (relatório + parâmetros normalizados) roda no
+máximo uma vez por REPORT_CACHE_TTL por worker. Passado o TTL, o resultado
+anterior continua sendo servido por até REPORT_CACHE_STALE_SECONDS enquanto uma
+única tarefa recalcula em background. ?refresh=true força o recálculo.
+
+Os cálculos abrem a própria sessão do pool de relatórios: acertos no cache não
+ocupam conexão, e o recálculo em background não depende da requisição que o
+disparou.
+"""
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import StaleWhileRevalidateCache
+from database import ReportSessionLocal
+
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", "30"))
+REPORT_CACHE_STALE_SECONDS = float(os.getenv("REPORT_CACHE_STALE_SECONDS", "300"))
+
+report_cache = StaleWhileRevalidateCache(maxsize=256, ttl=REPORT_CACHE_TTL, stale_ttl=REPORT_CACHE_STALE_SECONDS)
+
+
+async def cached_report(
+    name: str,
+    params: Dict[str, Optional[str]],
+    compute: Callable[[AsyncSession], Awaitable[Dict[str, Any]]],
+    refresh: bool = False,
+    response: Optional[Response] = None,
+) -> Dict[str, Any]:
+    """Resultado de compute (em cache por name + params) com os metadados do cache em "cache" """
+    async def load():
+        async with ReportSessionLocal() as db:
+            return await compute(db)
+
+    key = (name, tuple(sorted(params.items())))
+    value, age, computed_at, status = await report_cache.get_or_load(key, load, refresh=refresh)
+    if response is not None:
+        response.headers["Age"] = str(int(age))
+        response.headers["X-Cache"] = status.upper()
+    return {
+        **value,
+        "cache": {
+            "status": status,
+            "age_seconds": round(age, 3),
+            "computed_at": datetime.utcfromtimestamp(computed_at).isoformat(),
+            "ttl_seconds": REPORT_CACHE_TTL,
+        },
+    }
@@ -0,0 +1,266 @@
+"""
+Agregados diários (daily_rollups) de depósitos, saques, apostas e FTDs.
+
+Cada linha soma count/amount/win_amount das transações de um dia (UTC, por
+created_at), métrica, status e gateway (depósitos/saques) ou provider (apostas).
+Um listener de after_flush compara o estado antigo e o novo de cada transação
+inserida, alterada ou removida na sessão e aplica a diferença com um upsert na
+mesma transação: aprovar um depósito move 1 (e o valor) do balde PENDING para o
+APPROVED daquele dia. Assim /stats e /ggr/report leem O(dias) linhas em vez de
+varrer as tabelas de transações.
+
+Inserções feitas fora do ORM (INSERT/UPDATE em massa) não passam pelo listener:
+quem as faz aplica insert_deltas() na mesma transação (como o buffer de apostas
+da carteira seamless); para o backfill inicial, use rebuild()
+(scripts/rebuild_rollups.py).
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, attributes
+
+from models import FTD, Bet, DailyRollup, Deposit, Withdrawal
+
+DEPOSIT = "deposit"
+WITHDRAWAL = "withdrawal"
+BET = "bet"
+FTD_METRIC = "ftd"
+
+_METRICS = {Deposit: DEPOSIT, Withdrawal: WITHDRAWAL, Bet: BET, FTD: FTD_METRIC}
+_MODELS = {metric: model for model, metric in _METRICS.items()}
+
+# Atributos que definem o balde e os valores de uma transação
+_TRACKED = ("status", "amount", "created_at", "gateway_id", "provider", "win_amount")
+
+Key = Tuple[date, str, str, int, str]
+
+
+def business_day(moment: Optional[datetime] = None) -> date:
+    """Dia de negócio de moment (padrão: agora): o dia UTC dos baldes, usado como "hoje" nos relatórios"""
+    return (moment or datetime.utcnow()).date()
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _status_name(status) -> str:
+    return getattr(status, "name", status) or ""
+
+
+def _bucket(metric: str, value) -> Tuple[Key, Tuple[int, float, float]]:
+    """(chave do balde, (count, amount, win_amount)) de uma transação; value(attr) lê o estado desejado"""
+    created_at = value("created_at") or datetime.utcnow()
+    key = (
+        created_at.date(),
+        metric,
+        _status_name(value("status")),
+        value("gateway_id") or 0,
+        value("provider") or "",
+    )
+    return key, (1, value("amount") or 0.0, value("win_amount") or 0.0)
+
+
+def _current(obj):
+    return lambda attr: getattr(obj, attr, None)
+
+
+def _previous(obj):
+    def value(attr):
+        if not hasattr(type(obj), attr):
+            return None
+        history = attributes.get_history(obj, attr)
+        if history.deleted:
+            return history.deleted[0]
+        if history.unchanged:
+            return history.unchanged[0]
+        return getattr(obj, attr)
+    return value
+
+
+def _add(deltas: Dict[Key, list], bucket, sign: int) -> None:
+    key, values = bucket
+    delta = deltas.setdefault(key, [0, 0.0, 0.0])
+    for i, v in enumerate(values):
+        delta[i] += sign * v
+
+
+def collect_deltas(session: Session) -> Dict[Key, list]:
+    """Diferenças de rollup das transações pendentes de flush na sessão"""
+    deltas: Dict[Key, list] = {}
+    for obj in session.new:
+        if type(obj) in _METRICS:
+            _add(deltas, _bucket(_METRICS[type(obj)], _current(obj)), +1)
+    for obj in session.dirty:
+        if type(obj) in _METRICS and session.is_modified(obj, include_collections=False):
+            metric = _METRICS[type(obj)]
+            old, new = _bucket(metric, _previous(obj)), _bucket(metric, _current(obj))
+            if old != new:
+                _add(deltas, old, -1)
+                _add(deltas, new, +1)
+    for obj in session.deleted:
+        if type(obj) in _METRICS:
+            _add(deltas, _bucket(_METRICS[type(obj)], _previous(obj)), -1)
+    return _nonzero(deltas)
+
+
+def insert_deltas(model, rows: List[dict]) -> Dict[Key, list]:
+    """Diferenças de rollup de linhas de model inseridas em massa (fora do ORM)"""
+    deltas: Dict[Key, list] = {}
+    for row in rows:
+        _add(deltas, _bucket(_METRICS[model], row.get), +1)
+    return _nonzero(deltas)
+
+
+def _nonzero(deltas: Dict[Key, list]) -> Dict[Key, list]:
+    return {
+        key: delta for key, delta in deltas.items()
+        if delta[0] or abs(delta[1]) > 1e-9 or abs(delta[2]) > 1e-9
+    }
+
+
+def apply_deltas(conn: Connection, deltas: Dict[Key, list]) -> None:
+    """Upsert das diferenças; chaves em ordem fixa para transações concorrentes não se travarem"""
+    insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    for key in sorted(deltas):
+        day, metric, status, gateway_id, provider = key
+        count, amount, win_amount = deltas[key]
+        stmt = insert(DailyRollup).values(
+            day=day, metric=metric, status=status, gateway_id=gateway_id, provider=provider,
+            count=count, amount=amount, win_amount=win_amount,
+        )
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "metric", "status", "gateway_id", "provider"],
+            set_={
+                "count": DailyRollup.count + stmt.excluded.count,
+                "amount": DailyRollup.amount + stmt.excluded.amount,
+                "win_amount": DailyRollup.win_amount + stmt.excluded.win_amount,
+            },
+        ))
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+# Carrega o valor antigo mesmo se o atributo estiver expirado ao ser alterado
+for _model in _METRICS:
+    for _attr in _TRACKED:
+        if hasattr(_model, _attr):
+            event.listen(getattr(_model, _attr), "set", lambda *args: None, active_history=True)
+
+
+def rebuild(conn: Connection, start_day: Optional[date] = None, end_day: Optional[date] = None) -> int:
+    """Recalcula os rollups de [start_day, end_day] (tudo se omitidos) a partir das tabelas brutas"""
+    if conn.dialect.name == "postgresql":
+        # Incrementos concorrentes esperam o recálculo e são aplicados por cima dele
+        conn.execute(text("LOCK TABLE daily_rollups IN EXCLUSIVE MODE"))
+
+    clear = delete(DailyRollup)
+    if start_day:
+        clear = clear.where(DailyRollup.day >= start_day)
+    if end_day:
+        clear = clear.where(DailyRollup.day <= end_day)
+    conn.execute(clear)
+
+    # (modelo, métrica, gateway_id, provider, win_amount, colunas extras do GROUP BY);
+    # constantes inline para o mesmo COALESCE do SELECT bater com o do GROUP BY no Postgres
+    zero, empty = literal_column("0"), literal_column("''")
+    deposit_gateway = func.coalesce(Deposit.gateway_id, zero)
+    withdrawal_gateway = func.coalesce(Withdrawal.gateway_id, zero)
+    bet_provider = func.coalesce(Bet.provider, empty)
+    sources = (
+        (Deposit, DEPOSIT, deposit_gateway, empty, literal(0.0), [deposit_gateway]),
+        (Withdrawal, WITHDRAWAL, withdrawal_gateway, empty, literal(0.0), [withdrawal_gateway]),
+        (Bet, BET, zero, bet_provider, func.sum(func.coalesce(Bet.win_amount, 0.0)), [bet_provider]),
+        (FTD, FTD_METRIC, zero, empty, literal(0.0), []),
+    )
+    rows = 0
+    for model, metric, gateway_id, provider, win_amount, group_by in sources:
+        day = func.date(model.created_at)
+        query = select(
+            day, literal(metric), model.status, gateway_id, provider,
+            func.count(), func.sum(model.amount), win_amount,
+        )
+        if start_day:
+            query = query.where(model.created_at >= day_start(start_day))
+        if end_day:
+            query = query.where(model.created_at < day_start(end_day + timedelta(days=1)))
+        query = query.group_by(day, model.status, *group_by)
+        result = conn.execute(DailyRollup.__table__.insert().from_select(
+            ["day", "metric", "status", "gateway_id", "provider", "count", "amount", "win_amount"], query
+        ))
+        rows += max(result.rowcount or 0, 0)
+    return rows
+
+
+async def totals(
+    db: AsyncSession,
+    metric: str,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+) -> Dict[str, Tuple[int, float, float]]:
+    """{status: (count, amount, win_amount)} de metric entre start_day e end_day (inclusive)"""
+    query = (
+        select(DailyRollup.status, func.sum(DailyRollup.count), func.sum(DailyRollup.amount),
+               func.sum(DailyRollup.win_amount))
+        .where(DailyRollup.metric == metric)
+        .group_by(DailyRollup.status)
+    )
+    if start_day:
+        query = query.where(DailyRollup.day >= start_day)
+    if end_day:
+        query = query.where(DailyRollup.day <= end_day)
+    rows = (await db.execute(query)).all()
+    return {status: (count or 0, amount or 0.0, win or 0.0) for status, count, amount, win in rows}
+
+
+def split_period(
+    start: datetime, end: datetime, now: Optional[datetime] = None
+) -> Tuple[Optional[Tuple[date, date]], List[Tuple[datetime, datetime, bool]]]:
+    """Divide [start, end] em dias inteiros (lidos dos rollups) e pontas parciais (lidas das tabelas).
+
+    Retorna ((primeiro_dia, último_dia) ou None, [(de, até, até_inclusive), ...]). Se end já
+    passou de agora, o dia de end conta como inteiro: não há transações depois de agora.
+    """
+    if end < start:
+        return None, []
+    now = now or datetime.utcnow()
+    first = start.date() if start == day_start(start.date()) else start.date() + timedelta(days=1)
+    last = end.date() if end >= now else end.date() - timedelta(days=1)
+    if first > last:
+        return None, [(start, end, True)]
+    partial = []
+    if start < day_start(first):
+        partial.append((start, day_start(first), False))
+    if end < now:
+        partial.append((day_start(end.date()), end, True))
+    return (first, last), partial
+
+
+async def period_totals(
+    db: AsyncSession, metric: str, start: datetime, end: datetime
+) -> Dict[str, Tuple[int, float, float]]:
+    """Como totals(), para as transações com start <= created_at <= end (datetimes UTC)"""
+    days, partial = split_period(start, end)
+    result = await totals(db, metric, *days) if days else {}
+    model = _MODELS[metric]
+    win_amount = func.sum(model.win_amount) if metric == BET else literal(0.0)
+    for lo, hi, inclusive in partial:
+        rows = (await db.execute(
+            select(model.status, func.count(), func.sum(model.amount), win_amount)
+            .where(model.created_at >= lo, model.created_at <= hi if inclusive else model.created_at < hi)
+            .group_by(model.status)
+        )).all()
+        for status, count, amount, win in rows:
+            c, a, w = result.get(status.name, (0, 0.0, 0.0))
+            result[status.name] = (c + count, a + (amount or 0.0), w + (win or 0.0))
+    return result
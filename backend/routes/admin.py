@@ -1,53 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import func, select
 from sqlalchemy import desc
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 import json
 
-from database import get_db
-from dependencies import get_current_admin_user, get_current_user
+from database import get_async_db, get_pool_metrics
+from dependencies import get_current_admin_user, get_current_principal, invalidate_principal, Principal
 from models import (
     User, Deposit, Withdrawal, FTD, Gateway, IGameWinAgent, FTDSettings,
-    TransactionStatus, UserRole, Bet, BetStatus, Notification, NotificationType
+    TransactionStatus, UserRole, Bet, BetStatus, Notification, NotificationType,
+    WebhookInbox, WebhookStatus, LedgerEntryType, DailyRollup
 )
 from schemas import (
-    UserResponse, UserCreate, UserUpdate, AddBalanceRequest,
-    DepositResponse, DepositCreate, DepositUpdate,
-    WithdrawalResponse, WithdrawalCreate, WithdrawalUpdate,
+    UserResponse, UserListItem, UserCreate, UserUpdate, AddBalanceRequest,
+    DepositResponse, DepositDetailResponse, DepositListItem, DepositCreate, DepositUpdate, GatewayPayloadResponse,
+    WithdrawalResponse, WithdrawalDetailResponse, WithdrawalListItem, WithdrawalCreate, WithdrawalUpdate,
     FTDResponse, FTDCreate, FTDUpdate,
     GatewayResponse, GatewayCreate, GatewayUpdate,
     IGameWinAgentResponse, IGameWinAgentCreate, IGameWinAgentUpdate,
-    FTDSettingsResponse, FTDSettingsCreate, FTDSettingsUpdate
+    FTDSettingsResponse, FTDSettingsCreate, FTDSettingsUpdate,
+    WebhookInboxResponse, BetListItem, NotificationListItem
 )
-from auth import get_password_hash
+from auth import hash_password
+import rollups
+import wallet
+import gateway_payloads
 from igamewin_api import get_igamewin_api
+from game_catalog import catalog, choose_provider, provider_code_of
+from config_cache import config_cache, IGAMEWIN_AGENT, PIX_GATEWAY
+from report_cache import cached_report
+from pagination import columns, paginate_rows
+from exports import FORMAT_PATTERN, export_response
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 public_router = APIRouter(prefix="/api/public", tags=["public"])
 
 
+def parse_datetime(value: str) -> datetime:
+    """Data/hora ISO 8601 da query string em UTC sem fuso (como created_at é gravado); 400 se inválida"""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Data inválida: {value}")
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+def filter_period(query, model, start_date: Optional[str], end_date: Optional[str]):
+    """Filtra query por start_date <= created_at < end_date (no Postgres, só as partições do período de bets)"""
+    if start_date:
+        query = query.where(model.created_at >= parse_datetime(start_date))
+    if end_date:
+        query = query.where(model.created_at < parse_datetime(end_date))
+    return query
+
+
+def export_period(query, model, start_date: Optional[str], end_date: Optional[str]):
+    """Filtra query por start_date <= created_at < end_date, em ordem cronológica"""
+    return filter_period(query, model, start_date, end_date).order_by(model.created_at, model.id)
+
+
 # ========== USERS ==========
-@router.get("/users", response_model=List[UserResponse])
+@router.get("/users", response_model=List[UserListItem])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    users = db.query(User).offset(skip).limit(limit).all()
+    # Sem cursor, a ordem de sempre (id); ?cursor= (mesmo vazio) pagina por created_at DESC
+    users = await paginate_rows(
+        db, select(*columns(User, UserListItem)), User, skip, limit, cursor, response, offset_order=[User.id]
+    )
     return users
 
 
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -56,13 +95,13 @@ async def get_user(
 @router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     # Check if username or email already exists
-    existing_user = db.query(User).filter(
+    existing_user = await db.scalar(select(User).where(
         (User.username == user_data.username) | (User.email == user_data.email)
-    ).first()
+    ).limit(1))
     if existing_user:
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
@@ -71,15 +110,15 @@ async def create_user(
         email=user_data.email,
         cpf=user_data.cpf,
         phone=user_data.phone,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=await hash_password(user_data.password),
         role=UserRole.USER,
         balance=0.0,
         is_active=True,
         is_verified=False
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
@@ -87,19 +126,24 @@ async def create_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    previous_username = user.username
     update_data = user_data.model_dump(exclude_unset=True)
+    new_balance = update_data.pop("balance", None)
     for field, value in update_data.items():
         setattr(user, field, value)
+    if new_balance is not None:
+        await wallet.set_balance(db, user.id, new_balance, description="Saldo definido pelo admin")
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await invalidate_principal(db, previous_username)
+    await db.refresh(user)
     return user
 
 
@@ -107,73 +151,112 @@ async def update_user(
 async def add_user_balance(
     user_id: int,
     data: AddBalanceRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    """Adicionar saldo manualmente a um usuário (apenas admin)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    """Adicionar saldo manualmente a um usuário (apenas admin).
+
+    Com Idempotency-Key (header ou idempotency_key no corpo), re-envios da mesma
+    chave não creditam de novo.
+    """
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if data.amount <= 0:
         raise HTTPException(status_code=400, detail="O valor deve ser maior que zero")
-    user.balance += data.amount
-    db.commit()
-    db.refresh(user)
+    key = idempotency_key or data.idempotency_key
+    await wallet.credit(
+        db, user.id, data.amount, LedgerEntryType.ADJUSTMENT,
+        reference_type="admin", description=data.reason or "Saldo adicionado pelo admin",
+        idempotency_key=f"admin:{user.id}:add-balance:{key}" if key else None
+    )
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    username = user.username
+    await db.delete(user)
+    await db.commit()
+    await invalidate_principal(db, username)
     return None
 
 
 # ========== DEPOSITS ==========
-@router.get("/deposits", response_model=List[DepositResponse])
+@router.get("/deposits", response_model=List[DepositListItem])
 async def get_deposits(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     status_filter: Optional[TransactionStatus] = None,
     user_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    query = db.query(Deposit)
+    query = select(*columns(Deposit, DepositListItem))
     if status_filter:
-        query = query.filter(Deposit.status == status_filter)
+        query = query.where(Deposit.status == status_filter)
     if user_id:
-        query = query.filter(Deposit.user_id == user_id)
-    deposits = query.order_by(desc(Deposit.created_at)).offset(skip).limit(limit).all()
+        query = query.where(Deposit.user_id == user_id)
+    deposits = await paginate_rows(db, query, Deposit, skip, limit, cursor, response)
     return deposits
 
 
-@router.get("/deposits/{deposit_id}", response_model=DepositResponse)
+@router.get("/deposits/export")
+async def export_deposits(
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status_filter: Optional[TransactionStatus] = None,
+    user_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Exportar depósitos em streaming (CSV ou NDJSON), com os filtros da listagem e período [start_date, end_date)"""
+    query = select(
+        Deposit.id, Deposit.user_id, Deposit.gateway_id, Deposit.amount, Deposit.status,
+        Deposit.transaction_id, Deposit.external_id, Deposit.created_at, Deposit.updated_at,
+    )
+    if status_filter:
+        query = query.where(Deposit.status == status_filter)
+    if user_id:
+        query = query.where(Deposit.user_id == user_id)
+    return export_response(export_period(query, Deposit, start_date, end_date), "deposits", format)
+
+
+@router.get("/deposits/{deposit_id}", response_model=DepositDetailResponse)
 async def get_deposit(
     deposit_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    deposit = db.query(Deposit).filter(Deposit.id == deposit_id).first()
+    """Depósito com os payloads do gateway (resposta da criação e webhooks)"""
+    deposit = await db.get(Deposit, deposit_id)
     if not deposit:
         raise HTTPException(status_code=404, detail="Deposit not found")
-    return deposit
+    payloads = await gateway_payloads.load(db, "deposit", deposit.id)
+    return DepositDetailResponse.model_validate(deposit).model_copy(
+        update={"payloads": [GatewayPayloadResponse(**p) for p in payloads]}
+    )
 
 
 @router.post("/deposits", response_model=DepositResponse, status_code=status.HTTP_201_CREATED)
 async def create_deposit(
     deposit_data: DepositCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == deposit_data.user_id).first()
+    user = await db.get(User, deposit_data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -187,8 +270,8 @@ async def create_deposit(
         metadata_json=deposit_data.metadata_json
     )
     db.add(deposit)
-    db.commit()
-    db.refresh(deposit)
+    await db.commit()
+    await db.refresh(deposit)
     return deposit
 
 
@@ -196,27 +279,30 @@ async def create_deposit(
 async def update_deposit(
     deposit_id: int,
     deposit_data: DepositUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    deposit = db.query(Deposit).filter(Deposit.id == deposit_id).first()
+    deposit = await db.get(Deposit, deposit_id)
     if not deposit:
         raise HTTPException(status_code=404, detail="Deposit not found")
     
+    was_approved = deposit.status == TransactionStatus.APPROVED
     update_data = deposit_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(deposit, field, value)
     
     # If approved, update user balance
-    if deposit_data.status == TransactionStatus.APPROVED and deposit.status != TransactionStatus.APPROVED:
-        user = db.query(User).filter(User.id == deposit.user_id).first()
-        user.balance += deposit.amount
+    if deposit_data.status == TransactionStatus.APPROVED and not was_approved:
+        await wallet.credit(
+            db, deposit.user_id, deposit.amount, LedgerEntryType.DEPOSIT,
+            reference_type="deposit", reference_id=deposit.id, idempotency_key=f"deposit:{deposit.id}:credit"
+        )
         
         # Check if this is first deposit (FTD)
-        existing_ftd = db.query(FTD).filter(FTD.user_id == deposit.user_id).first()
+        existing_ftd = await db.scalar(select(FTD).where(FTD.user_id == deposit.user_id).limit(1))
         if not existing_ftd:
             # Create FTD
-            ftd_settings = db.query(FTDSettings).filter(FTDSettings.is_active == True).first()
+            ftd_settings = await db.scalar(select(FTDSettings).where(FTDSettings.is_active == True).limit(1))
             pass_rate = ftd_settings.pass_rate if ftd_settings else 0.0
             
             ftd = FTD(
@@ -229,49 +315,76 @@ async def update_deposit(
             )
             db.add(ftd)
     
-    db.commit()
-    db.refresh(deposit)
+    await db.commit()
+    await db.refresh(deposit)
     return deposit
 
 
 # ========== WITHDRAWALS ==========
-@router.get("/withdrawals", response_model=List[WithdrawalResponse])
+@router.get("/withdrawals", response_model=List[WithdrawalListItem])
 async def get_withdrawals(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     status_filter: Optional[TransactionStatus] = None,
     user_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    query = db.query(Withdrawal)
+    query = select(*columns(Withdrawal, WithdrawalListItem))
     if status_filter:
-        query = query.filter(Withdrawal.status == status_filter)
+        query = query.where(Withdrawal.status == status_filter)
     if user_id:
-        query = query.filter(Withdrawal.user_id == user_id)
-    withdrawals = query.order_by(desc(Withdrawal.created_at)).offset(skip).limit(limit).all()
+        query = query.where(Withdrawal.user_id == user_id)
+    withdrawals = await paginate_rows(db, query, Withdrawal, skip, limit, cursor, response)
     return withdrawals
 
 
-@router.get("/withdrawals/{withdrawal_id}", response_model=WithdrawalResponse)
+@router.get("/withdrawals/export")
+async def export_withdrawals(
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status_filter: Optional[TransactionStatus] = None,
+    user_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Exportar saques em streaming (CSV ou NDJSON), com os filtros da listagem e período [start_date, end_date)"""
+    query = select(
+        Withdrawal.id, Withdrawal.user_id, Withdrawal.gateway_id, Withdrawal.amount, Withdrawal.status,
+        Withdrawal.transaction_id, Withdrawal.external_id, Withdrawal.created_at, Withdrawal.updated_at,
+    )
+    if status_filter:
+        query = query.where(Withdrawal.status == status_filter)
+    if user_id:
+        query = query.where(Withdrawal.user_id == user_id)
+    return export_response(export_period(query, Withdrawal, start_date, end_date), "withdrawals", format)
+
+
+@router.get("/withdrawals/{withdrawal_id}", response_model=WithdrawalDetailResponse)
 async def get_withdrawal(
     withdrawal_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    withdrawal = db.query(Withdrawal).filter(Withdrawal.id == withdrawal_id).first()
+    """Saque com os payloads do gateway (resposta da transferência e webhooks)"""
+    withdrawal = await db.get(Withdrawal, withdrawal_id)
     if not withdrawal:
         raise HTTPException(status_code=404, detail="Withdrawal not found")
-    return withdrawal
+    payloads = await gateway_payloads.load(db, "withdrawal", withdrawal.id)
+    return WithdrawalDetailResponse.model_validate(withdrawal).model_copy(
+        update={"payloads": [GatewayPayloadResponse(**p) for p in payloads]}
+    )
 
 
 @router.post("/withdrawals", response_model=WithdrawalResponse, status_code=status.HTTP_201_CREATED)
 async def create_withdrawal(
     withdrawal_data: WithdrawalCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(User).filter(User.id == withdrawal_data.user_id).first()
+    user = await db.get(User, withdrawal_data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -288,8 +401,8 @@ async def create_withdrawal(
         metadata_json=withdrawal_data.metadata_json
     )
     db.add(withdrawal)
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     return withdrawal
 
 
@@ -297,57 +410,79 @@ async def create_withdrawal(
 async def update_withdrawal(
     withdrawal_id: int,
     withdrawal_data: WithdrawalUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    withdrawal = db.query(Withdrawal).filter(Withdrawal.id == withdrawal_id).first()
+    # Lock na linha: aprovações/estornos simultâneos (e o webhook de Cash-out) esperam este
+    withdrawal = await db.scalar(select(Withdrawal).where(Withdrawal.id == withdrawal_id).with_for_update())
     if not withdrawal:
         raise HTTPException(status_code=404, detail="Withdrawal not found")
     
     update_data = withdrawal_data.model_dump(exclude_unset=True)
     
-    # If approved, deduct from user balance
+    # O débito pode já existir: saques PIX debitam na criação (mesmas chaves de payments.py).
+    # has_entry também cobre lançamentos anteriores às chaves de idempotência.
+    debited = await wallet.has_entry(
+        db, withdrawal.user_id, LedgerEntryType.WITHDRAWAL, "withdrawal", withdrawal.id
+    )
+    refunded = await wallet.has_entry(
+        db, withdrawal.user_id, LedgerEntryType.WITHDRAWAL_REFUND, "withdrawal", withdrawal.id
+    )
+    
+    # If approved, deduct from user balance (once)
     if withdrawal_data.status == TransactionStatus.APPROVED and withdrawal.status != TransactionStatus.APPROVED:
-        user = db.query(User).filter(User.id == withdrawal.user_id).first()
-        if user.balance < withdrawal.amount:
-            raise HTTPException(status_code=400, detail="Insufficient balance")
-        user.balance -= withdrawal.amount
-    # If rejected or cancelled and was approved, refund
-    elif withdrawal_data.status in [TransactionStatus.REJECTED, TransactionStatus.CANCELLED] and withdrawal.status == TransactionStatus.APPROVED:
-        user = db.query(User).filter(User.id == withdrawal.user_id).first()
-        user.balance += withdrawal.amount
+        if refunded:
+            raise HTTPException(status_code=400, detail="Saque já estornado; crie um novo saque")
+        if not debited:
+            try:
+                await wallet.debit(
+                    db, withdrawal.user_id, withdrawal.amount, LedgerEntryType.WITHDRAWAL,
+                    reference_type="withdrawal", reference_id=withdrawal.id,
+                    idempotency_key=f"withdrawal:{withdrawal.id}:debit"
+                )
+            except wallet.InsufficientFunds:
+                raise HTTPException(status_code=400, detail="Insufficient balance")
+    # If rejected or cancelled and the balance was deducted, refund (once)
+    elif withdrawal_data.status in [TransactionStatus.REJECTED, TransactionStatus.CANCELLED] and debited and not refunded:
+        await wallet.credit(
+            db, withdrawal.user_id, withdrawal.amount, LedgerEntryType.WITHDRAWAL_REFUND,
+            reference_type="withdrawal", reference_id=withdrawal.id,
+            idempotency_key=f"withdrawal:{withdrawal.id}:refund"
+        )
     
     for field, value in update_data.items():
         setattr(withdrawal, field, value)
     
-    db.commit()
-    db.refresh(withdrawal)
+    await db.commit()
+    await db.refresh(withdrawal)
     return withdrawal
 
 
 # ========== FTDs ==========
 @router.get("/ftds", response_model=List[FTDResponse])
 async def get_ftds(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     user_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    query = db.query(FTD)
+    query = select(*columns(FTD, FTDResponse))
     if user_id:
-        query = query.filter(FTD.user_id == user_id)
-    ftds = query.order_by(desc(FTD.created_at)).offset(skip).limit(limit).all()
+        query = query.where(FTD.user_id == user_id)
+    ftds = await paginate_rows(db, query, FTD, skip, limit, cursor, response)
     return ftds
 
 
 @router.get("/ftds/{ftd_id}", response_model=FTDResponse)
 async def get_ftd(
     ftd_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    ftd = db.query(FTD).filter(FTD.id == ftd_id).first()
+    ftd = await db.get(FTD, ftd_id)
     if not ftd:
         raise HTTPException(status_code=404, detail="FTD not found")
     return ftd
@@ -357,10 +492,10 @@ async def get_ftd(
 async def update_ftd(
     ftd_id: int,
     ftd_data: FTDUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    ftd = db.query(FTD).filter(FTD.id == ftd_id).first()
+    ftd = await db.get(FTD, ftd_id)
     if not ftd:
         raise HTTPException(status_code=404, detail="FTD not found")
     
@@ -368,33 +503,33 @@ async def update_ftd(
     for field, value in update_data.items():
         setattr(ftd, field, value)
     
-    db.commit()
-    db.refresh(ftd)
+    await db.commit()
+    await db.refresh(ftd)
     return ftd
 
 
 @router.get("/ftd-settings", response_model=FTDSettingsResponse)
 async def get_ftd_settings(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    settings = db.query(FTDSettings).filter(FTDSettings.is_active == True).first()
+    settings = await db.scalar(select(FTDSettings).where(FTDSettings.is_active == True).limit(1))
     if not settings:
         # Create default settings
         settings = FTDSettings(pass_rate=0.0, min_amount=0.0, is_active=True)
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
     return settings
 
 
 @router.put("/ftd-settings", response_model=FTDSettingsResponse)
 async def update_ftd_settings(
     settings_data: FTDSettingsUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    settings = db.query(FTDSettings).filter(FTDSettings.is_active == True).first()
+    settings = await db.scalar(select(FTDSettings).where(FTDSettings.is_active == True).limit(1))
     if not settings:
         settings = FTDSettings(**settings_data.model_dump())
         db.add(settings)
@@ -403,28 +538,28 @@ async def update_ftd_settings(
         for field, value in update_data.items():
             setattr(settings, field, value)
     
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
     return settings
 
 
 # ========== GATEWAYS ==========
 @router.get("/gateways", response_model=List[GatewayResponse])
 async def get_gateways(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    gateways = db.query(Gateway).all()
+    gateways = (await db.scalars(select(Gateway))).all()
     return gateways
 
 
 @router.get("/gateways/{gateway_id}", response_model=GatewayResponse)
 async def get_gateway(
     gateway_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+    gateway = await db.get(Gateway, gateway_id)
     if not gateway:
         raise HTTPException(status_code=404, detail="Gateway not found")
     return gateway
@@ -433,17 +568,18 @@ async def get_gateway(
 @router.post("/gateways", response_model=GatewayResponse, status_code=status.HTTP_201_CREATED)
 async def create_gateway(
     gateway_data: GatewayCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    existing = db.query(Gateway).filter(Gateway.name == gateway_data.name).first()
+    existing = await db.scalar(select(Gateway).where(Gateway.name == gateway_data.name).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail="Gateway name already exists")
     
     gateway = Gateway(**gateway_data.model_dump())
     db.add(gateway)
-    db.commit()
-    db.refresh(gateway)
+    await db.commit()
+    await config_cache.publish(db, PIX_GATEWAY)
+    await db.refresh(gateway)
     return gateway
 
 
@@ -451,10 +587,10 @@ async def create_gateway(
 async def update_gateway(
     gateway_id: int,
     gateway_data: GatewayUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+    gateway = await db.get(Gateway, gateway_id)
     if not gateway:
         raise HTTPException(status_code=404, detail="Gateway not found")
     
@@ -462,42 +598,44 @@ async def update_gateway(
     for field, value in update_data.items():
         setattr(gateway, field, value)
     
-    db.commit()
-    db.refresh(gateway)
+    await db.commit()
+    await config_cache.publish(db, PIX_GATEWAY)
+    await db.refresh(gateway)
     return gateway
 
 
 @router.delete("/gateways/{gateway_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_gateway(
     gateway_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+    gateway = await db.get(Gateway, gateway_id)
     if not gateway:
         raise HTTPException(status_code=404, detail="Gateway not found")
-    db.delete(gateway)
-    db.commit()
+    await db.delete(gateway)
+    await db.commit()
+    await config_cache.publish(db, PIX_GATEWAY)
     return None
 
 
 # ========== IGAMEWIN AGENTS ==========
 @router.get("/igamewin-agents", response_model=List[IGameWinAgentResponse])
 async def get_igamewin_agents(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    agents = db.query(IGameWinAgent).all()
+    agents = (await db.scalars(select(IGameWinAgent))).all()
     return agents
 
 
 @router.get("/igamewin-agents/{agent_id}", response_model=IGameWinAgentResponse)
 async def get_igamewin_agent(
     agent_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    agent = db.query(IGameWinAgent).filter(IGameWinAgent.id == agent_id).first()
+    agent = await db.get(IGameWinAgent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="IGameWin agent not found")
     return agent
@@ -506,17 +644,18 @@ async def get_igamewin_agent(
 @router.post("/igamewin-agents", response_model=IGameWinAgentResponse, status_code=status.HTTP_201_CREATED)
 async def create_igamewin_agent(
     agent_data: IGameWinAgentCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    existing = db.query(IGameWinAgent).filter(IGameWinAgent.agent_code == agent_data.agent_code).first()
+    existing = await db.scalar(select(IGameWinAgent).where(IGameWinAgent.agent_code == agent_data.agent_code).limit(1))
     if existing:
         raise HTTPException(status_code=400, detail="Agent code already exists")
     
     agent = IGameWinAgent(**agent_data.model_dump())
     db.add(agent)
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    await config_cache.publish(db, IGAMEWIN_AGENT)
+    await db.refresh(agent)
     return agent
 
 
@@ -524,10 +663,10 @@ async def create_igamewin_agent(
 async def update_igamewin_agent(
     agent_id: int,
     agent_data: IGameWinAgentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    agent = db.query(IGameWinAgent).filter(IGameWinAgent.id == agent_id).first()
+    agent = await db.get(IGameWinAgent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="IGameWin agent not found")
     
@@ -535,52 +674,61 @@ async def update_igamewin_agent(
     for field, value in update_data.items():
         setattr(agent, field, value)
     
-    db.commit()
-    db.refresh(agent)
+    await db.commit()
+    await config_cache.publish(db, IGAMEWIN_AGENT)
+    await db.refresh(agent)
     return agent
 
 
 @router.delete("/igamewin-agents/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_igamewin_agent(
     agent_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    agent = db.query(IGameWinAgent).filter(IGameWinAgent.id == agent_id).first()
+    agent = await db.get(IGameWinAgent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="IGameWin agent not found")
-    db.delete(agent)
-    db.commit()
+    await db.delete(agent)
+    await db.commit()
+    await config_cache.publish(db, IGAMEWIN_AGENT)
     return None
 
 
 # ========== IGAMEWIN GAMES ==========
-def _choose_provider(providers: list, provider_code: Optional[str]) -> Optional[str]:
-    chosen = provider_code
-    if not chosen:
-        active = [p for p in providers if str(p.get("status", 1)) in ["1", "true", "True"]]
-        if active:
-            chosen = active[0].get("code") or active[0].get("provider_code")
-        elif providers:
-            chosen = providers[0].get("code") or providers[0].get("provider_code")
-    return chosen
+async def _catalog_games(provider_code: Optional[str], refresh: bool = False):
+    """Provedor escolhido no catálogo local (sincroniza se ainda não houver snapshot)
 
-
-def _normalize_games(games: list, chosen_provider: Optional[str]) -> list:
-    if chosen_provider:
-        for g in games:
-            if not g.get("provider_code"):
-                g["provider_code"] = chosen_provider
-    return games
+    Só serve provedores do snapshot: um provider_code desconhecido é 404, sem chamar a IGameWin.
+    """
+    if refresh:
+        await catalog.sync(fresh=True)
+    else:
+        await catalog.ensure_loaded()
+    if not catalog.configured:
+        raise HTTPException(status_code=400, detail="Nenhum agente IGameWin ativo configurado")
+    if not catalog.loaded:
+        raise HTTPException(status_code=502, detail=catalog.last_error or "Não foi possível obter provedores da IGameWin")
+
+    chosen_provider = choose_provider(catalog.providers, provider_code)
+    if not chosen_provider or chosen_provider not in {provider_code_of(p) for p in catalog.providers}:
+        raise HTTPException(status_code=404, detail="Provedor não encontrado")
+    if chosen_provider not in catalog.games:
+        # Provedor listado cujo game_list falhou em todas as sincronizações até agora
+        raise HTTPException(
+            status_code=502,
+            detail=catalog.last_error or "Não foi possível obter jogos da IGameWin para este provedor."
+        )
+    return chosen_provider
 
 
 @router.get("/igamewin/agent-balance")
 async def get_igamewin_agent_balance(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Get IGameWin agent balance - Cannot deposit via API, must use IGameWin admin"""
-    api = get_igamewin_api(db)
+    api = await get_igamewin_api(db)
     if not api:
         raise HTTPException(status_code=400, detail="Nenhum agente IGameWin ativo configurado")
 
@@ -601,83 +749,30 @@ async def get_igamewin_agent_balance(
 @router.get("/igamewin/games")
 async def list_igamewin_games(
     provider_code: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    refresh: bool = Query(False, description="Força nova sincronização com a IGameWin"),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    api = get_igamewin_api(db)
-    if not api:
-        raise HTTPException(status_code=400, detail="Nenhum agente IGameWin ativo configurado")
-
-    providers = await api.get_providers()
-    if providers is None:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Não foi possível obter provedores da IGameWin ({api.last_error or 'erro desconhecido'})"
-        )
-
-    chosen_provider = _choose_provider(providers, provider_code)
-
-    games = await api.get_games(provider_code=chosen_provider)
-    if games is None:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Não foi possível obter jogos da IGameWin (verifique provider_code e credenciais do agente). {api.last_error or ''}".strip()
-        )
-
-    games = _normalize_games(games, chosen_provider)
+    chosen_provider = await _catalog_games(provider_code, refresh=refresh)
 
     return {
-        "providers": providers,
+        "providers": catalog.providers,
         "provider_code": chosen_provider,
-        "games": games
+        "games": catalog.games[chosen_provider],
+        "synced_at": catalog.synced_at_iso()
     }
 
 
 @public_router.get("/games")
 async def public_games(
-    provider_code: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    provider_code: Optional[str] = Query(None)
 ):
-    api = get_igamewin_api(db)
-    if not api:
-        raise HTTPException(status_code=400, detail="Nenhum agente IGameWin ativo configurado")
-
-    providers = await api.get_providers()
-    if providers is None:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Não foi possível obter provedores da IGameWin ({api.last_error or 'erro desconhecido'})"
-        )
-
-    chosen_provider = _choose_provider(providers, provider_code)
-
-    games = await api.get_games(provider_code=chosen_provider)
-    if games is None:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Não foi possível obter jogos da IGameWin (verifique provider_code e credenciais do agente). {api.last_error or ''}".strip()
-        )
-
-    games = _normalize_games(games, chosen_provider)
-
-    public_games = []
-    for g in games:
-        status_val = g.get("status")
-        is_active = (status_val == 1) or (status_val is True) or (str(status_val).lower() == "active")
-        if not is_active:
-            continue
-        public_games.append({
-            "name": g.get("game_name") or g.get("name") or g.get("title") or g.get("gameTitle"),
-            "code": g.get("game_code") or g.get("code") or g.get("game_id") or g.get("id") or g.get("slug"),
-            "provider": g.get("provider_code") or g.get("provider") or g.get("provider_name") or g.get("vendor") or g.get("vendor_name") or chosen_provider,
-            "banner": g.get("banner") or g.get("image") or g.get("icon"),
-            "status": "active"
-        })
+    chosen_provider = await _catalog_games(provider_code)
 
     return {
-        "providers": providers,
+        "providers": catalog.providers,
         "provider_code": chosen_provider,
-        "games": public_games
+        "games": catalog.public_games[chosen_provider],
+        "synced_at": catalog.synced_at_iso()
     }
 
 
@@ -686,55 +781,34 @@ async def launch_game(
     game_code: str,
     provider_code: Optional[str] = Query(None),
     lang: str = Query("pt", description="Language code"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Launch a game - requires user authentication
     
     Follows IGameWin API documentation:
     - Uses user_code (username) to launch game
     - Returns launch_url from API response
-    - If provider_code is not provided, searches for the game in the game list to find its provider
+    - If provider_code is not provided, looks the game up in the catalog game index to find its provider
     """
-    api = get_igamewin_api(db)
+    api = await get_igamewin_api(db)
     if not api:
         raise HTTPException(status_code=400, detail="Nenhum agente IGameWin ativo configurado")
     
-    # Se provider_code não foi fornecido, buscar na lista de jogos
+    # Se provider_code não foi fornecido, buscar no índice game_code -> provider do catálogo
     if not provider_code:
-        providers = await api.get_providers()
-        if providers is None:
+        game = await catalog.find_game(game_code)
+        if game:
+            provider_code = game.get("provider_code")
+        elif catalog.providers:
+            # Se não encontrou (jogo novo: find_game já agendou a sincronização em background),
+            # usar o primeiro provider ativo como fallback
+            provider_code = choose_provider(catalog.providers, None)
+        elif not catalog.loaded:
             raise HTTPException(
                 status_code=502,
-                detail=f"Não foi possível obter provedores da IGameWin ({api.last_error or 'erro desconhecido'})"
+                detail=catalog.last_error or "Não foi possível obter provedores da IGameWin"
             )
-        
-        # Tentar encontrar o jogo em cada provider
-        found_provider = None
-        for provider in providers:
-            provider_code_to_try = provider.get("code") or provider.get("provider_code")
-            if not provider_code_to_try:
-                continue
-            
-            games = await api.get_games(provider_code=provider_code_to_try)
-            if games:
-                for game in games:
-                    game_code_from_api = game.get("game_code") or game.get("code") or game.get("game_id") or game.get("id")
-                    if game_code_from_api == game_code:
-                        found_provider = provider_code_to_try
-                        break
-                if found_provider:
-                    break
-        
-        if found_provider:
-            provider_code = found_provider
-        else:
-            # Se não encontrou, usar o primeiro provider ativo como fallback
-            active_providers = [p for p in providers if str(p.get("status", 1)) in ["1", "true", "True"]]
-            if active_providers:
-                provider_code = active_providers[0].get("code") or active_providers[0].get("provider_code")
-            elif providers:
-                provider_code = providers[0].get("code") or providers[0].get("provider_code")
     
     # Se ainda não tem provider_code, retornar erro
     if not provider_code:
@@ -770,100 +844,77 @@ async def launch_game(
 # ========== STATS ==========
 @router.get("/stats")
 async def get_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    response: Response,
+    refresh: bool = Query(False, description="Ignora o cache e recalcula"),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    from datetime import date, timedelta
-    
-    today = date.today()
-    today_start = datetime.combine(today, datetime.min.time())
-    
-    # Total de usuários
-    total_users = db.query(User).count()
-    
-    # Usuários registrados hoje
-    usuarios_registrados_hoje = db.query(User).filter(
-        func.date(User.created_at) == today
-    ).count()
-    
-    # Balanço total dos jogadores com saldo
-    users_with_balance = db.query(User).filter(User.balance > 0).all()
-    balanco_jogador_total = sum(u.balance for u in users_with_balance)
-    jogadores_com_saldo = len(users_with_balance)
-    
-    # Depósitos
-    total_deposits = db.query(Deposit).filter(Deposit.status == TransactionStatus.APPROVED).count()
-    total_deposit_amount = db.query(Deposit).filter(Deposit.status == TransactionStatus.APPROVED).with_entities(
-        func.sum(Deposit.amount)
-    ).scalar() or 0.0
-    pending_deposits = db.query(Deposit).filter(Deposit.status == TransactionStatus.PENDING).count()
-    
-    # Depósitos recebidos (aprovados) hoje
-    pagamentos_recebidos_hoje = db.query(Deposit).filter(
-        Deposit.status == TransactionStatus.APPROVED,
-        func.date(Deposit.created_at) == today
-    ).count()
-    valor_pagamentos_recebidos_hoje = db.query(Deposit).filter(
-        Deposit.status == TransactionStatus.APPROVED,
-        func.date(Deposit.created_at) == today
-    ).with_entities(func.sum(Deposit.amount)).scalar() or 0.0
-    
-    # PIX recebido hoje (depósitos PIX aprovados hoje)
-    pix_recebido_hoje = db.query(Deposit).join(Gateway).filter(
-        Deposit.status == TransactionStatus.APPROVED,
-        Gateway.type == "pix",
-        func.date(Deposit.created_at) == today
-    ).with_entities(func.sum(Deposit.amount)).scalar() or 0.0
-    pix_recebido_count_hoje = db.query(Deposit).join(Gateway).filter(
-        Deposit.status == TransactionStatus.APPROVED,
-        Gateway.type == "pix",
-        func.date(Deposit.created_at) == today
-    ).count()
-    
-    # Saques
-    total_withdrawals = db.query(Withdrawal).filter(Withdrawal.status == TransactionStatus.APPROVED).count()
-    total_withdrawal_amount = db.query(Withdrawal).filter(Withdrawal.status == TransactionStatus.APPROVED).with_entities(
-        func.sum(Withdrawal.amount)
-    ).scalar() or 0.0
-    pending_withdrawals = db.query(Withdrawal).filter(Withdrawal.status == TransactionStatus.PENDING).count()
-    
-    # Pagamentos feitos (saques aprovados) hoje
-    pagamentos_feitos_hoje = db.query(Withdrawal).filter(
-        Withdrawal.status == TransactionStatus.APPROVED,
-        func.date(Withdrawal.created_at) == today
-    ).count()
-    valor_pagamentos_feitos_hoje = db.query(Withdrawal).filter(
-        Withdrawal.status == TransactionStatus.APPROVED,
-        func.date(Withdrawal.created_at) == today
-    ).with_entities(func.sum(Withdrawal.amount)).scalar() or 0.0
-    
-    # PIX feito hoje (saques PIX aprovados hoje)
-    pix_feito_hoje = db.query(Withdrawal).join(Gateway).filter(
-        Withdrawal.status == TransactionStatus.APPROVED,
-        Gateway.type == "pix",
-        func.date(Withdrawal.created_at) == today
-    ).with_entities(func.sum(Withdrawal.amount)).scalar() or 0.0
-    pix_feito_count_hoje = db.query(Withdrawal).join(Gateway).filter(
-        Withdrawal.status == TransactionStatus.APPROVED,
-        Gateway.type == "pix",
-        func.date(Withdrawal.created_at) == today
-    ).count()
-    
-    # PIX gerado hoje (pendentes ou aprovados)
-    pix_gerado_hoje = db.query(Deposit).join(Gateway).filter(
-        Gateway.type == "pix",
-        func.date(Deposit.created_at) == today
-    ).count()
-    pix_gerado_pago_hoje = db.query(Deposit).join(Gateway).filter(
-        Gateway.type == "pix",
-        Deposit.status == TransactionStatus.APPROVED,
-        func.date(Deposit.created_at) == today
-    ).count()
+    return await cached_report("stats", {}, compute_stats, refresh, response)
+
+
+async def compute_stats(db: AsyncSession) -> dict:
+    from datetime import timedelta
+    
+    # "Hoje" é o dia de negócio dos rollups (UTC), o mesmo do início padrão do /ggr/report
+    today = rollups.business_day()
+    today_start = rollups.day_start(today)
+    tomorrow_start = today_start + timedelta(days=1)
+    
+    # Usuários: total, registrados hoje e saldo dos jogadores com saldo (saldo não tem rollup)
+    users = (await db.execute(select(
+        func.count(),
+        func.count().filter((User.created_at >= today_start) & (User.created_at < tomorrow_start)),
+        func.coalesce(func.sum(User.balance).filter(User.balance > 0), 0.0),
+        func.count().filter(User.balance > 0),
+    ).select_from(User))).one()
+    total_users, usuarios_registrados_hoje, balanco_jogador_total, jogadores_com_saldo = users
+    
+    # Depósitos, saques e FTDs vêm dos agregados diários: O(dias), não O(transações)
+    totals = {
+        (metric, status): (count or 0, amount or 0.0)
+        for metric, status, count, amount in (await db.execute(
+            select(DailyRollup.metric, DailyRollup.status, func.sum(DailyRollup.count), func.sum(DailyRollup.amount))
+            .group_by(DailyRollup.metric, DailyRollup.status)
+        )).all()
+    }
+    today_rows = (await db.execute(
+        select(DailyRollup.metric, DailyRollup.status, Gateway.type,
+               func.sum(DailyRollup.count), func.sum(DailyRollup.amount))
+        .select_from(DailyRollup)
+        .outerjoin(Gateway, DailyRollup.gateway_id == Gateway.id)
+        .where(DailyRollup.day == today)
+        .group_by(DailyRollup.metric, DailyRollup.status, Gateway.type)
+    )).all()
+    
+    def total(metric, status):
+        return totals.get((metric, status.name), (0, 0.0))
+    
+    def today_total(metric, status=None, gateway_type=None):
+        count, amount = 0, 0.0
+        for row_metric, row_status, row_type, row_count, row_amount in today_rows:
+            if row_metric == metric and (status is None or row_status == status.name) \
+                    and (gateway_type is None or row_type == gateway_type):
+                count += row_count or 0
+                amount += row_amount or 0.0
+        return count, amount
+    
+    approved, pending = TransactionStatus.APPROVED, TransactionStatus.PENDING
+    total_deposits, total_deposit_amount = total(rollups.DEPOSIT, approved)
+    pending_deposits = total(rollups.DEPOSIT, pending)[0]
+    depositos_hoje = today_total(rollups.DEPOSIT)[0]
+    pagamentos_recebidos_hoje, valor_pagamentos_recebidos_hoje = today_total(rollups.DEPOSIT, approved)
+    pix_gerado_hoje = today_total(rollups.DEPOSIT, gateway_type="pix")[0]
+    pix_recebido_count_hoje, pix_recebido_hoje = today_total(rollups.DEPOSIT, approved, "pix")
+    # PIX gerado hoje e pago = PIX recebido hoje
+    pix_gerado_pago_hoje = pix_recebido_count_hoje
     pix_percentual_pago = (pix_gerado_pago_hoje / pix_gerado_hoje * 100) if pix_gerado_hoje > 0 else 0
     
-    # FTDs
-    total_ftds = db.query(FTD).count()
-    ftd_hoje = db.query(FTD).filter(func.date(FTD.created_at) == today).count()
+    total_withdrawals, total_withdrawal_amount = total(rollups.WITHDRAWAL, approved)
+    pending_withdrawals = total(rollups.WITHDRAWAL, pending)[0]
+    pagamentos_feitos_hoje, valor_pagamentos_feitos_hoje = today_total(rollups.WITHDRAWAL, approved)
+    pix_feito_count_hoje, pix_feito_hoje = today_total(rollups.WITHDRAWAL, approved, "pix")
+    
+    total_ftds = sum(count for (metric, _), (count, _) in totals.items() if metric == rollups.FTD_METRIC)
+    ftd_hoje = today_total(rollups.FTD_METRIC)[0]
     
     # GGR (Gross Gaming Revenue) - receita bruta de jogos
     # Simplificado: diferença entre depósitos e saques aprovados
@@ -877,9 +928,6 @@ async def get_stats(
     # Receita líquida / Lucro total
     net_revenue = total_deposit_amount - total_withdrawal_amount
     
-    # Depósitos hoje
-    depositos_hoje = db.query(Deposit).filter(func.date(Deposit.created_at) == today).count()
-    
     return {
         # Métricas básicas
         "total_users": total_users,
@@ -917,54 +965,105 @@ async def get_stats(
     }
 
 
+# ========== DATABASE POOL ==========
+@router.get("/db/pool")
+async def get_db_pool_metrics(
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Métricas dos pools de conexão (em uso, overflow e tempo de espera)"""
+    return get_pool_metrics()
+
+
+# ========== WEBHOOK INBOX ==========
+@router.get("/webhooks/inbox/stats")
+async def get_webhook_inbox_stats(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Quantidade de webhooks por status no inbox"""
+    rows = (await db.execute(
+        select(WebhookInbox.status, func.count()).group_by(WebhookInbox.status)
+    )).all()
+    counts = {s.value: 0 for s in WebhookStatus}
+    counts.update({status.value: count for status, count in rows})
+    return counts
+
+
+@router.get("/webhooks/inbox", response_model=List[WebhookInboxResponse])
+async def get_webhook_inbox(
+    status_filter: Optional[WebhookStatus] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    query = select(WebhookInbox)
+    if status_filter:
+        query = query.where(WebhookInbox.status == status_filter)
+    items = (await db.scalars(query.order_by(desc(WebhookInbox.id)).offset(skip).limit(limit))).all()
+    return items
+
+
+@router.post("/webhooks/inbox/{item_id}/retry", response_model=WebhookInboxResponse)
+async def retry_webhook_inbox_item(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Recoloca um webhook (ex: dead-letter) na fila com as tentativas zeradas"""
+    item = await db.get(WebhookInbox, item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    if item.status == WebhookStatus.PROCESSING:
+        raise HTTPException(status_code=400, detail="Webhook está sendo processado")
+    item.status = WebhookStatus.PENDING
+    item.attempts = 0
+    item.next_attempt_at = datetime.utcnow()
+    item.last_error = None
+    await db.commit()
+    await db.refresh(item)
+    return item
+
+
 # ========== GGR REPORT ==========
 @router.get("/ggr/report")
 async def get_ggr_report(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    refresh: bool = Query(False, description="Ignora o cache e recalcula"),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    """Relatório de GGR (Gross Gaming Revenue)"""
-    from datetime import datetime, date
-    
-    # Parse dates or use defaults
-    if start_date:
-        start = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-    else:
-        start = datetime.combine(date.today(), datetime.min.time())
-    
-    if end_date:
-        end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    else:
-        end = datetime.utcnow()
-    
-    # Total de depósitos aprovados no período
-    total_deposits = db.query(Deposit).filter(
-        Deposit.status == TransactionStatus.APPROVED,
-        Deposit.created_at >= start,
-        Deposit.created_at <= end
-    ).with_entities(func.sum(Deposit.amount)).scalar() or 0.0
+    """Relatório de GGR (Gross Gaming Revenue); sem start_date, desde o início do dia de negócio (UTC)"""
+    # Parse dates or use defaults (sem end_date o período vai até o momento do cálculo)
+    start = parse_datetime(start_date) if start_date else rollups.day_start(rollups.business_day())
+    end = parse_datetime(end_date) if end_date else None
+    
+    return await cached_report(
+        "ggr/report",
+        {"start": start.isoformat(), "end": end.isoformat() if end else None},
+        lambda db: compute_ggr_report(db, start, end),
+        refresh,
+        response,
+    )
+
+
+async def compute_ggr_report(db: AsyncSession, start: datetime, end: Optional[datetime] = None) -> dict:
+    end = end or datetime.utcnow()
     
-    # Total de saques aprovados no período
-    total_withdrawals = db.query(Withdrawal).filter(
-        Withdrawal.status == TransactionStatus.APPROVED,
-        Withdrawal.created_at >= start,
-        Withdrawal.created_at <= end
-    ).with_entities(func.sum(Withdrawal.amount)).scalar() or 0.0
+    # Dias inteiros vêm dos rollups; só as pontas parciais do período consultam as tabelas
+    deposits = await rollups.period_totals(db, rollups.DEPOSIT, start, end)
+    withdrawals = await rollups.period_totals(db, rollups.WITHDRAWAL, start, end)
+    bets = await rollups.period_totals(db, rollups.BET, start, end)
     
-    # Total de apostas no período
-    total_bets = db.query(Bet).filter(
-        Bet.created_at >= start,
-        Bet.created_at <= end
-    ).with_entities(func.sum(Bet.amount)).scalar() or 0.0
+    # Depósitos e saques aprovados no período
+    deposit_count, total_deposits, _ = deposits.get(TransactionStatus.APPROVED.name, (0, 0.0, 0.0))
+    withdrawal_count, total_withdrawals, _ = withdrawals.get(TransactionStatus.APPROVED.name, (0, 0.0, 0.0))
     
-    # Total ganho em apostas
-    total_wins = db.query(Bet).filter(
-        Bet.status == BetStatus.WON,
-        Bet.created_at >= start,
-        Bet.created_at <= end
-    ).with_entities(func.sum(Bet.win_amount)).scalar() or 0.0
+    # Total de apostas no período e total ganho em apostas
+    bet_count = sum(count for count, _, _ in bets.values())
+    total_bets = sum(amount for _, amount, _ in bets.values())
+    total_wins = bets.get(BetStatus.WON.name, (0, 0.0, 0.0))[2]
     
     # GGR = Total Apostado - Total Ganho
     ggr = total_bets - total_wins
@@ -979,27 +1078,16 @@ async def get_ggr_report(
         },
         "deposits": {
             "total": total_deposits,
-            "count": db.query(Deposit).filter(
-                Deposit.status == TransactionStatus.APPROVED,
-                Deposit.created_at >= start,
-                Deposit.created_at <= end
-            ).count()
+            "count": deposit_count
         },
         "withdrawals": {
             "total": total_withdrawals,
-            "count": db.query(Withdrawal).filter(
-                Withdrawal.status == TransactionStatus.APPROVED,
-                Withdrawal.created_at >= start,
-                Withdrawal.created_at <= end
-            ).count()
+            "count": withdrawal_count
         },
         "bets": {
             "total_amount": total_bets,
             "total_wins": total_wins,
-            "count": db.query(Bet).filter(
-                Bet.created_at >= start,
-                Bet.created_at <= end
-            ).count()
+            "count": bet_count
         },
         "ggr": ggr,
         "ngr": ngr,
@@ -1008,51 +1096,65 @@ async def get_ggr_report(
 
 
 # ========== BETS ==========
-@router.get("/bets")
+@router.get("/bets", response_model=List[BetListItem])
 async def get_bets(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     user_id: Optional[int] = None,
     status: Optional[BetStatus] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    """Listar apostas"""
-    query = db.query(Bet)
+    """Listar apostas (opcionalmente do período [start_date, end_date))"""
+    # username do jogador na mesma query (LEFT JOIN), sem carregar o resto do usuário
+    query = select(
+        Bet.id, Bet.user_id, User.username, Bet.game_id, Bet.game_name, Bet.provider, Bet.amount,
+        Bet.win_amount, Bet.status, Bet.transaction_id, Bet.created_at,
+    ).outerjoin(User, User.id == Bet.user_id)
     
     if user_id:
-        query = query.filter(Bet.user_id == user_id)
+        query = query.where(Bet.user_id == user_id)
     if status:
-        query = query.filter(Bet.status == status)
+        query = query.where(Bet.status == status)
+    query = filter_period(query, Bet, start_date, end_date)
     
-    bets = query.order_by(desc(Bet.created_at)).offset(skip).limit(limit).all()
-    
-    return [
-        {
-            "id": bet.id,
-            "user_id": bet.user_id,
-            "username": bet.user.username if bet.user else None,
-            "game_id": bet.game_id,
-            "game_name": bet.game_name,
-            "provider": bet.provider,
-            "amount": bet.amount,
-            "win_amount": bet.win_amount,
-            "status": bet.status.value,
-            "transaction_id": bet.transaction_id,
-            "created_at": bet.created_at.isoformat(),
-        }
-        for bet in bets
-    ]
+    bets = await paginate_rows(db, query, Bet, skip, limit, cursor, response)
+    return bets
+
+
+@router.get("/bets/export")
+async def export_bets(
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    user_id: Optional[int] = None,
+    status: Optional[BetStatus] = None,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Exportar apostas em streaming (CSV ou NDJSON), com os filtros da listagem e período [start_date, end_date)"""
+    query = select(
+        Bet.id, Bet.user_id, User.username, Bet.game_id, Bet.game_name, Bet.provider, Bet.amount,
+        Bet.win_amount, Bet.status, Bet.transaction_id, Bet.created_at,
+    ).outerjoin(User, User.id == Bet.user_id)
+    if user_id:
+        query = query.where(Bet.user_id == user_id)
+    if status:
+        query = query.where(Bet.status == status)
+    return export_response(export_period(query, Bet, start_date, end_date), "bets", format)
 
 
 @router.get("/bets/{bet_id}")
 async def get_bet(
     bet_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Obter aposta específica"""
-    bet = db.query(Bet).filter(Bet.id == bet_id).first()
+    bet = await db.get(Bet, bet_id, options=[joinedload(Bet.user).load_only(User.username)])
     if not bet:
         raise HTTPException(status_code=404, detail="Aposta não encontrada")
     
@@ -1075,47 +1177,37 @@ async def get_bet(
 
 
 # ========== NOTIFICATIONS ==========
-@router.get("/notifications")
+@router.get("/notifications", response_model=List[NotificationListItem])
 async def get_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     user_id: Optional[int] = None,
     is_read: Optional[bool] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Listar notificações"""
-    query = db.query(Notification)
+    query = select(
+        Notification.id, Notification.title, Notification.message, Notification.type, Notification.user_id,
+        User.username, Notification.is_read, Notification.is_active, Notification.link, Notification.created_at,
+    ).outerjoin(User, User.id == Notification.user_id)
     
     if user_id:
-        query = query.filter(Notification.user_id == user_id)
+        query = query.where(Notification.user_id == user_id)
     else:
         # Admin vê apenas notificações globais (user_id = null)
-        query = query.filter(Notification.user_id == None)
+        query = query.where(Notification.user_id == None)
     
     if is_read is not None:
-        query = query.filter(Notification.is_read == is_read)
+        query = query.where(Notification.is_read == is_read)
     if is_active is not None:
-        query = query.filter(Notification.is_active == is_active)
-    
-    notifications = query.order_by(desc(Notification.created_at)).offset(skip).limit(limit).all()
+        query = query.where(Notification.is_active == is_active)
     
-    return [
-        {
-            "id": notif.id,
-            "title": notif.title,
-            "message": notif.message,
-            "type": notif.type.value,
-            "user_id": notif.user_id,
-            "username": notif.user.username if notif.user else None,
-            "is_read": notif.is_read,
-            "is_active": notif.is_active,
-            "link": notif.link,
-            "created_at": notif.created_at.isoformat(),
-        }
-        for notif in notifications
-    ]
+    notifications = await paginate_rows(db, query, Notification, skip, limit, cursor, response)
+    return notifications
 
 
 @router.post("/notifications")
@@ -1125,8 +1217,8 @@ async def create_notification(
     type: NotificationType = NotificationType.INFO,
     user_id: Optional[int] = None,
     link: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Criar notificação"""
     notification = Notification(
@@ -1139,8 +1231,8 @@ async def create_notification(
         is_read=False
     )
     db.add(notification)
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {
         "id": notification.id,
@@ -1163,11 +1255,11 @@ async def update_notification(
     type: Optional[NotificationType] = None,
     is_active: Optional[bool] = None,
     link: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Atualizar notificação"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    notification = await db.get(Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notificação não encontrada")
     
@@ -1182,8 +1274,8 @@ async def update_notification(
     if link is not None:
         notification.link = link
     
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
     
     return {
         "id": notification.id,
@@ -1198,15 +1290,15 @@ async def update_notification(
 @router.delete("/notifications/{notification_id}")
 async def delete_notification(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Deletar notificação"""
-    notification = db.query(Notification).filter(Notification.id == notification_id).first()
+    notification = await db.get(Notification, notification_id)
     if not notification:
         raise HTTPException(status_code=404, detail="Notificação não encontrada")
     
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
     
     return {"success": True, "message": "Notificação deletada com sucesso"}
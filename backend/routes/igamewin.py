@@ -0,0 +1,21 @@
+"""
+Callback da carteira seamless do IGameWin (saldo, aposta, prêmio e estorno)
+"""
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+import seamless_wallet
+
+router = APIRouter(prefix="/api/igamewin", tags=["igamewin"])
+
+
+@router.post("/callback")
+async def seamless_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Chamado pelo IGameWin a cada operação na carteira; sempre 200, com status 1 (ok) ou 0 e msg"""
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return {"status": 0, "msg": seamless_wallet.INVALID_PARAMETER}
+    return await seamless_wallet.handle(db, payload)
@@ -1,16 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import List, Optional
 from datetime import datetime
 import os
 import uuid
 from pathlib import Path
 
-from database import get_db
-from dependencies import get_current_admin_user
-from models import User, MediaAsset, MediaType
+from database import get_async_db
+from dependencies import get_current_admin_user, Principal
+from models import MediaAsset, MediaType
 
 router = APIRouter(prefix="/api/admin/media", tags=["media"])
 public_router = APIRouter(prefix="/api/public/media", tags=["public-media"])
@@ -52,8 +52,8 @@ def generate_filename(original_filename: str) -> str:
 async def upload_media(
     file: UploadFile = File(...),
     media_type: str = Form(...),  # "logo" ou "banner"
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Upload de imagem (logo ou banner)"""
     try:
@@ -102,9 +102,9 @@ async def upload_media(
         # Obter próxima posição para banners
         position = 0
         if media_type_enum == MediaType.BANNER:
-            max_position = db.query(func.max(MediaAsset.position)).filter(
+            max_position = await db.scalar(select(func.max(MediaAsset.position)).where(
                 MediaAsset.type == MediaType.BANNER
-            ).scalar()
+            ))
             position = (max_position or 0) + 1
 
         # Determinar nome do diretório na URL (sempre plural: logos, banners)
@@ -121,8 +121,8 @@ async def upload_media(
             position=position,
         )
         db.add(media_asset)
-        db.commit()
-        db.refresh(media_asset)
+        await db.commit()
+        await db.refresh(media_asset)
 
         return {
             "success": True,
@@ -143,23 +143,23 @@ async def upload_media(
 @router.get("/list")
 async def list_media(
     media_type: Optional[str] = None,  # "logo" ou "banner" ou None para todos
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Listar mídias (admin)"""
-    query = db.query(MediaAsset)
+    query = select(MediaAsset)
     
     if media_type:
         try:
             media_type_enum = MediaType(media_type.lower())
-            query = query.filter(MediaAsset.type == media_type_enum)
+            query = query.where(MediaAsset.type == media_type_enum)
         except ValueError:
             raise HTTPException(
                 status_code=400,
                 detail=f"Tipo inválido. Use 'logo' ou 'banner'"
             )
 
-    assets = query.order_by(MediaAsset.position.asc(), MediaAsset.created_at.desc()).all()
+    assets = (await db.scalars(query.order_by(MediaAsset.position.asc(), MediaAsset.created_at.desc()))).all()
     
     return [
         {
@@ -180,11 +180,11 @@ async def list_media(
 @router.delete("/{media_id}")
 async def delete_media(
     media_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Deletar mídia"""
-    asset = db.query(MediaAsset).filter(MediaAsset.id == media_id).first()
+    asset = await db.get(MediaAsset, media_id)
     if not asset:
         raise HTTPException(status_code=404, detail="Mídia não encontrada")
 
@@ -208,8 +208,8 @@ async def delete_media(
             print(f"Erro ao deletar arquivo físico: {e}")
 
     # Deletar do banco
-    db.delete(asset)
-    db.commit()
+    await db.delete(asset)
+    await db.commit()
 
     return {"success": True, "message": "Mídia deletada com sucesso"}
 
@@ -218,17 +218,17 @@ async def delete_media(
 async def update_position(
     media_id: int,
     position: int = Form(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Atualizar posição de banner"""
-    asset = db.query(MediaAsset).filter(MediaAsset.id == media_id).first()
+    asset = await db.get(MediaAsset, media_id)
     if not asset:
         raise HTTPException(status_code=404, detail="Mídia não encontrada")
 
     asset.position = position
-    db.commit()
-    db.refresh(asset)
+    await db.commit()
+    await db.refresh(asset)
 
     return {
         "success": True,
@@ -240,17 +240,17 @@ async def update_position(
 @router.put("/{media_id}/toggle-active")
 async def toggle_active(
     media_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Ativar/desativar mídia"""
-    asset = db.query(MediaAsset).filter(MediaAsset.id == media_id).first()
+    asset = await db.get(MediaAsset, media_id)
     if not asset:
         raise HTTPException(status_code=404, detail="Mídia não encontrada")
 
     asset.is_active = not asset.is_active
-    db.commit()
-    db.refresh(asset)
+    await db.commit()
+    await db.refresh(asset)
 
     return {
         "success": True,
@@ -262,12 +262,12 @@ async def toggle_active(
 # ========== ROTAS PÚBLICAS ==========
 
 @public_router.get("/banners")
-async def get_public_banners(db: Session = Depends(get_db)):
+async def get_public_banners(db: AsyncSession = Depends(get_async_db)):
     """Listar banners ativos (público)"""
-    banners = db.query(MediaAsset).filter(
+    banners = (await db.scalars(select(MediaAsset).where(
         MediaAsset.type == MediaType.BANNER,
         MediaAsset.is_active == True
-    ).order_by(MediaAsset.position.asc()).all()
+    ).order_by(MediaAsset.position.asc()))).all()
 
     return [
         {
@@ -280,12 +280,12 @@ async def get_public_banners(db: Session = Depends(get_db)):
 
 
 @public_router.get("/logo")
-async def get_public_logo(db: Session = Depends(get_db)):
+async def get_public_logo(db: AsyncSession = Depends(get_async_db)):
     """Obter logo ativa (público)"""
-    logo = db.query(MediaAsset).filter(
+    logo = await db.scalar(select(MediaAsset).where(
         MediaAsset.type == MediaType.LOGO,
         MediaAsset.is_active == True
-    ).order_by(MediaAsset.created_at.desc()).first()
+    ).order_by(MediaAsset.created_at.desc()).limit(1))
 
     if not logo:
         return {"url": None}
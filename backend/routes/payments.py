@@ -2,13 +2,21 @@
 Rotas públicas para pagamentos (depósitos e saques) usando SuitPay
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Deposit, Withdrawal, Gateway, TransactionStatus
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Deposit, Withdrawal, Gateway, TransactionStatus, LedgerEntryType
 from suitpay_api import SuitPayAPI
 from schemas import DepositResponse, WithdrawalResponse
-from dependencies import get_current_user
+from dependencies import get_current_principal, Principal
+from config_cache import config_cache, PIX_GATEWAY
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+from webhook_inbox import webhook_inbox
+import wallet
+import gateway_payloads
+import hashlib
 import json
 import uuid
 import os
@@ -17,12 +25,41 @@ router = APIRouter(prefix="/api/public/payments", tags=["payments"])
 webhook_router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
 
 
-def get_active_pix_gateway(db: Session) -> Gateway:
-    """Busca gateway PIX ativo"""
-    gateway = db.query(Gateway).filter(
+@dataclass(frozen=True)
+class ActivePixGateway:
+    """Snapshot do gateway PIX ativo com credenciais já parseadas (mantido no config cache)"""
+    id: int
+    name: str
+    client_secret: Optional[str]
+    client: Optional[SuitPayAPI]
+    credentials_error: Optional[str] = None
+
+
+async def _load_active_pix_gateway(db: AsyncSession) -> Optional[ActivePixGateway]:
+    gateway = await db.scalar(select(Gateway).where(
         Gateway.type == "pix",
         Gateway.is_active == True
-    ).first()
+    ).limit(1))
+    if not gateway:
+        return None
+
+    try:
+        credentials = json.loads(gateway.credentials) if gateway.credentials else {}
+    except json.JSONDecodeError:
+        return ActivePixGateway(gateway.id, gateway.name, None, None, "Credenciais do gateway inválidas")
+
+    client_id = credentials.get("client_id") or credentials.get("ci")
+    client_secret = credentials.get("client_secret") or credentials.get("cs")
+    sandbox = credentials.get("sandbox", True)
+    if not client_id or not client_secret:
+        return ActivePixGateway(gateway.id, gateway.name, client_secret, None, "Credenciais do gateway não configuradas")
+
+    return ActivePixGateway(gateway.id, gateway.name, client_secret, SuitPayAPI(client_id, client_secret, sandbox=sandbox))
+
+
+async def get_active_pix_gateway(db: AsyncSession) -> ActivePixGateway:
+    """Busca gateway PIX ativo (via config cache)"""
+    gateway = await config_cache.get(PIX_GATEWAY, lambda: _load_active_pix_gateway(db))
     
     if not gateway:
         raise HTTPException(
@@ -33,26 +70,14 @@ def get_active_pix_gateway(db: Session) -> Gateway:
     return gateway
 
 
-def get_suitpay_client(gateway: Gateway) -> SuitPayAPI:
-    """Cria cliente SuitPay a partir das credenciais do gateway"""
-    try:
-        credentials = json.loads(gateway.credentials) if gateway.credentials else {}
-        client_id = credentials.get("client_id") or credentials.get("ci")
-        client_secret = credentials.get("client_secret") or credentials.get("cs")
-        sandbox = credentials.get("sandbox", True)
-        
-        if not client_id or not client_secret:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Credenciais do gateway não configuradas"
-            )
-        
-        return SuitPayAPI(client_id, client_secret, sandbox=sandbox)
-    except json.JSONDecodeError:
+def get_suitpay_client(gateway: ActivePixGateway) -> SuitPayAPI:
+    """Cliente SuitPay pronto do gateway ativo"""
+    if gateway.client is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Credenciais do gateway inválidas"
+            detail=gateway.credentials_error or "Credenciais do gateway não configuradas"
         )
+    return gateway.client
 
 
 @router.post("/deposit/pix", response_model=DepositResponse, status_code=status.HTTP_201_CREATED)
@@ -60,8 +85,8 @@ async def create_pix_deposit(
     amount: float,
     payer_name: str,
     payer_tax_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Cria depósito via PIX usando SuitPay
@@ -78,13 +103,13 @@ async def create_pix_deposit(
         raise HTTPException(status_code=400, detail="Valor deve ser maior que zero")
     
     # Buscar gateway PIX ativo
-    gateway = get_active_pix_gateway(db)
+    gateway = await get_active_pix_gateway(db)
     
     # Criar cliente SuitPay
     suitpay = get_suitpay_client(gateway)
     
     # Gerar número único da requisição
-    request_number = f"DEP_{user.id}_{int(datetime.utcnow().timestamp())}"
+    request_number = f"DEP_{user.id}_{int(datetime.utcnow().timestamp())}_{uuid.uuid4().hex[:8]}"
     
     # URL do webhook (usar variável de ambiente ou construir)
     webhook_url = os.getenv("WEBHOOK_BASE_URL", "https://api.agenciamidas.com")
@@ -105,7 +130,11 @@ async def create_pix_deposit(
             detail="Erro ao gerar código PIX no gateway"
         )
     
-    # Criar registro de depósito
+    # Criar registro de depósito (a resposta completa do gateway vai para gateway_payloads)
+    metadata = {
+        "pix_code": pix_response.get("paymentCode"),
+        "request_number": request_number,
+    }
     deposit = Deposit(
         user_id=user.id,
         gateway_id=gateway.id,
@@ -113,19 +142,19 @@ async def create_pix_deposit(
         status=TransactionStatus.PENDING,
         transaction_id=str(uuid.uuid4()),
         external_id=pix_response.get("idTransaction") or request_number,
-        metadata_json=json.dumps({
-            "pix_code": pix_response.get("paymentCode"),
-            "pix_qr_code": pix_response.get("qrCode"),
-            "request_number": request_number,
-            "suitpay_response": pix_response
-        })
+        request_number=request_number,
+        metadata_json=json.dumps(metadata)
     )
     
     db.add(deposit)
-    db.commit()
-    db.refresh(deposit)
+    await db.flush()
+    gateway_payloads.add(db, "deposit", deposit.id, gateway_payloads.SUITPAY_RESPONSE, pix_response)
+    await db.commit()
+    await db.refresh(deposit)
     
-    return deposit
+    # O QR code só é exibido agora, para quem criou o depósito: vai na resposta, não na linha
+    metadata["pix_qr_code"] = pix_response.get("qrCode")
+    return DepositResponse.model_validate(deposit).model_copy(update={"metadata_json": json.dumps(metadata)})
 
 
 @router.post("/withdrawal/pix", response_model=WithdrawalResponse, status_code=status.HTTP_201_CREATED)
@@ -136,8 +165,8 @@ async def create_pix_withdrawal(
     destination_bank: str,
     destination_account: str,
     destination_account_type: str = "CHECKING",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Cria saque via PIX usando SuitPay
@@ -153,19 +182,44 @@ async def create_pix_withdrawal(
     # Usar usuário autenticado
     user = current_user
     
-    # Verificar saldo
-    if user.balance < amount:
-        raise HTTPException(status_code=400, detail="Saldo insuficiente")
-    
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Valor deve ser maior que zero")
     
     # Buscar gateway PIX ativo
-    gateway = get_active_pix_gateway(db)
+    gateway = await get_active_pix_gateway(db)
     
     # Criar cliente SuitPay
     suitpay = get_suitpay_client(gateway)
     
+    metadata = {
+        "destination_name": destination_name,
+        "destination_tax_id": destination_tax_id,
+        "destination_bank": destination_bank,
+        "destination_account": destination_account,
+    }
+    
+    # Criar registro de saque e bloquear o saldo antes de chamar o gateway
+    # (o débito atômico impede dois saques simultâneos do mesmo saldo)
+    withdrawal = Withdrawal(
+        user_id=user.id,
+        gateway_id=gateway.id,
+        amount=amount,
+        status=TransactionStatus.PENDING,
+        transaction_id=str(uuid.uuid4()),
+        metadata_json=json.dumps(metadata)
+    )
+    db.add(withdrawal)
+    await db.flush()
+    try:
+        await wallet.debit(
+            db, user.id, amount, LedgerEntryType.WITHDRAWAL,
+            reference_type="withdrawal", reference_id=withdrawal.id, idempotency_key=f"withdrawal:{withdrawal.id}:debit"
+        )
+    except wallet.InsufficientFunds:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Saldo insuficiente")
+    await db.commit()
+    
     # URL do webhook
     webhook_url = os.getenv("WEBHOOK_BASE_URL", "https://api.agenciamidas.com")
     url_callback = f"{webhook_url}/api/webhooks/suitpay/pix-cashout"
@@ -182,169 +236,168 @@ async def create_pix_withdrawal(
     )
     
     if not transfer_response:
+        # Devolver o saldo bloqueado
+        withdrawal.status = TransactionStatus.CANCELLED
+        await wallet.credit(
+            db, user.id, amount, LedgerEntryType.WITHDRAWAL_REFUND,
+            reference_type="withdrawal", reference_id=withdrawal.id,
+            description="Falha na transferência PIX", idempotency_key=f"withdrawal:{withdrawal.id}:refund"
+        )
+        await db.commit()
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Erro ao processar transferência PIX no gateway"
         )
     
-    # Criar registro de saque
-    withdrawal = Withdrawal(
-        user_id=user.id,
-        gateway_id=gateway.id,
-        amount=amount,
-        status=TransactionStatus.PENDING,
-        transaction_id=str(uuid.uuid4()),
-        external_id=transfer_response.get("idTransaction"),
-        metadata_json=json.dumps({
-            "destination_name": destination_name,
-            "destination_tax_id": destination_tax_id,
-            "destination_bank": destination_bank,
-            "destination_account": destination_account,
-            "suitpay_response": transfer_response
-        })
-    )
-    
-    # Bloquear saldo do usuário
-    user.balance -= amount
-    
-    db.add(withdrawal)
-    db.commit()
-    db.refresh(withdrawal)
+    withdrawal.external_id = transfer_response.get("idTransaction")
+    gateway_payloads.add(db, "withdrawal", withdrawal.id, gateway_payloads.SUITPAY_RESPONSE, transfer_response)
+    await db.commit()
+    await db.refresh(withdrawal)
     
     return withdrawal
 
 
 # ========== WEBHOOKS ==========
 
-@webhook_router.post("/suitpay/pix-cashin")
-async def webhook_pix_cashin(request: Request, db: Session = Depends(get_db)):
-    """
-    Webhook para receber notificações de PIX Cash-in (depósitos) da SuitPay
-    """
+CASHIN_SOURCE = "suitpay_pix_cashin"
+CASHOUT_SOURCE = "suitpay_pix_cashout"
+
+
+def _suitpay_dedupe_key(source: str, data: dict) -> str:
+    """Mesma transação + mesmo status = mesmo evento (retentativas da SuitPay)"""
+    reference = data.get("idTransaction") or data.get("requestNumber")
+    if reference:
+        return f"{source}:{reference}:{data.get('statusTransaction')}"
+    return f"{source}:{hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()}"
+
+
+async def _receive_suitpay_webhook(request: Request, db: AsyncSession, source: str) -> dict:
+    """Valida o hash e grava no inbox; o processamento acontece em background"""
     try:
         data = await request.json()
-        
-        # Buscar gateway PIX ativo para validar hash
-        gateway = get_active_pix_gateway(db)
-        credentials = json.loads(gateway.credentials) if gateway.credentials else {}
-        client_secret = credentials.get("client_secret") or credentials.get("cs")
-        
-        if not client_secret:
-            raise HTTPException(status_code=500, detail="Credenciais do gateway não configuradas")
-        
-        # Validar hash
-        if not SuitPayAPI.validate_webhook_hash(data.copy(), client_secret):
-            raise HTTPException(status_code=401, detail="Hash inválido")
-        
-        # Processar webhook
-        id_transaction = data.get("idTransaction")
-        status_transaction = data.get("statusTransaction")
-        value = data.get("value")
-        request_number = data.get("requestNumber")
-        
-        # Buscar depósito pelo external_id ou request_number
-        deposit = None
-        if id_transaction:
-            deposit = db.query(Deposit).filter(Deposit.external_id == id_transaction).first()
-        
-        if not deposit and request_number:
-            # Tentar buscar pelo request_number no metadata
-            deposits = db.query(Deposit).filter(
-                Deposit.status == TransactionStatus.PENDING
-            ).all()
-            for d in deposits:
-                metadata = json.loads(d.metadata_json) if d.metadata_json else {}
-                if metadata.get("request_number") == request_number:
-                    deposit = d
-                    break
-        
-        if not deposit:
-            return {"status": "ok", "message": "Depósito não encontrado"}
-        
-        # Atualizar status do depósito
-        if status_transaction == "PAID_OUT":
-            if deposit.status != TransactionStatus.APPROVED:
-                deposit.status = TransactionStatus.APPROVED
-                # Adicionar saldo ao usuário
-                user = db.query(User).filter(User.id == deposit.user_id).first()
-                if user:
-                    user.balance += deposit.amount
-        elif status_transaction == "CHARGEBACK":
-            if deposit.status == TransactionStatus.APPROVED:
-                # Reverter saldo se já foi aprovado
-                user = db.query(User).filter(User.id == deposit.user_id).first()
-                if user and user.balance >= deposit.amount:
-                    user.balance -= deposit.amount
-            deposit.status = TransactionStatus.CANCELLED
-        
-        # Atualizar metadata
-        metadata = json.loads(deposit.metadata_json) if deposit.metadata_json else {}
-        metadata["webhook_data"] = data
-        metadata["webhook_received_at"] = datetime.utcnow().isoformat()
-        deposit.metadata_json = json.dumps(metadata)
-        
-        db.commit()
-        
-        return {"status": "ok", "message": "Webhook processado com sucesso"}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Payload inválido")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Payload inválido")
+    
+    # Buscar gateway PIX ativo para validar hash
+    gateway = await get_active_pix_gateway(db)
+    client_secret = gateway.client_secret
     
+    if not client_secret:
+        raise HTTPException(status_code=500, detail="Credenciais do gateway não configuradas")
+    
+    # Validar hash
+    if not SuitPayAPI.validate_webhook_hash(data.copy(), client_secret):
+        raise HTTPException(status_code=401, detail="Hash inválido")
+    
+    try:
+        created = await webhook_inbox.enqueue(db, source, _suitpay_dedupe_key(source, data), data)
     except Exception as e:
-        print(f"Erro ao processar webhook PIX Cash-in: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar webhook: {str(e)}")
+        print(f"Erro ao gravar webhook {source}: {str(e)}")
+        raise HTTPException(status_code=503, detail="Erro ao registrar webhook")
+    
+    return {"status": "ok", "message": "Webhook recebido" if created else "Webhook já recebido"}
+
+
+@webhook_router.post("/suitpay/pix-cashin")
+async def webhook_pix_cashin(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Webhook para receber notificações de PIX Cash-in (depósitos) da SuitPay
+    """
+    return await _receive_suitpay_webhook(request, db, CASHIN_SOURCE)
 
 
 @webhook_router.post("/suitpay/pix-cashout")
-async def webhook_pix_cashout(request: Request, db: Session = Depends(get_db)):
+async def webhook_pix_cashout(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Webhook para receber notificações de PIX Cash-out (saques) da SuitPay
     """
-    try:
-        data = await request.json()
-        
-        # Buscar gateway PIX ativo para validar hash
-        gateway = get_active_pix_gateway(db)
-        credentials = json.loads(gateway.credentials) if gateway.credentials else {}
-        client_secret = credentials.get("client_secret") or credentials.get("cs")
-        
-        if not client_secret:
-            raise HTTPException(status_code=500, detail="Credenciais do gateway não configuradas")
-        
-        # Validar hash
-        if not SuitPayAPI.validate_webhook_hash(data.copy(), client_secret):
-            raise HTTPException(status_code=401, detail="Hash inválido")
-        
-        # Processar webhook
-        id_transaction = data.get("idTransaction")
-        status_transaction = data.get("statusTransaction")
-        
-        # Buscar saque pelo external_id
-        withdrawal = None
-        if id_transaction:
-            withdrawal = db.query(Withdrawal).filter(Withdrawal.external_id == id_transaction).first()
-        
-        if not withdrawal:
-            return {"status": "ok", "message": "Saque não encontrado"}
-        
-        # Atualizar status do saque
-        if status_transaction == "PAID_OUT":
-            withdrawal.status = TransactionStatus.APPROVED
-        elif status_transaction == "CANCELED":
-            # Reverter saldo se foi cancelado
-            if withdrawal.status == TransactionStatus.PENDING:
-                user = db.query(User).filter(User.id == withdrawal.user_id).first()
-                if user:
-                    user.balance += withdrawal.amount
-            withdrawal.status = TransactionStatus.CANCELLED
-        
-        # Atualizar metadata
-        metadata = json.loads(withdrawal.metadata_json) if withdrawal.metadata_json else {}
-        metadata["webhook_data"] = data
-        metadata["webhook_received_at"] = datetime.utcnow().isoformat()
-        withdrawal.metadata_json = json.dumps(metadata)
-        
-        db.commit()
-        
-        return {"status": "ok", "message": "Webhook processado com sucesso"}
+    return await _receive_suitpay_webhook(request, db, CASHOUT_SOURCE)
+
+
+async def apply_pix_cashin(db: AsyncSession, data: dict) -> None:
+    """Aplica um webhook de Cash-in (idempotente; o commit é feito pelo worker do inbox)"""
+    id_transaction = data.get("idTransaction")
+    status_transaction = data.get("statusTransaction")
+    request_number = data.get("requestNumber")
     
-    except Exception as e:
-        print(f"Erro ao processar webhook PIX Cash-out: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erro ao processar webhook: {str(e)}")
+    # Buscar depósito pelo external_id ou request_number
+    deposit = None
+    if id_transaction:
+        deposit = await db.scalar(select(Deposit).where(Deposit.external_id == id_transaction).with_for_update())
+    
+    if not deposit and request_number:
+        deposit = await db.scalar(select(Deposit).where(Deposit.request_number == request_number).with_for_update())
+    
+    if not deposit:
+        # O webhook pode chegar antes do commit do depósito (ou o id veio errado): o inbox
+        # tenta de novo com backoff e, esgotadas as tentativas, a linha fica em dead-letter
+        print(f"Webhook Cash-in sem depósito (idTransaction={id_transaction}, requestNumber={request_number})")
+        raise LookupError(f"Depósito não encontrado (idTransaction={id_transaction}, requestNumber={request_number})")
+    
+    # Atualizar status do depósito
+    if status_transaction == "PAID_OUT":
+        if deposit.status != TransactionStatus.APPROVED:
+            deposit.status = TransactionStatus.APPROVED
+            # Adicionar saldo ao usuário
+            await wallet.credit(
+                db, deposit.user_id, deposit.amount, LedgerEntryType.DEPOSIT,
+                reference_type="deposit", reference_id=deposit.id, idempotency_key=f"deposit:{deposit.id}:credit"
+            )
+    elif status_transaction == "CHARGEBACK":
+        if deposit.status == TransactionStatus.APPROVED:
+            # Reverter saldo se já foi aprovado (sem deixar o saldo negativo)
+            try:
+                await wallet.debit(
+                    db, deposit.user_id, deposit.amount, LedgerEntryType.DEPOSIT_REVERSAL,
+                    reference_type="deposit", reference_id=deposit.id, idempotency_key=f"deposit:{deposit.id}:chargeback"
+                )
+            except wallet.InsufficientFunds:
+                print(f"Chargeback do depósito {deposit.id} sem saldo suficiente para reverter")
+        deposit.status = TransactionStatus.CANCELLED
+    
+    # Atualizar metadata (o webhook completo fica em gateway_payloads)
+    metadata = json.loads(deposit.metadata_json) if deposit.metadata_json else {}
+    metadata["webhook_received_at"] = datetime.utcnow().isoformat()
+    deposit.metadata_json = json.dumps(metadata)
+    gateway_payloads.add(db, "deposit", deposit.id, gateway_payloads.WEBHOOK_DATA, data)
+
+
+async def apply_pix_cashout(db: AsyncSession, data: dict) -> None:
+    """Aplica um webhook de Cash-out (idempotente; o commit é feito pelo worker do inbox)"""
+    id_transaction = data.get("idTransaction")
+    status_transaction = data.get("statusTransaction")
+    
+    # Buscar saque pelo external_id
+    withdrawal = None
+    if id_transaction:
+        withdrawal = await db.scalar(select(Withdrawal).where(Withdrawal.external_id == id_transaction).with_for_update())
+    
+    if not withdrawal:
+        # Mesmo caso do Cash-in: re-tentado pelo inbox até a dead-letter
+        print(f"Webhook Cash-out sem saque (idTransaction={id_transaction})")
+        raise LookupError(f"Saque não encontrado (idTransaction={id_transaction})")
+    
+    # Atualizar status do saque
+    if status_transaction == "PAID_OUT":
+        withdrawal.status = TransactionStatus.APPROVED
+    elif status_transaction == "CANCELED":
+        # Reverter saldo se foi cancelado
+        if withdrawal.status == TransactionStatus.PENDING:
+            await wallet.credit(
+                db, withdrawal.user_id, withdrawal.amount, LedgerEntryType.WITHDRAWAL_REFUND,
+                reference_type="withdrawal", reference_id=withdrawal.id,
+                idempotency_key=f"withdrawal:{withdrawal.id}:refund"
+            )
+        withdrawal.status = TransactionStatus.CANCELLED
+    
+    # Atualizar metadata (o webhook completo fica em gateway_payloads)
+    metadata = json.loads(withdrawal.metadata_json) if withdrawal.metadata_json else {}
+    metadata["webhook_received_at"] = datetime.utcnow().isoformat()
+    withdrawal.metadata_json = json.dumps(metadata)
+    gateway_payloads.add(db, "withdrawal", withdrawal.id, gateway_payloads.WEBHOOK_DATA, data)
+
+
+webhook_inbox.register(CASHIN_SOURCE, apply_pix_cashin)
+webhook_inbox.register(CASHOUT_SOURCE, apply_pix_cashout)
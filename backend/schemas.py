@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Optional, List
 from datetime import datetime
-from models import TransactionStatus, UserRole, MediaType
+from models import TransactionStatus, UserRole, MediaType, WebhookStatus, BetStatus, NotificationType
 
 
 # User Schemas
@@ -29,6 +29,8 @@ class UserUpdate(BaseModel):
 class AddBalanceRequest(BaseModel):
     amount: float
     reason: Optional[str] = None
+    # Alternativa ao header Idempotency-Key
+    idempotency_key: Optional[str] = Field(None, max_length=100)
 
 
 class UserResponse(UserBase):
@@ -44,6 +46,21 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserListItem(BaseModel):
+    """Linha da listagem de usuários (email como str: o que vem do banco não é revalidado)"""
+    id: int
+    username: str
+    email: str
+    cpf: Optional[str]
+    phone: Optional[str]
+    role: UserRole
+    balance: float
+    is_active: bool
+    is_verified: bool
+    created_at: datetime
+    updated_at: datetime
+
+
 # Auth Schemas
 class Token(BaseModel):
     access_token: str
@@ -143,6 +160,31 @@ class DepositResponse(DepositBase):
         from_attributes = True
 
 
+class DepositListItem(BaseModel):
+    """Linha da listagem de depósitos (os payloads do gateway ficam no detalhe)"""
+    id: int
+    user_id: int
+    gateway_id: Optional[int]
+    amount: float
+    status: TransactionStatus
+    transaction_id: str
+    external_id: Optional[str]
+    # Só os campos pequenos (pix_code, request_number) desde a migração 0009
+    metadata_json: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class GatewayPayloadResponse(BaseModel):
+    kind: str
+    payload: Any
+    created_at: datetime
+
+
+class DepositDetailResponse(DepositResponse):
+    payloads: List[GatewayPayloadResponse] = []
+
+
 # Withdrawal Schemas
 class WithdrawalBase(BaseModel):
     user_id: int
@@ -173,6 +215,25 @@ class WithdrawalResponse(WithdrawalBase):
         from_attributes = True
 
 
+class WithdrawalDetailResponse(WithdrawalResponse):
+    payloads: List[GatewayPayloadResponse] = []
+
+
+class WithdrawalListItem(BaseModel):
+    """Linha da listagem de saques (os payloads do gateway ficam no detalhe)"""
+    id: int
+    user_id: int
+    gateway_id: Optional[int]
+    amount: float
+    status: TransactionStatus
+    transaction_id: str
+    external_id: Optional[str]
+    # Destino do PIX (nome, CPF/CNPJ, banco, conta), usado para aprovar o saque
+    metadata_json: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 # FTD Schemas
 class FTDBase(BaseModel):
     user_id: int
@@ -201,6 +262,35 @@ class FTDResponse(FTDBase):
         from_attributes = True
 
 
+# Bet Schemas
+class BetListItem(BaseModel):
+    id: int
+    user_id: int
+    username: Optional[str]
+    game_id: Optional[str]
+    game_name: Optional[str]
+    provider: Optional[str]
+    amount: float
+    win_amount: Optional[float]
+    status: BetStatus
+    transaction_id: Optional[str]
+    created_at: datetime
+
+
+# Notification Schemas
+class NotificationListItem(BaseModel):
+    id: int
+    title: str
+    message: str
+    type: NotificationType
+    user_id: Optional[int]
+    username: Optional[str]
+    is_read: bool
+    is_active: bool
+    link: Optional[str]
+    created_at: datetime
+
+
 # FTD Settings Schemas
 class FTDSettingsBase(BaseModel):
     pass_rate: float = 0.0
@@ -240,3 +330,20 @@ class MediaAssetResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+# Webhook Inbox Schemas
+class WebhookInboxResponse(BaseModel):
+    id: int
+    source: str
+    dedupe_key: str
+    payload: str
+    status: WebhookStatus
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    processed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
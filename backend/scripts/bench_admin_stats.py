@@ -0,0 +1,171 @@
+"""
+Benchmark do dashboard do admin (/api/admin/stats e /ggr/report) sobre um banco populado.
+
+Popula (uma vez) usuários, depósitos, saques, FTDs e apostas espalhados pelos
+últimos --days dias, recalcula os rollups e mede a latência de get_stats e de
+get_ggr_report (últimos 30 dias), sem o cache de relatórios. Sai com código 1
+se o p95 passar de --budget-ms, então pode ser usado como verificação antes de
+mexer nos endpoints:
+
+    python scripts/bench_admin_stats.py --users 1000000 --deposits 2000000 --withdrawals 1000000
+    DATABASE_URL=postgresql://... python scripts/bench_admin_stats.py --reuse --runs 50
+
+Sem DATABASE_URL usa /tmp/bench_admin_stats.db (reaproveitado com --reuse).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_admin_stats.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+import rollups  # noqa: E402
+import sql_metrics  # noqa: E402
+from database import ReportSessionLocal, engine, init_db  # noqa: E402
+from models import FTD, Bet, BetStatus, Deposit, Gateway, TransactionStatus, User, UserRole, Withdrawal  # noqa: E402
+from routes.admin import compute_ggr_report, compute_stats  # noqa: E402
+
+# Consultas de varredura são lentas por definição aqui; o benchmark mede o total
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+STATUSES = [TransactionStatus.APPROVED] * 6 + [TransactionStatus.PENDING] * 3 + [TransactionStatus.REJECTED]
+BET_STATUSES = [BetStatus.LOST] * 5 + [BetStatus.WON] * 4 + [BetStatus.PENDING]
+PROVIDERS = ["PRAGMATIC", "PGSOFT", "EVOLUTION", None]
+
+
+def _chunks(total: int, size: int):
+    start = 0
+    while start < total:
+        yield start, min(total, start + size)
+        start += size
+
+
+def seed(args) -> None:
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+
+    def created_at():
+        # ~1% das linhas caem em "hoje"
+        if rng.random() < 0.01:
+            return now - timedelta(seconds=rng.randint(0, 3600))
+        return now - timedelta(days=rng.randint(1, args.days), seconds=rng.randint(0, 86399))
+
+    with engine.begin() as conn:
+        pix_id = conn.execute(insert(Gateway.__table__).values(
+            name="bench-pix", type="pix", is_active=False, created_at=now, updated_at=now
+        )).inserted_primary_key[0]
+        other_id = conn.execute(insert(Gateway.__table__).values(
+            name="bench-card", type="card", is_active=False, created_at=now, updated_at=now
+        )).inserted_primary_key[0]
+
+    plan = [
+        ("users", args.users, lambda i: {
+            "username": f"bench_{i}", "email": f"bench_{i}@bench.local", "password_hash": "x",
+            "role": UserRole.USER.name, "balance": rng.choice([0.0, 0.0, round(rng.uniform(1, 500), 2)]),
+            "is_active": True, "is_verified": False, "created_at": created_at(),
+        }, User.__table__),
+        ("deposits", args.deposits, lambda i: {
+            "user_id": rng.randint(1, max(1, args.users)), "gateway_id": rng.choice([pix_id, pix_id, other_id, None]),
+            "amount": round(rng.uniform(10, 1000), 2), "status": rng.choice(STATUSES).name,
+            "transaction_id": f"bench_dep_{i}", "created_at": created_at(),
+        }, Deposit.__table__),
+        ("withdrawals", args.withdrawals, lambda i: {
+            "user_id": rng.randint(1, max(1, args.users)), "gateway_id": rng.choice([pix_id, other_id]),
+            "amount": round(rng.uniform(10, 800), 2), "status": rng.choice(STATUSES).name,
+            "transaction_id": f"bench_wd_{i}", "created_at": created_at(),
+        }, Withdrawal.__table__),
+        ("ftds", args.ftds, lambda i: {
+            "user_id": rng.randint(1, max(1, args.users)), "deposit_id": rng.randint(1, max(1, args.deposits)),
+            "amount": round(rng.uniform(10, 1000), 2),
+            "is_first_deposit": True, "pass_rate": 0.0, "status": TransactionStatus.APPROVED.name,
+            "created_at": created_at(),
+        }, FTD.__table__),
+        ("bets", args.bets, lambda i: {
+            "user_id": rng.randint(1, max(1, args.users)), "provider": rng.choice(PROVIDERS),
+            "game_id": str(rng.randint(1, 500)), "amount": round(rng.uniform(1, 100), 2),
+            "win_amount": round(rng.uniform(0, 200), 2), "status": rng.choice(BET_STATUSES).name,
+            "transaction_id": f"bench_bet_{i}", "created_at": created_at(),
+        }, Bet.__table__),
+    ]
+    for name, total, make_row, table in plan:
+        started = time.perf_counter()
+        for start, end in _chunks(total, args.chunk):
+            with engine.begin() as conn:
+                conn.execute(insert(table), [make_row(i) for i in range(start, end)])
+        print(f"  {name}: {total} linhas em {time.perf_counter() - started:.1f}s")
+
+    # A carga acima é feita fora do ORM e não passa pelo listener de rollups
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rows = rollups.rebuild(conn)
+    print(f"  rollups: {rows} linhas em {time.perf_counter() - started:.1f}s")
+
+
+async def measure(compute, runs: int, *params):
+    latencies, queries = [], 0
+    for _ in range(runs):
+        stats = sql_metrics.start_request()
+        started = time.perf_counter()
+        async with ReportSessionLocal() as db:
+            result = await compute(db, *params)
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries = stats.query_count
+    return latencies, queries, result
+
+
+def report(name: str, runs: int, latencies, queries, budget_ms: float) -> bool:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(f"{name}: {runs} execuções, {queries} queries/execução")
+    print(f"  p50 {statistics.median(latencies):.1f} ms  p95 {p95:.1f} ms  máx {max(latencies):.1f} ms  (orçamento {budget_ms:.0f} ms)")
+    return p95 <= budget_ms
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--deposits", type=int, default=2_000_000)
+    parser.add_argument("--withdrawals", type=int, default=1_000_000)
+    parser.add_argument("--ftds", type=int, default=200_000)
+    parser.add_argument("--bets", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--chunk", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=2000.0, help="p95 máximo aceito")
+    parser.add_argument("--reuse", action="store_true", help="não popula se já houver depósitos")
+    args = parser.parse_args()
+
+    init_db()
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(Deposit)).scalar()
+    if not (args.reuse and existing):
+        print("Populando banco...")
+        seed(args)
+
+    ggr_params = (datetime.utcnow() - timedelta(days=30), datetime.utcnow())
+    # Aquecimento (cache de páginas do banco)
+    await measure(compute_stats, 1)
+    await measure(compute_ggr_report, 1, *ggr_params)
+
+    latencies, queries, result = await measure(compute_stats, args.runs)
+    ok = report("get_stats", args.runs, latencies, queries, args.budget_ms)
+    print(f"  total_users={result['total_users']} total_deposits={result['total_deposits']} depositos_hoje={result['depositos_hoje']}")
+    latencies, queries, result = await measure(compute_ggr_report, args.runs, *ggr_params)
+    ok = report("get_ggr_report (30 dias)", args.runs, latencies, queries, args.budget_ms) and ok
+    print(f"  apostas={result['bets']['count']} ggr={result['ggr']:.2f}")
+    if not ok:
+        print("  ACIMA DO ORÇAMENTO")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
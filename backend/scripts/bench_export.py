@@ -0,0 +1,117 @@
+"""
+Benchmark da exportação em streaming (/api/admin/bets/export).
+
+Popula --rows apostas espalhadas pelos últimos --days dias e exporta um período
+curto (~10% das linhas) e o período inteiro, consumindo o corpo da resposta como
+o servidor faria. Mede linhas/s e, numa segunda passada, o pico de memória
+alocada (tracemalloc) durante cada exportação; sai com código 1 se o pico da
+exportação completa passar de --max-growth vezes o da curta (a memória deve
+ser constante):
+
+    python scripts/bench_export.py --rows 500000
+    DATABASE_URL=postgresql://... python scripts/bench_export.py --reuse --format ndjson
+
+Sem DATABASE_URL usa /tmp/bench_export.db (reaproveitado com --reuse).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_export.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from database import engine, init_db  # noqa: E402
+from models import Bet, BetStatus, User, UserRole  # noqa: E402
+from routes.admin import export_bets  # noqa: E402
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+BET_STATUSES = [BetStatus.LOST] * 5 + [BetStatus.WON] * 4 + [BetStatus.PENDING]
+
+
+def seed(args) -> None:
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": f"export_{i}", "email": f"export_{i}@example.com", "password_hash": "x",
+            "role": UserRole.USER.name, "balance": 0.0, "is_active": True, "is_verified": False, "created_at": now,
+        } for i in range(args.users)])
+    for start in range(0, args.rows, args.chunk):
+        with engine.begin() as conn:
+            conn.execute(insert(Bet), [{
+                "user_id": rng.randint(1, args.users), "provider": "PGSOFT", "game_id": str(rng.randint(1, 500)),
+                "game_name": "Fortune Tiger", "amount": round(rng.uniform(1, 100), 2),
+                "win_amount": round(rng.uniform(0, 200), 2), "status": rng.choice(BET_STATUSES).name,
+                "transaction_id": f"export_bet_{i}",
+                "created_at": now - timedelta(days=args.days) + timedelta(seconds=i * args.days * 86400 / args.rows),
+            } for i in range(start, min(args.rows, start + args.chunk))])
+
+
+async def export(fmt: str, start: datetime, trace: bool = False):
+    """(linhas, bytes, segundos, pico de memória em bytes ou None) da exportação a partir de start"""
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    response = await export_bets(format=fmt, start_date=start.isoformat(), end_date=None,
+                                 user_id=None, status=None, current_user=None)
+    lines = size = 0
+    async for chunk in response.body_iterator:
+        lines += chunk.count("\n")
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    rows = lines - 1 if fmt == "csv" else lines
+    return rows, size, elapsed, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--chunk", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--max-growth", type=float, default=2.0, help="pico completo / pico curto máximo aceito")
+    parser.add_argument("--reuse", action="store_true", help="não popula se já houver apostas")
+    args = parser.parse_args()
+
+    init_db()
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(Bet)).scalar()
+    if not (args.reuse and existing):
+        print("Populando banco...")
+        seed(args)
+
+    now = datetime.utcnow()
+    peaks = []
+    for label, start in (("período curto", now - timedelta(days=args.days / 10)),
+                         ("período inteiro", now - timedelta(days=args.days + 1))):
+        rows, size, elapsed, _ = await export(args.format, start)
+        # tracemalloc deixa a exportação bem mais lenta: a memória é medida numa segunda passada
+        _, _, _, peak = await export(args.format, start, trace=True)
+        peaks.append(peak)
+        print(f"{label}: {rows} linhas, {size / 1e6:.1f} MB em {elapsed:.1f}s "
+              f"({rows / elapsed:.0f} linhas/s), pico de memória {peak / 1e6:.1f} MB")
+    growth = peaks[1] / peaks[0]
+    print(f"  crescimento do pico: {growth:.2f}x (máximo {args.max_growth:.1f}x)")
+    if growth > args.max_growth:
+        print("  FALHA: a memória cresce com o número de linhas")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+Benchmark do cliente HTTP da IGameWin contra um servidor local (stand-in) com TLS.
+
+Compara o comportamento antigo (um httpx.AsyncClient novo por chamada, ou seja,
+handshake TCP+TLS a cada requisição) com o cliente compartilhado com keep-alive
+usado hoje por IGameWinAPI:
+
+    python scripts/bench_igamewin_client.py --requests 500 --concurrency 20
+    python scripts/bench_igamewin_client.py --http2
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from igamewin_api import IGameWinAPI  # noqa: E402
+
+
+async def standin_app(scope, receive, send):
+    """Responde como a API IGameWin (money_info) para qualquer POST"""
+    if scope["type"] != "http":
+        return
+    while True:
+        message = await receive()
+        if not message.get("more_body"):
+            break
+    body = b'{"status": 1, "agent": {"agent_code": "bench", "balance": 1000.0}}'
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def write_self_signed_cert(directory: str):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def start_standin(port: int, cert_path: str, key_path: str) -> uvicorn.Server:
+    config = uvicorn.Config(standin_app, host="127.0.0.1", port=port, log_level="warning",
+                            ssl_certfile=cert_path, ssl_keyfile=key_path)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run(label, call, total, concurrency):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            result = await call()
+            assert result is not None
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(f"{label:<26} {total / elapsed:>9.0f} req/s  mean {statistics.fmean(latencies):>7.2f} ms  p99 {p99:>7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--http2", action="store_true", help="usa HTTP/2 no cliente compartilhado")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = write_self_signed_cert(tmp)
+        server = start_standin(args.port, cert_path, key_path)
+        ssl_context = ssl.create_default_context(cafile=cert_path)
+        api_url = f"https://localhost:{args.port}"
+
+        async def per_call():
+            # Comportamento anterior: cliente (e handshake) novo a cada chamada
+            async with httpx.AsyncClient(verify=ssl_context) as client:
+                api = IGameWinAPI("bench", "token", api_url=api_url, http_client=client)
+                return await api.get_agent_balance()
+
+        shared_client = httpx.AsyncClient(
+            verify=ssl_context,
+            http2=args.http2,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        shared_api = IGameWinAPI("bench", "token", api_url=api_url, http_client=shared_client)
+
+        print(f"{args.requests} chamadas money_info, concorrência {args.concurrency}")
+        await run("novo cliente por chamada", per_call, args.requests, args.concurrency)
+        await run("cliente compartilhado" + (" (h2)" if args.http2 else ""), shared_api.get_agent_balance,
+                  args.requests, args.concurrency)
+        await shared_client.aclose()
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,231 @@
+"""
+Benchmark das listagens do admin: entidades ORM x colunas (paginate_rows).
+
+Popula usuários, depósitos, saques (com o metadata_json pequeno de depois da
+migração 0009, que as listagens devolvem) e apostas (com --metadata-bytes de
+metadata_json por linha) e percorre --pages páginas de --page-size linhas pelo
+cursor, uma sessão por página como numa requisição, nos dois caminhos:
+
+- orm: select(Model) + paginate() + response_model com from_attributes (e, nas
+  apostas, os dicts montados em Python e o jsonable_encoder), como as rotas
+  faziam antes;
+- colunas: a própria rota (paginate_rows) + o seu response_model.
+
+Nos dois a página é serializada até o JSON, como o FastAPI faria. Mede
+linhas/s e, numa segunda passada, o pico de memória alocada (tracemalloc) de
+uma página; sai com código 1 se o caminho por colunas ficar mais lento que
+--min-speedup vezes o ORM em alguma listagem:
+
+    python scripts/bench_list_queries.py
+    DATABASE_URL=postgresql://... python scripts/bench_list_queries.py --reuse --pages 20
+
+Sem DATABASE_URL usa /tmp/bench_lists.db (reaproveitado com --reuse).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_lists.db")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Response  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from models import Bet, BetStatus, Deposit, TransactionStatus, User, UserRole, Withdrawal  # noqa: E402
+from pagination import NEXT_CURSOR_HEADER, paginate  # noqa: E402
+from routes import admin  # noqa: E402
+from schemas import DepositResponse, UserResponse, WithdrawalResponse  # noqa: E402
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+BET_STATUSES = [BetStatus.LOST] * 5 + [BetStatus.WON] * 4 + [BetStatus.PENDING]
+TRANSACTION_STATUSES = [TransactionStatus.APPROVED] * 8 + [TransactionStatus.PENDING, TransactionStatus.CANCELLED]
+
+
+def seed(args) -> None:
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    metadata = json.dumps({"payload": "x" * args.metadata_bytes})
+    transaction_metadata = {
+        Deposit: json.dumps({"pix_code": "00020126" + "5" * 120, "request_number": "DEP_0123456789abcdef"}),
+        Withdrawal: json.dumps({
+            "destination_name": "Fulano de Tal", "destination_tax_id": "12345678901", "destination_bank": "001",
+            "destination_account": "12345-6", "webhook_received_at": now.isoformat(),
+        }),
+    }
+
+    def spread(i: int) -> datetime:
+        return now - timedelta(days=30) + timedelta(seconds=i * 30 * 86400 / args.rows)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": f"lists_{i}", "email": f"lists_{i}@example.com", "password_hash": "x" * 60,
+            "role": UserRole.USER.name, "balance": 0.0, "is_active": True, "is_verified": False,
+            "created_at": spread(i), "updated_at": spread(i),
+        } for i in range(args.rows)])
+    for model, prefix in ((Deposit, "DEP"), (Withdrawal, "WD")):
+        for start in range(0, args.rows, args.chunk):
+            with engine.begin() as conn:
+                conn.execute(insert(model), [{
+                    "user_id": rng.randint(1, args.rows), "amount": round(rng.uniform(10, 500), 2),
+                    "status": rng.choice(TRANSACTION_STATUSES).name, "transaction_id": f"{prefix}_lists_{i}",
+                    "external_id": f"ext_{prefix}_{i}", "metadata_json": transaction_metadata[model],
+                    "created_at": spread(i), "updated_at": spread(i),
+                } for i in range(start, min(args.rows, start + args.chunk))])
+    for start in range(0, args.rows, args.chunk):
+        with engine.begin() as conn:
+            conn.execute(insert(Bet), [{
+                "user_id": rng.randint(1, args.rows), "provider": "PGSOFT", "game_id": str(rng.randint(1, 500)),
+                "game_name": "Fortune Tiger", "amount": round(rng.uniform(1, 100), 2),
+                "win_amount": round(rng.uniform(0, 200), 2), "status": rng.choice(BET_STATUSES).name,
+                "transaction_id": f"lists_bet_{i}", "metadata_json": metadata,
+                "created_at": spread(i), "updated_at": spread(i),
+            } for i in range(start, min(args.rows, start + args.chunk))])
+
+
+def render(adapter: TypeAdapter, content) -> bytes:
+    """Validação pelo response_model e JSON, como serialize_response + JSONResponse"""
+    value = adapter.validate_python(content, from_attributes=True)
+    return json.dumps(adapter.dump_python(value, mode="json")).encode()
+
+
+def response_adapter(endpoint) -> TypeAdapter:
+    for route in admin.router.routes:
+        if getattr(route, "endpoint", None) is endpoint:
+            return TypeAdapter(route.response_model)
+    raise LookupError(endpoint)
+
+
+def orm_page(model, schema):
+    """Caminho anterior das listagens simples: entidades + response_model com from_attributes"""
+    adapter = TypeAdapter(List[schema])
+
+    async def page(db, limit, cursor, response):
+        rows = await paginate(db, select(model), model, 0, limit, cursor, response)
+        return len(rows), render(adapter, rows)
+    return page
+
+
+async def orm_bets_page(db, limit, cursor, response):
+    """Caminho anterior de /bets: entidades com o usuário, dicts em Python e jsonable_encoder"""
+    query = select(Bet).options(joinedload(Bet.user).load_only(User.username))
+    bets = await paginate(db, query, Bet, 0, limit, cursor, response)
+    return len(bets), json.dumps(jsonable_encoder([
+        {
+            "id": bet.id, "user_id": bet.user_id, "username": bet.user.username if bet.user else None,
+            "game_id": bet.game_id, "game_name": bet.game_name, "provider": bet.provider,
+            "amount": bet.amount, "win_amount": bet.win_amount, "status": bet.status.value,
+            "transaction_id": bet.transaction_id, "created_at": bet.created_at.isoformat(),
+        }
+        for bet in bets
+    ])).encode()
+
+
+def route_page(endpoint, **filters):
+    """Caminho atual: a rota (paginate_rows) + o response_model dela"""
+    adapter = response_adapter(endpoint)
+
+    async def page(db, limit, cursor, response):
+        rows = await endpoint(response=response, skip=0, limit=limit, cursor=cursor, db=db, current_user=None,
+                              **filters)
+        return len(rows), render(adapter, rows)
+    return page
+
+
+LISTINGS = [
+    ("/users", orm_page(User, UserResponse), route_page(admin.get_users)),
+    ("/deposits", orm_page(Deposit, DepositResponse),
+     route_page(admin.get_deposits, status_filter=None, user_id=None)),
+    ("/withdrawals", orm_page(Withdrawal, WithdrawalResponse),
+     route_page(admin.get_withdrawals, status_filter=None, user_id=None)),
+    ("/bets", orm_bets_page,
+     route_page(admin.get_bets, user_id=None, status=None, start_date=None, end_date=None)),
+]
+
+
+async def walk(page, pages: int, limit: int):
+    """(linhas, bytes do JSON, segundos) percorrendo pages páginas pelo cursor, uma sessão por página"""
+    rows = size = 0
+    # Cursor vazio: paginação por cursor desde a primeira página (em /users, sem ele é por offset)
+    cursor = ""
+    started = time.perf_counter()
+    for _ in range(pages):
+        response = Response()
+        async with AsyncSessionLocal() as db:
+            count, body = await page(db, limit, cursor, response)
+        rows += count
+        size += len(body)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+    return rows, size, time.perf_counter() - started
+
+
+async def peak_memory(page, limit: int) -> int:
+    """Pico de memória alocada (bytes) de uma página"""
+    tracemalloc.start()
+    try:
+        async with AsyncSessionLocal() as db:
+            await page(db, limit, None, Response())
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000, help="linhas de cada tabela")
+    parser.add_argument("--metadata-bytes", type=int, default=2000, help="tamanho de metadata_json por linha")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunk", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="linhas/s por colunas / linhas/s ORM mínimo aceito")
+    parser.add_argument("--reuse", action="store_true", help="não popula se já houver apostas")
+    args = parser.parse_args()
+
+    init_db()
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(Bet)).scalar()
+    if not (args.reuse and existing):
+        print("Populando banco...")
+        seed(args)
+
+    failures = 0
+    print(f"Páginas de {args.page_size} linhas, {args.pages} páginas por listagem")
+    for path, orm, lean in LISTINGS:
+        # Uma página de aquecimento em cada caminho (conexões do pool, caches de compilação)
+        await walk(orm, 1, args.page_size)
+        await walk(lean, 1, args.page_size)
+        results = {}
+        for label, page in (("orm", orm), ("colunas", lean)):
+            rows, size, elapsed = await walk(page, args.pages, args.page_size)
+            # tracemalloc deixa tudo bem mais lento: a memória é medida numa segunda passada
+            peak = await peak_memory(page, args.page_size)
+            results[label] = rows / elapsed
+            print(f"  GET {path} [{label}]: {rows} linhas, {size / 1e6:.1f} MB em {elapsed:.2f}s "
+                  f"({rows / elapsed:.0f} linhas/s), pico de memória por página {peak / 1e6:.1f} MB")
+        speedup = results["colunas"] / results["orm"]
+        ok = speedup >= args.min_speedup
+        failures += not ok
+        print(f"  GET {path}: {speedup:.2f}x{'' if ok else f'  FALHA (mínimo {args.min_speedup:.2f}x)'}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark de throughput de login por worker em diferentes custos de bcrypt.
+
+Roda o app em processo (um event loop = um worker) sobre um SQLite temporário e
+dispara logins concorrentes para cada custo. Além de req/s e latência, mede o
+maior atraso do event loop (um ticker de 10 ms), que mostra se o bcrypt está
+travando as demais rotas:
+
+    python scripts/bench_login.py --rounds 10 11 12 --requests 64 --concurrency 8
+    python scripts/bench_login.py --inline   # comportamento antigo (bcrypt no event loop)
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench_login.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from passlib.context import CryptContext  # noqa: E402
+
+import auth  # noqa: E402
+from database import AsyncSessionLocal, init_db  # noqa: E402
+from main import app  # noqa: E402
+from models import User, UserRole  # noqa: E402
+
+PASSWORD = "bench-password"
+
+# No modo inline toda query "espera" o bcrypt e apareceria como slow_query
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+
+async def create_user(username: str) -> None:
+    async with AsyncSessionLocal() as db:
+        db.add(User(
+            username=username,
+            email=f"{username}@bench.local",
+            password_hash=auth.pwd_context.hash(PASSWORD),
+            role=UserRole.USER,
+            is_active=True,
+        ))
+        await db.commit()
+
+
+async def measure_lag(stop: asyncio.Event, lags: list) -> None:
+    interval = 0.01
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def run(rounds: int, total: int, concurrency: int) -> None:
+    # Custo configurado = custo do hash armazenado (sem rehash durante o benchmark)
+    auth.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    username = f"bench_{rounds}"
+    await create_user(username)
+
+    latencies, statuses, lags = [], {}, []
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(measure_lag(stop, lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticker
+
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    print(f"rounds={rounds:<3} {total / elapsed:>7.1f} logins/s  mean {statistics.fmean(latencies):>8.1f} ms  "
+          f"p99 {p99:>8.1f} ms  loop lag máx {max(lags or [0]):>7.1f} ms  status {statuses}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="executa o bcrypt no event loop (comportamento antigo)")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def inline(fn, *fn_args):
+            return fn(*fn_args)
+        auth._run_hasher = inline
+
+    init_db()
+    mode = "inline" if args.inline else f"executor ({auth.PASSWORD_HASH_WORKERS} threads, fila {auth.PASSWORD_HASH_MAX_PENDING})"
+    print(f"{args.requests} logins, concorrência {args.concurrency}, bcrypt {mode}")
+    for rounds in args.rounds:
+        await run(rounds, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark de latência sob carga mista contra um servidor em execução.
+
+Dispara, em paralelo, relatórios pesados do admin (/stats, /ggr/report) e
+requisições leves (health, /me, banners, webhook) e imprime p50/p95/p99 por
+endpoint. Rode contra o mesmo banco antes e depois de uma mudança para comparar:
+
+    uvicorn main:app --port 8000 --workers 1
+    python scripts/bench_mixed_load.py --url http://127.0.0.1:8000 --duration 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/api/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client, name, method, path, headers, deadline, samples, errors, **kwargs):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, headers=headers, **kwargs)
+            if response.status_code >= 500:
+                errors[name] += 1
+        except httpx.HTTPError:
+            errors[name] += 1
+        samples[name].append((time.perf_counter() - started) * 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos de carga")
+    parser.add_argument("--report-workers", type=int, default=4, help="clientes concorrentes em relatórios")
+    parser.add_argument("--light-workers", type=int, default=16, help="clientes concorrentes em rotas leves")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.report_workers + args.light_workers + 4)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60.0) as client:
+        token = await login(client, args.username, args.password)
+        auth = {"Authorization": f"Bearer {token}"}
+
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.perf_counter() + args.duration
+
+        heavy = [
+            ("stats", "GET", "/api/admin/stats", auth, {}),
+            ("ggr_report", "GET", "/api/admin/ggr/report", auth, {}),
+        ]
+        light = [
+            ("health", "GET", "/api/health", None, {}),
+            ("me", "GET", "/api/auth/me", auth, {}),
+            ("banners", "GET", "/api/public/media/banners", None, {}),
+            ("webhook", "POST", "/api/webhooks/suitpay/pix-cashin", None, {"json": {"idTransaction": "bench"}}),
+        ]
+
+        tasks = []
+        for i in range(args.report_workers):
+            name, method, path, headers, kwargs = heavy[i % len(heavy)]
+            tasks.append(worker(client, name, method, path, headers, deadline, samples, errors, **kwargs))
+        for i in range(args.light_workers):
+            name, method, path, headers, kwargs = light[i % len(light)]
+            tasks.append(worker(client, name, method, path, headers, deadline, samples, errors, **kwargs))
+        await asyncio.gather(*tasks)
+
+    print(f"{'endpoint':<12} {'reqs':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'mean ms':>9}")
+    for name in sorted(samples):
+        values = samples[name]
+        print(
+            f"{name:<12} {len(values):>7} {errors[name]:>5} "
+            f"{percentile(values, 50):>9.1f} {percentile(values, 95):>9.1f} "
+            f"{percentile(values, 99):>9.1f} {statistics.fmean(values):>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
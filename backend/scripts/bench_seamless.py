@@ -0,0 +1,265 @@
+"""
+Simulador do IGameWin para a carteira seamless (/api/igamewin/callback).
+
+Cada jogador simulado gira --spins vezes em sequência, como um cliente real:
+débito da aposta, prêmio (0 na maioria dos giros) ou, em parte dos giros,
+estorno do débito. Uma fração das chamadas é reenviada em paralelo com a
+original (re-tentativa do provider) e alguns estornos chegam antes do débito.
+Os --users jogadores giram ao mesmo tempo. Ao final mede giros/s e a latência
+dos callbacks e confere, por jogador, o saldo contra o esperado e contra a
+soma do ledger, as apostas gravadas (quantidade, canceladas, prêmios) e os
+rollups de apostas contra a tabela bets; sai com código 1 se algo divergir:
+
+    python scripts/bench_seamless.py --users 500 --spins 40
+    DATABASE_URL=postgresql://... python scripts/bench_seamless.py --users 2000
+    DATABASE_URL=postgresql://... python scripts/bench_seamless.py --url http://localhost:8000
+
+Sem --url o app roda no próprio processo (httpx.ASGITransport, sem rede). Com
+--url os callbacks vão para o servidor, que deve usar o mesmo DATABASE_URL.
+Sem DATABASE_URL usa um SQLite temporário.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_seamless.db')}"
+# Jogadores além do pool esperam conexão, como num worker real
+os.environ.setdefault("DB_POOL_SIZE", "50")
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from sqlalchemy import case, func, insert, select  # noqa: E402
+
+import rollups  # noqa: E402
+from database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from models import Bet, BetStatus, IGameWinAgent, LedgerEntry, LedgerEntryType, User, UserRole  # noqa: E402
+
+INITIAL_BALANCE = 500.0
+BET_AMOUNTS = [0.5, 1.0, 2.0, 5.0]
+# Multiplicadores do prêmio: a maioria dos giros perde
+MULTIPLIERS = [0] * 6 + [0.5, 1, 2, 5]
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+
+def seed(run: str, users: int):
+    """({username: id} dos jogadores criados, agent_code e segredo do agente ativo)"""
+    now = datetime.utcnow()
+    names = [f"seamless_{run}_{i}" for i in range(users)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": name, "email": f"{name}@example.com", "password_hash": "x", "role": UserRole.USER.name,
+            "balance": INITIAL_BALANCE, "is_active": True, "is_verified": False, "created_at": now,
+        } for name in names])
+        ids = conn.execute(select(User.id, User.username).where(User.username.in_(names))).all()
+        conn.execute(insert(LedgerEntry), [{
+            "user_id": user_id, "type": LedgerEntryType.OPENING.name, "amount": INITIAL_BALANCE,
+            "balance_after": INITIAL_BALANCE, "reference_type": "bench", "created_at": now,
+        } for user_id, _ in ids])
+        agent = conn.execute(
+            select(IGameWinAgent.agent_code, IGameWinAgent.agent_key, IGameWinAgent.credentials)
+            .where(IGameWinAgent.is_active == True).limit(1)
+        ).first()
+        if agent is None:
+            conn.execute(insert(IGameWinAgent).values(
+                agent_code="bench", agent_key=uuid.uuid4().hex, api_url="http://localhost",
+                is_active=True, created_at=now,
+            ))
+            agent = conn.execute(select(IGameWinAgent.agent_code, IGameWinAgent.agent_key,
+                                        IGameWinAgent.credentials).where(IGameWinAgent.agent_code == "bench")).first()
+    credentials = json.loads(agent.credentials) if agent.credentials else {}
+    secret = credentials.get("agent_secret") or agent.agent_key
+    return {name: user_id for user_id, name in ids}, agent.agent_code, secret
+
+
+class Player:
+    """Um jogador simulado e o que o banco deve ter dele ao final"""
+
+    def __init__(self, username: str, user_id: int):
+        self.username = username
+        self.user_id = user_id
+        self.balance = INITIAL_BALANCE
+        self.bets = 0
+        self.cancelled = 0
+        self.wins = 0.0
+        self.mismatches = 0
+
+
+class Simulator:
+    def __init__(self, client: httpx.AsyncClient, agent_code: str, agent_secret: str, args):
+        self.client = client
+        self.agent = {"agent_code": agent_code, "agent_secret": agent_secret}
+        self.args = args
+        self.latencies = []
+        self.errors = 0
+
+    async def call(self, player: Player, method: str, **fields) -> dict:
+        payload = {"method": method, **self.agent, "user_code": player.username,
+                   "provider_code": "PGSOFT", "game_code": "fortune-tiger", **fields}
+        started = time.perf_counter()
+        response = await self.client.post("/api/igamewin/callback", json=payload)
+        self.latencies.append(time.perf_counter() - started)
+        body = response.json()
+        if response.status_code != 200 or (body.get("status") != 1 and body.get("msg") != "INSUFFICIENT_USER_FUNDS"):
+            self.errors += 1
+        return body
+
+    async def send(self, player: Player, rng: random.Random, method: str, **fields) -> dict:
+        """Envia o callback; às vezes junto com uma re-tentativa simultânea, que deve dar o mesmo saldo"""
+        if rng.random() >= self.args.duplicate_rate:
+            return await self.call(player, method, **fields)
+        first, second = await asyncio.gather(self.call(player, method, **fields), self.call(player, method, **fields))
+        if first.get("user_balance") != second.get("user_balance"):
+            player.mismatches += 1
+        return first
+
+    def check(self, player: Player, body: dict) -> None:
+        if body.get("status") == 1 and abs(body["user_balance"] - player.balance) > 1e-6:
+            player.mismatches += 1
+
+    async def play(self, player: Player, seed: int) -> None:
+        rng = random.Random(seed)
+        for spin in range(self.args.spins):
+            round_id = f"{player.username}-{spin}"
+            amount = rng.choice(BET_AMOUNTS)
+            if rng.random() < self.args.early_rollback_rate:
+                # Estorno antes do débito: o débito que chega depois não pode ser aplicado
+                self.check(player, await self.send(player, rng, "rollback", txn_id=f"{round_id}-r",
+                                                   ref_txn_id=f"{round_id}-d", round_id=round_id))
+                self.check(player, await self.send(player, rng, "debit", txn_id=f"{round_id}-d",
+                                                   round_id=round_id, amount=amount))
+                continue
+            body = await self.send(player, rng, "debit", txn_id=f"{round_id}-d", round_id=round_id, amount=amount)
+            if body.get("status") != 1:
+                continue  # saldo insuficiente
+            player.balance -= amount
+            player.bets += 1
+            self.check(player, body)
+            if rng.random() < self.args.rollback_rate:
+                player.balance += amount
+                player.cancelled += 1
+                self.check(player, await self.send(player, rng, "rollback", txn_id=f"{round_id}-r",
+                                                   ref_txn_id=f"{round_id}-d", round_id=round_id))
+                continue
+            win = round(amount * rng.choice(MULTIPLIERS), 2)
+            player.balance += win
+            player.wins += win
+            self.check(player, await self.send(player, rng, "credit", txn_id=f"{round_id}-c",
+                                               round_id=round_id, amount=win))
+        self.check(player, await self.call(player, "user_balance"))
+
+
+async def bet_totals():
+    """({status: (count, amount, win_amount)} da tabela bets, o mesmo pelos rollups)"""
+    async with AsyncSessionLocal() as db:
+        raw = {status.name: (count, amount or 0.0, win or 0.0) for status, count, amount, win in (await db.execute(
+            select(Bet.status, func.count(), func.sum(Bet.amount), func.sum(Bet.win_amount)).group_by(Bet.status)
+        )).all()}
+        rolled = await rollups.totals(db, rollups.BET)
+    return raw, rolled
+
+
+def _diff(after: dict, before: dict) -> dict:
+    return {status: tuple(a - b for a, b in zip(values, before.get(status, (0, 0.0, 0.0))))
+            for status, values in after.items()}
+
+
+async def verify(players, totals_before) -> int:
+    """Divergências entre o banco e o que os jogadores simulados esperam"""
+    ids = [p.user_id for p in players]
+    async with AsyncSessionLocal() as db:
+        balances = dict((await db.execute(select(User.id, User.balance).where(User.id.in_(ids)))).all())
+        ledger = dict((await db.execute(
+            select(LedgerEntry.user_id, func.sum(LedgerEntry.amount))
+            .where(LedgerEntry.user_id.in_(ids)).group_by(LedgerEntry.user_id)
+        )).all())
+        bets = {row[0]: row[1:] for row in (await db.execute(
+            select(Bet.user_id, func.count(), func.sum(case((Bet.status == BetStatus.CANCELLED, 1), else_=0)),
+                   func.sum(Bet.win_amount))
+            .where(Bet.user_id.in_(ids)).group_by(Bet.user_id)
+        )).all()}
+    problems = 0
+    for p in players:
+        count, cancelled, wins = bets.get(p.user_id, (0, 0, 0.0))
+        expected = (p.balance, p.balance, p.bets, p.cancelled, p.wins)
+        actual = (balances[p.user_id], ledger[p.user_id], count, cancelled or 0, wins or 0.0)
+        if p.mismatches or any(abs(a - e) > 1e-6 for a, e in zip(actual, expected)):
+            problems += 1
+            if problems <= 5:
+                print(f"  {p.username}: esperado saldo/ledger/apostas/canceladas/prêmios {expected}, "
+                      f"obtido {actual}, {p.mismatches} respostas com saldo errado")
+    # Só o que mudou nesta execução: o banco pode ter apostas inseridas em massa sem rollups
+    raw, rolled = await bet_totals()
+    raw, rolled = _diff(raw, totals_before[0]), _diff(rolled, totals_before[1])
+    for status in set(raw) | set(rolled):
+        expected, actual = raw.get(status, (0, 0.0, 0.0)), rolled.get(status, (0, 0.0, 0.0))
+        if any(abs(a - e) > 1e-6 for a, e in zip(actual, expected)):
+            problems += 1
+            print(f"  rollups de apostas {status}: {actual} != bets {expected}")
+    return problems
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--spins", type=int, default=25, help="giros por jogador")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="fração de callbacks reenviados")
+    parser.add_argument("--rollback-rate", type=float, default=0.03, help="fração de giros estornados")
+    parser.add_argument("--early-rollback-rate", type=float, default=0.01,
+                        help="fração de giros com o estorno chegando antes do débito")
+    parser.add_argument("--url", help="servidor a chamar (padrão: app no próprio processo)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    init_db()
+    run = uuid.uuid4().hex[:8]
+    users, agent_code, agent_secret = seed(run, args.users)
+    players = [Player(name, user_id) for name, user_id in users.items()]
+    totals_before = await bet_totals()
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30)
+    else:
+        from main import app
+        from seamless_wallet import bet_buffer
+        bet_buffer.start()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    sim = Simulator(client, agent_code, agent_secret, args)
+    started = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(sim.play(p, args.seed + i) for i, p in enumerate(players)))
+    elapsed = time.perf_counter() - started
+
+    if args.url:
+        # O servidor grava as apostas em lotes: espera o último flush
+        await asyncio.sleep(2)
+    else:
+        await bet_buffer.stop()
+
+    spins = args.users * args.spins
+    latencies = sorted(sim.latencies)
+    print(f"{spins} giros de {args.users} jogadores em {elapsed:.1f}s: {spins / elapsed:.0f} giros/s, "
+          f"{len(latencies) / elapsed:.0f} callbacks/s")
+    print(f"  latência p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms; {sim.errors} respostas de erro")
+    problems = await verify(players, totals_before) + sim.errors
+    print(f"  FALHA: {problems} divergência(s)" if problems else
+          "  OK: saldos, ledger, apostas e rollups conferem")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
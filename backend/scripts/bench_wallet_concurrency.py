@@ -0,0 +1,138 @@
+"""
+Benchmark de concorrência da carteira: verifica que não há atualizações perdidas.
+
+Dispara N operações simultâneas (créditos e débitos) no saldo de um mesmo
+usuário, cada uma em sua própria sessão/transação, e compara o saldo final com o
+esperado e com a soma do ledger. O modo --legacy reproduz o padrão antigo
+(ler user.balance, somar em Python e gravar), que perde atualizações:
+
+    python scripts/bench_wallet_concurrency.py --ops 2000 --concurrency 50
+    python scripts/bench_wallet_concurrency.py --legacy
+    DATABASE_URL=postgresql://... python scripts/bench_wallet_concurrency.py --concurrency 200
+
+Sem DATABASE_URL usa um SQLite temporário (com um único escritor, o SQLite
+serializa os UPDATEs; o resultado mais relevante é no Postgres).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_wallet.db')}"
+# Uma conexão por tarefa concorrente
+os.environ.setdefault("DB_POOL_SIZE", "50")
+os.environ.setdefault("DB_MAX_OVERFLOW", "200")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import wallet  # noqa: E402
+from database import AsyncSessionLocal, init_db  # noqa: E402
+from models import LedgerEntry, LedgerEntryType, User, UserRole  # noqa: E402
+
+INITIAL_BALANCE = 1000.0
+
+# Sob contenção todo UPDATE "espera" o lock e apareceria como slow_query
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+
+async def create_user() -> int:
+    name = f"bench_{uuid.uuid4().hex[:8]}"
+    async with AsyncSessionLocal() as db:
+        user = User(username=name, email=f"{name}@bench.local", password_hash="x",
+                    role=UserRole.USER, balance=0.0, is_active=True)
+        db.add(user)
+        await db.flush()
+        await wallet.credit(db, user.id, INITIAL_BALANCE, LedgerEntryType.ADJUSTMENT, description="bench")
+        await db.commit()
+        return user.id
+
+
+async def legacy_op(user_id: int, amount: float) -> bool:
+    """Padrão antigo: read-modify-write no objeto ORM"""
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if amount < 0 and user.balance < -amount:
+            return False
+        await asyncio.sleep(0)  # outra requisição roda entre a leitura e a escrita
+        user.balance += amount
+        await db.commit()
+        return True
+
+
+async def wallet_op(user_id: int, amount: float) -> bool:
+    async with AsyncSessionLocal() as db:
+        try:
+            if amount > 0:
+                await wallet.credit(db, user_id, amount, LedgerEntryType.ADJUSTMENT, description="bench")
+            else:
+                await wallet.debit(db, user_id, -amount, LedgerEntryType.ADJUSTMENT, description="bench")
+        except wallet.InsufficientFunds:
+            await db.rollback()
+            return False
+        await db.commit()
+        return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true", help="usa o read-modify-write antigo")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    init_db()
+    user_id = await create_user()
+    rng = random.Random(args.seed)
+    amounts = [rng.choice([10.0, 5.0, -5.0, -10.0]) for _ in range(args.ops)]
+    op = legacy_op if args.legacy else wallet_op
+
+    queue = asyncio.Queue()
+    for amount in amounts:
+        queue.put_nowait(amount)
+    applied, rejected, errors = [], 0, 0
+
+    async def worker():
+        nonlocal rejected, errors
+        while not queue.empty():
+            amount = queue.get_nowait()
+            try:
+                if await op(user_id, amount):
+                    applied.append(amount)
+                else:
+                    rejected += 1
+            except OperationalError:
+                errors += 1  # ex: "database is locked" no SQLite
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    async with AsyncSessionLocal() as db:
+        balance = await db.scalar(select(User.balance).where(User.id == user_id))
+        ledger_sum = await db.scalar(select(func.sum(LedgerEntry.amount)).where(LedgerEntry.user_id == user_id))
+
+    expected = INITIAL_BALANCE + sum(applied)
+    mode = "legacy (read-modify-write)" if args.legacy else "wallet (UPDATE atômico + ledger)"
+    print(f"{mode}: {args.ops} operações, concorrência {args.concurrency}, {args.ops / elapsed:.0f} ops/s")
+    print(f"  aplicadas {len(applied)}, recusadas por saldo {rejected}, erros {errors}")
+    print(f"  saldo final {balance:.2f}  esperado {expected:.2f}  diferença {balance - expected:+.2f}")
+    if not args.legacy:
+        print(f"  soma do ledger {ledger_sum:.2f}")
+    ok = abs(balance - expected) < 1e-6 and (args.legacy or abs(ledger_sum - balance) < 1e-6)
+    print("  OK: nenhuma atualização perdida" if ok else "  FALHA: atualizações perdidas")
+    if not ok and not args.legacy:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Manutenção das partições mensais de bets (Postgres, migração 0008).
+
+Sem opções lista as partições (ativas e arquivadas) com linhas estimadas e
+tamanho. --apply faz o mesmo que a manutenção em background do app: cria as
+partições que faltam e move as antigas para o schema bets_archive.
+--export-dir grava cada partição arquivada em <dir>/<nome>.csv.gz (COPY) e,
+conferida a quantidade de linhas, remove a tabela:
+
+    python scripts/bets_partitions.py
+    python scripts/bets_partitions.py --apply --months-ahead 6 --retention-months 12
+    python scripts/bets_partitions.py --export-dir /backups/bets
+"""
+import argparse
+import gzip
+import io
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import partitions  # noqa: E402
+from database import engine  # noqa: E402
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+
+def show(conn) -> None:
+    rows = conn.execute(text("""
+        SELECT n.nspname, c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND (c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'bets'::regclass)
+                                   OR n.nspname = :archive)
+        ORDER BY n.nspname DESC, c.relname
+    """), {"archive": partitions.ARCHIVE_SCHEMA}).all()
+    bounds = {name: (lo, hi) for name, lo, hi in partitions.partitions(conn)}
+    for schema, name, tuples, size in rows:
+        lo, hi = bounds.get(name, (None, None))
+        if schema == partitions.ARCHIVE_SCHEMA:
+            period = "arquivada"
+        elif name == partitions.DEFAULT_PARTITION:
+            period = "DEFAULT"
+        else:
+            period = f"{lo.date() if lo else '...'} até {hi.date() if hi else '...'}"
+        print(f"  {schema}.{name:<20} {period:<26} ~{max(tuples, 0):>12,} linhas {size / 1e6:>10.1f} MB")
+
+
+def export(conn, name: str, directory: str) -> str:
+    """COPY de bets_archive.name para directory/name.csv.gz; remove a tabela se as linhas conferem"""
+    table = f"{partitions.ARCHIVE_SCHEMA}.{name}"
+    path = os.path.join(directory, f"{name}.csv.gz")
+    expected = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+    cursor = conn.connection.driver_connection.cursor()
+    with gzip.open(path, "wb") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as out:
+        cursor.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as written:
+        lines = sum(1 for _ in written) - 1
+    if lines < expected:
+        raise RuntimeError(f"{path}: {lines} linhas exportadas, {expected} na tabela; tabela mantida")
+    conn.execute(text(f"DROP TABLE {table}"))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="cria as partições que faltam e arquiva as antigas")
+    parser.add_argument("--months-ahead", type=int, default=partitions.BETS_PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=partitions.BETS_RETENTION_MONTHS,
+                        help="0 não arquiva")
+    parser.add_argument("--export-dir", help="exporta as partições arquivadas para CSV gzip e as remove")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        if not partitions.is_partitioned(conn):
+            print("bets não é particionada (SQLite ou migração 0008 não aplicada)")
+            sys.exit(1)
+
+    if args.apply:
+        with engine.begin() as conn:
+            for name in partitions.ensure_partitions(conn, args.months_ahead):
+                print(f"Criada: {name}")
+        with engine.begin() as conn:
+            for name in partitions.archive_partitions(conn, args.retention_months):
+                print(f"Arquivada: {partitions.ARCHIVE_SCHEMA}.{name}")
+
+    if args.export_dir:
+        os.makedirs(args.export_dir, exist_ok=True)
+        with engine.connect() as conn:
+            archived = partitions.archived_partitions(conn)
+        for name in archived:
+            # Uma transação por partição: uma falha não desfaz as exportações anteriores
+            with engine.begin() as conn:
+                print(f"Exportada e removida: {export(conn, name, args.export_dir)}")
+
+    with engine.connect() as conn:
+        print("Partições de bets:")
+        show(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Verifica que as listagens do admin emitem um número fixo de queries (sem N+1).
+
+Popula usuários, depósitos, saques, FTDs, apostas e notificações, chama cada
+listagem com páginas de 1 e de 1000 linhas (por offset e por cursor), serializa
+o resultado como a rota faria (response_model) e falha (código 1) se alguma
+chamada passar do orçamento de queries, ou se a página grande custar mais
+queries que a pequena:
+
+    python scripts/check_query_counts.py
+    DATABASE_URL=postgresql://... python scripts/check_query_counts.py
+
+Sem DATABASE_URL usa um SQLite temporário criado com init_db().
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check_counts.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from models import (  # noqa: E402
+    FTD, Bet, BetStatus, Deposit, Notification, NotificationType, TransactionStatus, User, UserRole, Withdrawal,
+)
+from pagination import encode_cursor  # noqa: E402
+from routes import admin  # noqa: E402
+from sql_metrics import QueryBudgetExceeded, query_budget  # noqa: E402
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+ROWS = 1200
+USERS = 50
+PAGE_SIZES = (1, 1000)
+
+# (rota, endpoint, filtros, máximo de queries por chamada)
+LISTINGS = [
+    ("GET /users", admin.get_users, {}, 1),
+    ("GET /deposits", admin.get_deposits, {"status_filter": None, "user_id": None}, 1),
+    ("GET /withdrawals", admin.get_withdrawals, {"status_filter": None, "user_id": None}, 1),
+    ("GET /ftds", admin.get_ftds, {"user_id": None}, 1),
+    ("GET /bets", admin.get_bets, {"user_id": None, "status": None}, 1),
+    ("GET /notifications", admin.get_notifications, {"user_id": None, "is_read": None, "is_active": None}, 1),
+    ("GET /notifications?user_id", admin.get_notifications, {"user_id": 1, "is_read": None, "is_active": None}, 1),
+]
+# Detalhes com dados do usuário: (rota, endpoint, parâmetros, máximo de queries)
+DETAILS = [
+    ("GET /bets/{id}", admin.get_bet, {"bet_id": 1}, 1),
+]
+
+
+def seed() -> None:
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "username": f"count_{i}", "email": f"count_{i}@example.com", "password_hash": "x",
+            "role": UserRole.USER.name, "balance": 0.0, "is_active": True, "is_verified": False,
+            "created_at": now - timedelta(minutes=i),
+        } for i in range(USERS)])
+        conn.execute(insert(Deposit), [{
+            "user_id": 1 + i % USERS, "amount": 10.0, "status": TransactionStatus.APPROVED.name,
+            "transaction_id": f"count_dep_{i}", "created_at": now - timedelta(seconds=i),
+        } for i in range(ROWS)])
+        conn.execute(insert(Withdrawal), [{
+            "user_id": 1 + i % USERS, "amount": 5.0, "status": TransactionStatus.PENDING.name,
+            "transaction_id": f"count_wd_{i}", "created_at": now - timedelta(seconds=i),
+        } for i in range(ROWS)])
+        conn.execute(insert(FTD), [{
+            "user_id": 1 + i % USERS, "deposit_id": 1 + i, "amount": 10.0, "is_first_deposit": True,
+            "pass_rate": 0.0, "status": TransactionStatus.APPROVED.name, "created_at": now - timedelta(seconds=i),
+        } for i in range(ROWS)])
+        conn.execute(insert(Bet), [{
+            "user_id": 1 + i % USERS, "game_id": "1", "provider": "PGSOFT", "amount": 1.0, "win_amount": 0.0,
+            "status": BetStatus.LOST.name, "transaction_id": f"count_bet_{i}", "created_at": now - timedelta(seconds=i),
+        } for i in range(ROWS)])
+        # Metade global (user_id nulo), metade do usuário 1
+        conn.execute(insert(Notification), [{
+            "title": "t", "message": "m", "type": NotificationType.INFO.name, "user_id": None if i % 2 else 1,
+            "is_read": False, "is_active": True, "created_at": now - timedelta(seconds=i),
+        } for i in range(ROWS)])
+
+
+def serializer(endpoint):
+    """Validação do response_model da rota (lê os atributos como o FastAPI faria), ou None"""
+    for route in admin.router.routes:
+        if getattr(route, "endpoint", None) is endpoint and route.response_model is not None:
+            adapter = TypeAdapter(route.response_model)
+            return lambda result: adapter.validate_python(result, from_attributes=True)
+    return None
+
+
+def next_cursor(result) -> str:
+    """Cursor da última linha de uma página (entidades ou linhas de paginate_rows)"""
+    last = result[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last["created_at"], last["id"])
+    return encode_cursor(last.created_at, last.id)
+
+
+async def call(name, endpoint, max_queries, **params):
+    """(queries emitidas, resultado) de endpoint(**params), serializado como na rota"""
+    serialize = serializer(endpoint)
+    async with AsyncSessionLocal() as db:
+        with query_budget(max_queries, name) as stats:
+            result = await endpoint(db=db, current_user=None, **params)
+            if serialize:
+                serialize(result)
+    return stats.query_count, result
+
+
+async def listing_counts(name, endpoint, filters, max_queries):
+    """Queries de cada página (1 e 1000 linhas, por offset e pelo cursor seguinte)"""
+    counts = []
+    for limit in PAGE_SIZES:
+        page = {"response": None, "skip": 0, "limit": limit, **filters}
+        count, result = await call(name, endpoint, max_queries, cursor=None, **page)
+        counts.append(count)
+        count, _ = await call(name, endpoint, max_queries, cursor=next_cursor(result), **page)
+        counts.append(count)
+    return counts
+
+
+async def main():
+    init_db()
+    seed()
+
+    failures = 0
+    for name, endpoint, filters, max_queries in LISTINGS:
+        try:
+            counts = await listing_counts(name, endpoint, filters, max_queries)
+        except QueryBudgetExceeded as exc:
+            print(f"[FALHA] {exc}")
+            failures += 1
+            continue
+        # O custo não pode crescer com o tamanho da página
+        ok = len(set(counts)) == 1
+        failures += not ok
+        print(f"[{'ok' if ok else 'FALHA'}] {name}: {counts} queries (máximo {max_queries})")
+    for name, endpoint, params, max_queries in DETAILS:
+        try:
+            count, _ = await call(name, endpoint, max_queries, **params)
+        except QueryBudgetExceeded as exc:
+            print(f"[FALHA] {exc}")
+            failures += 1
+            continue
+        print(f"[ok] {name}: {count} queries (máximo {max_queries})")
+    print(f"{failures} listagem(ns) acima do orçamento" if failures else "Nenhuma listagem com N+1")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,259 @@
+"""
+Verifica, via EXPLAIN, que as listagens do admin e os relatórios usam índices.
+
+Executa cada rota/relatório contra o banco, captura os SELECTs emitidos e roda
+EXPLAIN em cada um (EXPLAIN QUERY PLAN no SQLite; EXPLAIN (FORMAT JSON) com
+enable_seqscan e enable_sort desligados no Postgres, para que o plano reflita os
+índices disponíveis mesmo com tabelas vazias: uma varredura ou ordenação que
+sobra é porque nenhum índice a evita). Falha (código 1) se alguma consulta
+varrer a tabela inteira, ordenar sem índice ou (Postgres) filtrar linhas que
+nenhum índice cobriria, fora das tabelas permitidas para aquela consulta:
+
+    python scripts/check_query_plans.py
+    DATABASE_URL=postgresql://... python scripts/check_query_plans.py -v
+
+Sem DATABASE_URL usa um SQLite temporário criado com init_db().
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check_plans.db')}"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, inspect  # noqa: E402
+
+from database import AsyncSessionLocal, ReportSessionLocal, async_engine, engine, init_db, report_engine  # noqa: E402
+from models import BetStatus, TransactionStatus, WebhookStatus  # noqa: E402
+from pagination import encode_cursor  # noqa: E402
+from routes import admin, media  # noqa: E402
+
+logging.getLogger("sql").setLevel(logging.ERROR)
+
+NOW = datetime.utcnow()
+# Período com pontas parciais: os dias inteiros vêm dos rollups, as pontas das tabelas
+GGR_START = datetime.combine((NOW - timedelta(days=30)).date(), datetime.min.time()) + timedelta(hours=5)
+GGR_END = datetime.combine((NOW - timedelta(days=1)).date(), datetime.min.time()) + timedelta(hours=3)
+
+# Cursor de uma página profunda, para conferir o plano do modo keyset
+CURSOR = encode_cursor(NOW - timedelta(days=180), 10**9)
+
+
+def listing(endpoint, cursor=None, **filters):
+    """Chamada de uma listagem paginada do admin (primeira página ou, com cursor, página profunda)"""
+    return lambda db: endpoint(skip=0, limit=100, cursor=cursor, response=None, db=db, current_user=None, **filters)
+
+
+# (nome, chamada(db), sessão, tabelas que podem ser varridas/ordenadas sem índice)
+CHECKS = []
+# Listagens paginadas: (rota, endpoint, filtros em branco, variações de filtro)
+for path, endpoint, blank, variants in (
+    ("/users", admin.get_users, {}, [{}]),
+    ("/deposits", admin.get_deposits, {"status_filter": None, "user_id": None},
+     [{}, {"status_filter": TransactionStatus.PENDING}, {"user_id": 1}]),
+    ("/withdrawals", admin.get_withdrawals, {"status_filter": None, "user_id": None},
+     [{}, {"status_filter": TransactionStatus.PENDING}, {"user_id": 1}]),
+    ("/ftds", admin.get_ftds, {"user_id": None}, [{}, {"user_id": 1}]),
+    ("/bets", admin.get_bets, {"user_id": None, "status": None, "start_date": None, "end_date": None},
+     [{}, {"status": BetStatus.WON}, {"user_id": 1}, {"start_date": GGR_START.isoformat()}]),
+    ("/notifications", admin.get_notifications, {"user_id": None, "is_read": None, "is_active": None},
+     [{}, {"user_id": 1}]),
+):
+    for variant in variants:
+        for cursor in (None, CURSOR):
+            params = list(variant) + (["cursor"] if cursor else [])
+            name = f"GET {path}" + ("?" + "&".join(params) if params else "")
+            # /users sem cursor mantém ORDER BY id: percorre a chave primária (no SQLite, "SCAN users")
+            allowed = {"users"} if path == "/users" and cursor is None else set()
+            CHECKS.append((name, listing(endpoint, cursor, **{**blank, **variant}), AsyncSessionLocal, allowed))
+
+
+async def drain(export):
+    """Consome o corpo de uma rota de exportação (as consultas rodam durante o streaming)"""
+    response = await export
+    async for _ in response.body_iterator:
+        pass
+
+
+# Exportações: período mensal, com e sem os filtros da listagem
+PERIOD = {"format": "csv", "start_date": (NOW - timedelta(days=30)).isoformat(), "end_date": NOW.isoformat()}
+for path, endpoint, variants in (
+    ("/deposits/export", admin.export_deposits,
+     [{"status_filter": None, "user_id": None}, {"status_filter": TransactionStatus.APPROVED, "user_id": None},
+      {"status_filter": None, "user_id": 1}]),
+    ("/withdrawals/export", admin.export_withdrawals, [{"status_filter": None, "user_id": None}]),
+    ("/bets/export", admin.export_bets,
+     [{"user_id": None, "status": None}, {"user_id": None, "status": BetStatus.WON}, {"user_id": 1, "status": None}]),
+):
+    for filters in variants:
+        name = f"GET {path}" + "".join(f"&{key}" for key, value in filters.items() if value is not None)
+        CHECKS.append((name.replace("&", "?", 1), lambda db, endpoint=endpoint, filters=filters: drain(
+            endpoint(current_user=None, **PERIOD, **filters)), ReportSessionLocal, set()))
+
+CHECKS += [
+    # ORDER BY id: percorre a chave primária de trás para frente
+    ("GET /webhooks/inbox", lambda db: admin.get_webhook_inbox(
+        status_filter=None, skip=0, limit=100, db=db, current_user=None), AsyncSessionLocal, {"webhook_inbox"}),
+    # Dead-letters são poucas; o índice (status, next_attempt_at) filtra, a ordenação por id é em memória
+    ("GET /webhooks/inbox?status_filter", lambda db: admin.get_webhook_inbox(
+        status_filter=WebhookStatus.DEAD, skip=0, limit=100, db=db, current_user=None),
+     AsyncSessionLocal, {"webhook_inbox"}),
+    # Poucas mídias por tipo
+    ("GET /api/media/list", lambda db: media.list_media(media_type=None, db=db, current_user=None),
+     AsyncSessionLocal, {"media_assets"}),
+    ("GET /api/public/banners", lambda db: media.get_public_banners(db=db), AsyncSessionLocal, set()),
+    ("GET /api/public/logo", lambda db: media.get_public_logo(db=db), AsyncSessionLocal, {"media_assets"}),
+    # Contagem/saldo de usuários varre users; rollups e gateways são O(dias)/minúsculas
+    ("GET /stats", admin.compute_stats, ReportSessionLocal, {"users", "daily_rollups", "gateways"}),
+    ("GET /ggr/report", lambda db: admin.compute_ggr_report(db, GGR_START, GGR_END),
+     ReportSessionLocal, {"daily_rollups"}),
+]
+
+
+async def capture(call, session_factory):
+    """SELECTs emitidos por call(db)"""
+    statements = []
+    engine = (report_engine if session_factory is ReportSessionLocal else async_engine).sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        async with session_factory() as db:
+            await call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def sqlite_problems(plan_rows, allowed):
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        scan = re.match(r"SCAN (\w+)(.*)", detail)
+        if scan and "USING" not in scan.group(2) and scan.group(1) not in allowed | {"CONSTANT"}:
+            problems.append(detail)
+        if "TEMP B-TREE FOR ORDER BY" in detail:
+            tables = {m for row in plan_rows for m in re.findall(r"(?:SCAN|SEARCH) (\w+)", row[-1])}
+            if tables - allowed:
+                problems.append(detail)
+    return problems
+
+
+# Condições simples de um Filter do Postgres: (coluna = valor) e (coluna IS NULL)
+EQUALITY = re.compile(r"\((\w+) = [^()]*\)")
+IS_NULL = re.compile(r"\((\w+) IS NULL\)")
+
+
+def covering_index(indexes, chosen, condition):
+    """Índice que atende à consulta sem o Filter: começa pelas colunas filtradas por igualdade
+    (ou é parcial com o IS NULL) e segue com as colunas do índice escolhido, que dão a ordem.
+
+    Com as tabelas vazias os custos empatam, e com dados reais o planner prefere o índice da
+    ordem quando o filtro é pouco seletivo; em ambos os casos o índice existe e não há problema.
+    """
+    equal, nulls = set(EQUALITY.findall(condition)), set(IS_NULL.findall(condition))
+    rest = IS_NULL.sub("", EQUALITY.sub("", condition))
+    if not (equal or nulls) or re.sub(r"AND|[()\s]", "", rest):
+        return None
+    ordered = next((columns for name, columns, _ in indexes if name == chosen), None)
+    if ordered is None:
+        return None
+    for name, columns, where in indexes:
+        lead, tail = columns[:len(equal)], columns[len(equal):len(equal) + len(ordered)]
+        if set(lead) == equal and tail == ordered and all(f"{column} IS NULL" in where for column in nulls):
+            return name
+    return None
+
+
+def postgres_problems(plan, allowed, indexes):
+    """indexes: {tabela: [(nome, colunas, condição do índice parcial)]}"""
+    problems = []
+
+    def relations(node):
+        found = {node["Relation Name"]} if "Relation Name" in node else set()
+        for child in node.get("Plans", []):
+            found |= relations(child)
+        return found
+
+    def walk(node, parent=None):
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] not in allowed:
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        # Índice usado só pela ordem, com o WHERE aplicado linha a linha depois, sem outro índice que o cubra
+        if node["Node Type"] in ("Index Scan", "Index Only Scan", "Bitmap Heap Scan") and "Filter" in node \
+                and node["Relation Name"] not in allowed \
+                and not covering_index(indexes.get(node["Relation Name"], []), node.get("Index Name"), node["Filter"]):
+            problems.append(f"{node['Node Type']} using {node.get('Index Name', '?')} on {node['Relation Name']}"
+                            f" com Filter {node['Filter']}")
+        # Sort logo abaixo de um Aggregate é do GROUP BY (sobre as linhas já filtradas), não de ORDER BY
+        grouping = parent is not None and parent["Node Type"] == "Aggregate"
+        if node["Node Type"] in ("Sort", "Incremental Sort") and not grouping and relations(node) - allowed:
+            problems.append(f"Sort ({', '.join(node.get('Sort Key', []))})")
+        for child in node.get("Plans", []):
+            walk(child, node)
+
+    walk(plan[0]["Plan"])
+    return problems
+
+
+def postgres_indexes():
+    inspector = inspect(engine)
+    return {
+        table: [
+            (index["name"], index["column_names"], str(index.get("dialect_options", {}).get("postgresql_where", "")))
+            for index in inspector.get_indexes(table)
+        ]
+        for table in inspector.get_table_names()
+    }
+
+
+async def explain(statement, parameters, allowed, indexes):
+    dialect = async_engine.dialect.name
+    async with async_engine.connect() as conn:
+        if dialect == "postgresql":
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            await conn.exec_driver_sql("SET enable_sort = off")
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return postgres_problems(plan, allowed, indexes), json.dumps(plan[0]["Plan"], indent=1)
+        rows = (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all()
+        return sqlite_problems(rows, allowed), "\n".join(row[-1] for row in rows)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true", help="mostra o plano de cada consulta")
+    args = parser.parse_args()
+
+    init_db()
+    indexes = postgres_indexes() if engine.dialect.name == "postgresql" else {}
+    failures = 0
+    for name, call, session_factory, allowed in CHECKS:
+        statements = await capture(call, session_factory)
+        for statement, parameters in statements:
+            problems, plan = await explain(statement, parameters, allowed, indexes)
+            status = "FALHA" if problems else "ok"
+            print(f"[{status}] {name}: {' '.join(statement.split())[:110]}")
+            for problem in problems:
+                print(f"        {problem}")
+            if args.verbose:
+                print("        " + plan.replace("\n", "\n        "))
+            failures += bool(problems)
+    print(f"{failures} consulta(s) sem índice" if failures else "Todas as consultas usam índices")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
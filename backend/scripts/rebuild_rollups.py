@@ -0,0 +1,37 @@
+"""
+Recalcula os agregados diários (daily_rollups) a partir das tabelas de transações.
+
+Necessário após cargas/correções feitas direto no banco (fora do ORM), que não
+passam pelo listener de rollups.py:
+
+    python scripts/rebuild_rollups.py                       # tudo
+    python scripts/rebuild_rollups.py --from 2026-10-01 --to 2026-10-17
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rollups  # noqa: E402
+from database import engine, init_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="primeiro dia (AAAA-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="último dia, inclusive (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rows = rollups.rebuild(conn, args.start, args.end)
+    period = f"{args.start or 'início'} a {args.end or 'hoje'}"
+    print(f"Rollups recalculados ({period}): {rows} linhas em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""
+Carteira seamless do IGameWin: callbacks de saldo, aposta, prêmio e estorno.
+
+Na carteira seamless o saldo do jogador fica aqui. A cada giro o IGameWin chama
+POST /api/igamewin/callback com method "user_balance", "debit" (aposta),
+"credit" (prêmio, 0 se perdeu) ou "rollback" (desfaz um débito) e espera a
+resposta {"status": 1, "user_balance": ...} para seguir o jogo. São milhares de
+chamadas por segundo num nó, então o caminho de cada uma é curto:
+
+- o saldo muda pelo wallet (UPDATE atômico + ledger) na transação do callback,
+  com idempotency_key "igamewin:<txn_id>": a re-tentativa de um callback
+  devolve o saldo atual sem aplicar de novo;
+- callbacks do mesmo usuário são serializados por um lock em memória: o débito
+  e o prêmio de um giro esperam um pelo outro aqui, sem disputar o lock da
+  linha do usuário no banco. Entre workers/nós o UPDATE atômico e a
+  idempotency_key única continuam garantindo a consistência;
+- a aposta não é gravada na transação do callback: vai para o bet_buffer, que
+  insere as linhas em lote (um INSERT de várias linhas a cada BET_BUFFER_SIZE
+  apostas ou BET_FLUSH_SECONDS) e aplica os rollups do lote na mesma
+  transação. O prêmio de um giro que ainda está no buffer só altera a linha em
+  memória;
+- cada lote reserva antes os transaction_id em bet_transactions (chave primária
+  global; em bets, particionada no Postgres, transaction_id só é único dentro
+  da partição): apostas já gravadas ficam de fora do INSERT e dos rollups.
+
+O id de cada user_code fica em cache (SEAMLESS_USER_CACHE_SECONDS); usuário
+desativado ou removido pelo admin sai do cache em todos os workers
+(invalidate_principal), então deixa de apostar na hora.
+
+Um estorno de débito que ainda não chegou grava um lançamento de valor zero com
+a idempotency_key do débito: se o débito chegar depois, ele é ignorado.
+
+Se o processo cair, as apostas ainda no buffer se perdem (o saldo não: cada
+movimento está no ledger, com o giro na descrição). No desligamento normal o
+buffer é esvaziado.
+"""
+import asyncio
+import hmac
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import rollups
+import wallet
+from cache import MISSING, TTLCache
+from config_cache import config_cache, USER_PREFIX
+from database import AsyncSessionLocal, async_engine
+from igamewin_api import get_agent_config
+from models import Bet, BetStatus, BetTransaction, LedgerEntry, LedgerEntryType, User
+
+BET_BUFFER_SIZE = int(os.getenv("BET_BUFFER_SIZE", "500"))
+BET_FLUSH_SECONDS = float(os.getenv("BET_FLUSH_SECONDS", "0.5"))
+# username -> id dos jogadores (user_code dos callbacks)
+SEAMLESS_USER_CACHE_SIZE = int(os.getenv("SEAMLESS_USER_CACHE_SIZE", "50000"))
+SEAMLESS_USER_CACHE_SECONDS = float(os.getenv("SEAMLESS_USER_CACHE_SECONDS", "300"))
+
+PROVIDER = "IGameWin"
+
+# Códigos de erro devolvidos em {"status": 0, "msg": ...}
+INVALID_METHOD = "INVALID_METHOD"
+INVALID_PARAMETER = "INVALID_PARAMETER"
+INVALID_AGENT = "INVALID_AGENT"
+INVALID_USER = "INVALID_USER"
+INSUFFICIENT_USER_FUNDS = "INSUFFICIENT_USER_FUNDS"
+
+
+class SeamlessError(Exception):
+    """Erro devolvido ao IGameWin como {"status": 0, "msg": code}"""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+class KeyedLocks:
+    """Um asyncio.Lock por chave, descartado quando ninguém mais o usa"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._users: Dict[Hashable, int] = defaultdict(int)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] += 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class _Batch:
+    """Apostas ainda não gravadas, por transaction_id e pelo último giro de cada usuário"""
+
+    def __init__(self):
+        self.rows: Dict[str, dict] = {}
+        self.rounds: Dict[Tuple[int, str], dict] = {}
+        self.done = asyncio.Event()
+
+    def add(self, row: dict) -> None:
+        self.rows[row["transaction_id"]] = row
+        if row["external_id"]:
+            self.rounds[(row["user_id"], row["external_id"])] = row
+
+    def find(self, user_id: int, transaction_id: Optional[str], round_id: Optional[str]) -> Optional[dict]:
+        if transaction_id is not None:
+            row = self.rows.get(transaction_id)
+            return row if row is not None and row["user_id"] == user_id else None
+        return self.rounds.get((user_id, round_id))
+
+
+class BetBuffer:
+    """Grava as apostas dos callbacks em lotes, em background"""
+
+    def __init__(self, size: int = BET_BUFFER_SIZE, interval: float = BET_FLUSH_SECONDS):
+        self.size = max(1, size)
+        self.interval = interval
+        self._open = _Batch()
+        self._writing: Optional[_Batch] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def add(self, row: dict) -> None:
+        if row["transaction_id"] in self._open.rows:
+            return
+        self._open.add(row)
+        if len(self._open.rows) >= self.size and self._wake is not None:
+            self._wake.set()
+
+    async def _find(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        transaction_id: Optional[str] = None,
+        round_id: Optional[str] = None,
+    ) -> Union[dict, Bet, None]:
+        """A aposta do usuário por transaction_id ou a última do giro: dict no buffer, Bet do banco ou None"""
+        while True:
+            row = self._open.find(user_id, transaction_id, round_id)
+            if row is not None:
+                return row
+            writing = self._writing
+            if writing is None or writing.find(user_id, transaction_id, round_id) is None:
+                break
+            # O lote com a aposta está sendo gravado: espera e procura de novo (se a
+            # gravação falhar, as linhas voltam para o buffer aberto)
+            await writing.done.wait()
+        query = select(Bet)
+        if transaction_id is not None:
+            query = query.where(Bet.transaction_id == transaction_id, Bet.user_id == user_id)
+        else:
+            query = query.where(Bet.user_id == user_id, Bet.external_id == round_id).order_by(Bet.id.desc())
+        return await db.scalar(query.limit(1))
+
+    async def settle(self, db: AsyncSession, user_id: int, round_id: str, win_delta: float) -> bool:
+        """Soma win_delta ao prêmio da última aposta do giro e a marca WON/LOST; False se não há aposta"""
+        bet = await self._find(db, user_id, round_id=round_id)
+        if bet is None:
+            return False
+        if isinstance(bet, dict):
+            bet["win_amount"] = (bet["win_amount"] or 0.0) + win_delta
+            if bet["status"] != BetStatus.CANCELLED:
+                bet["status"] = BetStatus.WON if bet["win_amount"] > 0 else BetStatus.LOST
+            bet["updated_at"] = datetime.utcnow()
+        else:
+            bet.win_amount = (bet.win_amount or 0.0) + win_delta
+            if bet.status != BetStatus.CANCELLED:
+                bet.status = BetStatus.WON if bet.win_amount > 0 else BetStatus.LOST
+        return True
+
+    async def cancel(self, db: AsyncSession, user_id: int, transaction_id: str) -> bool:
+        """Marca a aposta transaction_id do usuário como CANCELLED; False se ela não existe"""
+        bet = await self._find(db, user_id, transaction_id=transaction_id)
+        if bet is None:
+            return False
+        if isinstance(bet, dict):
+            bet["status"] = BetStatus.CANCELLED
+            bet["updated_at"] = datetime.utcnow()
+        else:
+            bet.status = BetStatus.CANCELLED
+        return True
+
+    async def _write(self, rows: List[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+            # Uma aposta já gravada (re-tentativa que escapou do ledger, em qualquer partição) não
+            # entra de novo nem conta duas vezes nos rollups: só seguem os transaction_id reservados agora
+            claim = insert(BetTransaction).on_conflict_do_nothing(index_elements=["transaction_id"])
+            claimed = set((await db.scalars(claim.returning(BetTransaction.transaction_id), [
+                {"transaction_id": row["transaction_id"], "created_at": row["created_at"]} for row in rows
+            ])).all())
+            rows = [row for row in rows if row["transaction_id"] in claimed]
+            if not rows:
+                await db.commit()
+                return
+            # Sem alvo: rede de segurança para apostas gravadas fora do buffer (sem reserva)
+            stmt = insert(Bet).on_conflict_do_nothing()
+            inserted = set((await db.scalars(stmt.returning(Bet.transaction_id), rows)).all())
+            deltas = rollups.insert_deltas(Bet, [row for row in rows if row["transaction_id"] in inserted])
+            if deltas:
+                await db.run_sync(lambda session: rollups.apply_deltas(session.connection(), deltas))
+            await db.commit()
+
+    async def flush(self) -> int:
+        """Grava as apostas do buffer; retorna quantas foram gravadas"""
+        if not _SINGLE_WRITER:
+            return await self._flush()
+        # A vez do flush é pega antes de separar o lote: nenhum callback espera por ele
+        async with _user_locks.hold(_ALL_USERS):
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        if self._writing is not None or not self._open.rows:
+            return 0
+        batch, self._open = self._open, _Batch()
+        self._writing = batch
+        try:
+            await self._write(list(batch.rows.values()))
+            return len(batch.rows)
+        except Exception as e:
+            print(f"Erro ao gravar {len(batch.rows)} apostas (voltam para o buffer): {e}")
+            # Linhas novas do buffer aberto (prêmios do mesmo giro) têm prioridade
+            for transaction_id, row in batch.rows.items():
+                self._open.rows.setdefault(transaction_id, row)
+            for round_key, row in batch.rounds.items():
+                self._open.rounds.setdefault(round_key, row)
+            return 0
+        finally:
+            self._writing = None
+            batch.done.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Para o flush periódico e grava o que restou no buffer"""
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wake.set()
+            await task
+        await self.flush()
+        self._wake = None
+
+    def __len__(self) -> int:
+        return len(self._open.rows)
+
+
+# SQLite tem um único escritor: callbacks e flush do buffer passam todos pela mesma chave
+_SINGLE_WRITER = async_engine.dialect.name == "sqlite"
+_ALL_USERS = 0
+
+bet_buffer = BetBuffer()
+_user_locks = KeyedLocks()
+_user_ids = TTLCache(maxsize=SEAMLESS_USER_CACHE_SIZE, ttl=SEAMLESS_USER_CACHE_SECONDS)
+
+
+def _on_config_invalidated(name: Optional[str]) -> None:
+    if name is None:
+        _user_ids.clear()
+    elif name.startswith(USER_PREFIX):
+        _user_ids.delete(name[len(USER_PREFIX):])
+
+
+config_cache.on_invalidate(_on_config_invalidated)
+
+
+def _key(txn_id: str) -> str:
+    return f"igamewin:{txn_id}"
+
+
+def _text(payload: Dict[str, Any], field: str) -> str:
+    value = payload.get(field)
+    if value is None or value == "":
+        raise SeamlessError(INVALID_PARAMETER)
+    return str(value)
+
+
+def _amount(payload: Dict[str, Any]) -> float:
+    try:
+        amount = float(payload.get("amount"))
+    except (TypeError, ValueError):
+        raise SeamlessError(INVALID_PARAMETER)
+    if not amount >= 0:  # rejeita negativos e NaN
+        raise SeamlessError(INVALID_PARAMETER)
+    return round(amount, 2)
+
+
+def _description(payload: Dict[str, Any]) -> str:
+    return f"{payload.get('provider_code') or PROVIDER}/{payload.get('game_code') or ''} giro {payload.get('round_id') or ''}"[:255]
+
+
+async def _authenticate(db: AsyncSession, payload: Dict[str, Any]) -> None:
+    config = await get_agent_config(db)
+    if not config or payload.get("agent_code") != config["agent_code"]:
+        raise SeamlessError(INVALID_AGENT)
+    secret = config["credentials"].get("agent_secret") or config["agent_key"]
+    if not hmac.compare_digest(str(payload.get("agent_secret") or "").encode(), str(secret).encode()):
+        raise SeamlessError(INVALID_AGENT)
+
+
+async def _user_id(db: AsyncSession, user_code: str) -> int:
+    user_id = _user_ids.get(user_code)
+    if user_id is MISSING:
+        user_id = await db.scalar(select(User.id).where(User.username == user_code, User.is_active == True))
+        if user_id is None:
+            raise SeamlessError(INVALID_USER)
+        _user_ids.set(user_code, user_id)
+    return user_id
+
+
+async def _balance(db: AsyncSession, user_id: int) -> float:
+    balance = await db.scalar(select(User.balance).where(User.id == user_id))
+    if balance is None:
+        # Removido depois que o id entrou no cache (handle() descarta a entrada)
+        raise SeamlessError(INVALID_USER)
+    return balance
+
+
+def _bet_row(user_id: int, payload: Dict[str, Any], amount: float) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": user_id,
+        "game_id": str(payload.get("game_code") or "")[:255] or None,
+        "game_name": None,
+        "provider": str(payload.get("provider_code") or PROVIDER)[:100],
+        "amount": amount,
+        "win_amount": 0.0,
+        "status": BetStatus.PENDING,
+        "transaction_id": str(payload["txn_id"])[:255],
+        "external_id": str(payload.get("round_id") or "")[:255] or None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def _user_balance(db: AsyncSession, user_id: int, payload: Dict[str, Any]) -> float:
+    return await _balance(db, user_id)
+
+
+async def _debit(db: AsyncSession, user_id: int, payload: Dict[str, Any]) -> float:
+    txn_id, amount = _text(payload, "txn_id"), _amount(payload)
+    if amount > 0:
+        try:
+            balance = await wallet.debit(
+                db, user_id, amount, LedgerEntryType.BET, reference_type="bet",
+                description=_description(payload), idempotency_key=_key(txn_id),
+            )
+        except wallet.InsufficientFunds:
+            raise SeamlessError(INSUFFICIENT_USER_FUNDS)
+        if balance is None:
+            # Re-tentativa (ou débito já estornado): nada a aplicar
+            return await _balance(db, user_id)
+        await db.commit()
+    else:
+        balance = await _balance(db, user_id)
+    bet_buffer.add(_bet_row(user_id, payload, amount))
+    return balance
+
+
+async def _credit(db: AsyncSession, user_id: int, payload: Dict[str, Any]) -> float:
+    txn_id, amount = _text(payload, "txn_id"), _amount(payload)
+    round_id = str(payload.get("round_id") or "")
+    if amount > 0:
+        balance = await wallet.credit(
+            db, user_id, amount, LedgerEntryType.BET_WIN, reference_type="bet",
+            description=_description(payload), idempotency_key=_key(txn_id),
+        )
+        if balance is None:
+            return await _balance(db, user_id)
+        await db.commit()
+    else:
+        balance = await _balance(db, user_id)
+    # A aposta só muda depois que o saldo foi gravado: uma re-tentativa não soma o prêmio duas vezes
+    if round_id and await bet_buffer.settle(db, user_id, round_id, amount):
+        await db.commit()
+    elif amount > 0:
+        # Prêmio sem aposta no giro (rodada grátis, bônus): registrado como aposta de valor zero
+        row = _bet_row(user_id, payload, 0.0)
+        row.update(win_amount=amount, status=BetStatus.WON)
+        bet_buffer.add(row)
+    return balance
+
+
+async def _rollback(db: AsyncSession, user_id: int, payload: Dict[str, Any]) -> float:
+    ref_txn_id = _text(payload, "ref_txn_id")
+    entry = (await db.execute(
+        select(LedgerEntry.amount, LedgerEntry.type, LedgerEntry.user_id)
+        .where(LedgerEntry.idempotency_key == _key(ref_txn_id))
+    )).first()
+    if entry is None:
+        # Estorno antes do débito: o lançamento zero bloqueia o débito se ele chegar depois
+        balance = await _balance(db, user_id)
+        db.add(LedgerEntry(
+            user_id=user_id, type=LedgerEntryType.BET_ROLLBACK, amount=0.0, balance_after=balance,
+            reference_type="bet", idempotency_key=_key(ref_txn_id), description=_description(payload),
+        ))
+        await db.commit()
+        if await bet_buffer.cancel(db, user_id, ref_txn_id):  # débito de valor zero (giro grátis)
+            await db.commit()
+        return balance
+
+    amount, entry_type, entry_user_id = entry
+    if entry_user_id != user_id:
+        # ref_txn_id de outro jogador: não estorna nem cancela nada
+        raise SeamlessError(INVALID_PARAMETER)
+    rollback_key = _key(f"{ref_txn_id}:rollback")
+    balance = None
+    try:
+        if amount < 0:
+            balance = await wallet.credit(db, user_id, -amount, LedgerEntryType.BET_ROLLBACK, reference_type="bet",
+                                          description=_description(payload), idempotency_key=rollback_key)
+        elif amount > 0:
+            balance = await wallet.debit(db, user_id, amount, LedgerEntryType.BET_ROLLBACK, reference_type="bet",
+                                         description=_description(payload), idempotency_key=rollback_key)
+    except wallet.InsufficientFunds:
+        raise SeamlessError(INSUFFICIENT_USER_FUNDS)
+    if balance is None:
+        return await _balance(db, user_id)
+    await db.commit()
+    if entry_type == LedgerEntryType.BET:
+        changed = await bet_buffer.cancel(db, user_id, ref_txn_id)
+    else:
+        changed = bool(payload.get("round_id")) and await bet_buffer.settle(db, user_id, str(payload["round_id"]), -amount)
+    if changed:
+        await db.commit()
+    return balance
+
+
+_METHODS = {
+    "user_balance": _user_balance,
+    "debit": _debit,
+    "credit": _credit,
+    "rollback": _rollback,
+}
+
+
+async def handle(db: AsyncSession, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Processa um callback e retorna a resposta para o IGameWin"""
+    try:
+        handler = _METHODS.get(payload.get("method"))
+        if handler is None:
+            raise SeamlessError(INVALID_METHOD)
+        await _authenticate(db, payload)
+        user_id = await _user_id(db, _text(payload, "user_code"))
+        async with _user_locks.hold(_ALL_USERS if _SINGLE_WRITER else user_id):
+            try:
+                balance = await handler(db, user_id, payload)
+            except wallet.UserNotFound:
+                raise SeamlessError(INVALID_USER)
+            except IntegrityError:
+                # Mesma transação aplicada por outro worker entre a checagem e o INSERT
+                await db.rollback()
+                balance = await _balance(db, user_id)
+    except SeamlessError as e:
+        await db.rollback()
+        if e.code == INVALID_USER:
+            # O id em cache pode ser de um usuário removido antes da notificação chegar
+            _user_ids.delete(str(payload.get("user_code")))
+        return {"status": 0, "msg": e.code}
+    return {"status": 1, "user_balance": round(balance, 2)}
@@ -0,0 +1,123 @@
+"""
+Instrumentação de SQL por requisição.
+
+Registra listeners before/after_cursor_execute nos engines para contar queries
+e somar o tempo de banco da requisição corrente (via contextvar). Statements
+acima de SQL_SLOW_QUERY_MS são sempre logados; os demais são amostrados com
+SQL_LOG_SAMPLE_RATE. Os parâmetros nunca são logados, apenas a quantidade.
+query_budget() conta as queries de um trecho de código e falha se passarem de
+um limite (usado por scripts/check_query_counts.py contra N+1).
+"""
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("sql")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0"))
+MAX_STATEMENT_CHARS = 1000
+
+
+@dataclass
+class SQLStats:
+    """Contadores de SQL da requisição corrente"""
+    query_count: int = 0
+    total_ms: float = 0.0
+
+
+_current_stats: ContextVar[Optional[SQLStats]] = ContextVar("sql_stats", default=None)
+
+
+def start_request() -> SQLStats:
+    """Inicia a contagem para a requisição/tarefa corrente"""
+    stats = SQLStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_stats() -> Optional[SQLStats]:
+    return _current_stats.get()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Um trecho emitiu mais queries do que o orçamento de query_budget()"""
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "") -> Iterator[SQLStats]:
+    """Conta as queries emitidas no bloco (na tarefa corrente) e falha se passarem de max_queries
+
+        with query_budget(2, "GET /bets"):
+            await get_bets(...)
+    """
+    stats = SQLStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+    if stats.query_count > max_queries:
+        raise QueryBudgetExceeded(f"{label or 'bloco'}: {stats.query_count} queries (máximo {max_queries})")
+
+
+def _redacted(parameters) -> str:
+    if not parameters:
+        return "0"
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        # executemany
+        return f"{len(parameters)}x{len(parameters[0])}"
+    return str(len(parameters))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # No contexto da execução, não em conn.info: se o statement falhar o after não roda,
+    # e o início não pode sobrar na conexão do pool e deslocar as medições seguintes
+    if context is not None:
+        context._sql_metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_metrics_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.total_ms += elapsed_ms
+
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    if slow or (LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE):
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            "%s duration_ms=%.1f params=<redacted %s> statement=%s",
+            "slow_query" if slow else "sampled_query",
+            elapsed_ms,
+            _redacted(parameters),
+            " ".join(statement.split())[:MAX_STATEMENT_CHARS],
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registra os listeners no engine síncrono (para AsyncEngine use .sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def server_timing_header(stats: SQLStats) -> str:
+    return f'db;dur={stats.total_ms:.1f};desc="{stats.query_count} queries"'
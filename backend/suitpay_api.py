@@ -7,9 +7,27 @@ import json
 from typing import Optional, Dict, Any
 import os
 
+from http_clients import get_suitpay_http_client
+
+PIX_CREATE_ENDPOINT = "/api/v1/gateway/pix/create"
+PIX_TRANSFER_ENDPOINT = "/api/v1/gateway/pix/transfer"
+
+# Timeouts por endpoint: gerar QR Code é rápido; a transferência espera o processamento do PIX
+ENDPOINT_TIMEOUTS: Dict[str, httpx.Timeout] = {
+    PIX_CREATE_ENDPOINT: httpx.Timeout(15.0, connect=3.0),
+    PIX_TRANSFER_ENDPOINT: httpx.Timeout(45.0, connect=5.0),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
 
 class SuitPayAPI:
-    def __init__(self, client_id: str, client_secret: str, sandbox: bool = True):
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        sandbox: bool = True,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
         """
         Inicializa a API SuitPay
         
@@ -17,6 +35,7 @@ class SuitPayAPI:
             client_id: Client ID (ci) da SuitPay
             client_secret: Client Secret (cs) da SuitPay
             sandbox: Se True, usa ambiente sandbox, senão usa produção
+            http_client: Cliente HTTP a usar (padrão: cliente compartilhado do processo)
         """
         self.client_id = client_id
         self.client_secret = client_secret
@@ -26,18 +45,20 @@ class SuitPayAPI:
             "cs": client_secret,
             "Content-Type": "application/json"
         }
+        self._http_client = http_client
     
     async def _post(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Faz requisição POST para a API SuitPay"""
+        client = self._http_client or get_suitpay_http_client()
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}{endpoint}",
-                    headers=self.headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await client.post(
+                f"{self.base_url}{endpoint}",
+                headers=self.headers,
+                json=payload,
+                timeout=ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+            )
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPStatusError as e:
             print(f"Erro HTTP SuitPay {endpoint}: {e.response.status_code} - {e.response.text}")
             return None
@@ -78,7 +99,7 @@ class SuitPayAPI:
         
         # Endpoint correto conforme documentação SuitPay
         # POST /api/v1/gateway/pix/create
-        return await self._post("/api/v1/gateway/pix/create", payload)
+        return await self._post(PIX_CREATE_ENDPOINT, payload)
     
     async def transfer_pix(
         self,
@@ -119,7 +140,7 @@ class SuitPayAPI:
         
         # Endpoint correto conforme documentação SuitPay
         # POST /api/v1/gateway/pix/transfer
-        return await self._post("/api/v1/gateway/pix/transfer", payload)
+        return await self._post(PIX_TRANSFER_ENDPOINT, payload)
     
     @staticmethod
     def validate_webhook_hash(data: Dict[str, Any], client_secret: str) -> bool:
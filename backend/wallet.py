@@ -0,0 +1,163 @@
+"""
+Carteira dos jogadores.
+
+Todo movimento de saldo passa por aqui: um único UPDATE atômico em users.balance
+(o débito só acontece se houver saldo, no próprio WHERE) seguido de um
+lançamento append-only em ledger_entries com o saldo resultante. Nada é lido e
+regravado em Python, então webhooks, saques e ajustes simultâneos não perdem
+atualizações e não precisam de locks no usuário.
+
+As funções não fazem commit: o lançamento entra na transação de quem chama,
+junto com a mudança de status do depósito/saque correspondente.
+"""
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import LedgerEntry, LedgerEntryType, User
+
+# Tentativas de set_balance quando o saldo muda entre a leitura e o UPDATE
+SET_BALANCE_ATTEMPTS = 5
+
+
+class WalletError(Exception):
+    pass
+
+
+class UserNotFound(WalletError):
+    pass
+
+
+class InsufficientFunds(WalletError):
+    pass
+
+
+async def _already_applied(db: AsyncSession, idempotency_key: Optional[str]) -> bool:
+    if not idempotency_key:
+        return False
+    return await db.scalar(
+        select(LedgerEntry.id).where(LedgerEntry.idempotency_key == idempotency_key)
+    ) is not None
+
+
+async def has_entry(
+    db: AsyncSession, user_id: int, entry_type: LedgerEntryType, reference_type: str, reference_id: int
+) -> bool:
+    """Se já existe um lançamento de entry_type para a referência (com ou sem idempotency_key)"""
+    return await db.scalar(
+        select(LedgerEntry.id).where(
+            LedgerEntry.user_id == user_id,
+            LedgerEntry.type == entry_type,
+            LedgerEntry.reference_type == reference_type,
+            LedgerEntry.reference_id == reference_id,
+        ).limit(1)
+    ) is not None
+
+
+async def _apply(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    entry_type: LedgerEntryType,
+    reference_type: Optional[str],
+    reference_id: Optional[int],
+    description: Optional[str],
+    idempotency_key: Optional[str],
+) -> Optional[float]:
+    if await _already_applied(db, idempotency_key):
+        return None
+
+    stmt = update(User).where(User.id == user_id)
+    if amount < 0:
+        stmt = stmt.where(User.balance >= -amount)
+    balance_after = await db.scalar(
+        stmt.values(balance=User.balance + amount)
+        .returning(User.balance)
+        .execution_options(synchronize_session="fetch")
+    )
+    if balance_after is None:
+        if await db.get(User, user_id) is None:
+            raise UserNotFound(f"Usuário {user_id} não encontrado")
+        raise InsufficientFunds("Saldo insuficiente")
+
+    db.add(LedgerEntry(
+        user_id=user_id,
+        type=entry_type,
+        amount=amount,
+        balance_after=balance_after,
+        reference_type=reference_type,
+        reference_id=reference_id,
+        idempotency_key=idempotency_key,
+        description=description,
+    ))
+    return balance_after
+
+
+async def credit(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    entry_type: LedgerEntryType,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[int] = None,
+    description: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Optional[float]:
+    """Credita amount (> 0). Retorna o novo saldo, ou None se idempotency_key já foi aplicada."""
+    if amount <= 0:
+        raise WalletError("O valor deve ser maior que zero")
+    return await _apply(db, user_id, amount, entry_type, reference_type, reference_id, description, idempotency_key)
+
+
+async def debit(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    entry_type: LedgerEntryType,
+    reference_type: Optional[str] = None,
+    reference_id: Optional[int] = None,
+    description: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Optional[float]:
+    """Debita amount (> 0) se houver saldo (InsufficientFunds caso contrário)"""
+    if amount <= 0:
+        raise WalletError("O valor deve ser maior que zero")
+    return await _apply(db, user_id, -amount, entry_type, reference_type, reference_id, description, idempotency_key)
+
+
+async def set_balance(
+    db: AsyncSession,
+    user_id: int,
+    balance: float,
+    description: Optional[str] = None,
+    reference_type: Optional[str] = "admin",
+    reference_id: Optional[int] = None,
+) -> float:
+    """Define o saldo (ajuste do admin), registrando a diferença como ADJUSTMENT"""
+    for _ in range(SET_BALANCE_ATTEMPTS):
+        current = await db.scalar(select(User.balance).where(User.id == user_id))
+        if current is None:
+            raise UserNotFound(f"Usuário {user_id} não encontrado")
+        if current == balance:
+            return balance
+        # Compare-and-set: só aplica se ninguém mexeu no saldo desde a leitura
+        updated = await db.scalar(
+            update(User)
+            .where(User.id == user_id, User.balance == current)
+            .values(balance=balance)
+            .returning(User.id)
+            .execution_options(synchronize_session="fetch")
+        )
+        if updated is not None:
+            db.add(LedgerEntry(
+                user_id=user_id,
+                type=LedgerEntryType.ADJUSTMENT,
+                amount=balance - current,
+                balance_after=balance,
+                reference_type=reference_type,
+                reference_id=reference_id,
+                description=description,
+            ))
+            return balance
+    raise WalletError("Saldo alterado concorrentemente; tente novamente")
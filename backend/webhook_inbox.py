@@ -0,0 +1,165 @@
+"""
+Inbox durável de webhooks.
+
+As rotas de webhook apenas validam e gravam o payload bruto (uma inserção, com
+dedupe_key única) e respondem 200. Um pool de workers em background reivindica
+as linhas pendentes (FOR UPDATE SKIP LOCKED no Postgres), aplica o handler
+registrado para a origem e marca a linha como concluída na mesma transação.
+Falhas são re-tentadas com backoff exponencial; após WEBHOOK_MAX_ATTEMPTS a
+linha vai para o estado "dead" e pode ser reprocessada pelo admin.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal, async_engine
+from models import WebhookInbox, WebhookStatus
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "10"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "2"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))
+# Linhas em "processing" há mais que isso (worker caiu) voltam a ser reivindicáveis
+WEBHOOK_LOCK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_LOCK_TIMEOUT_SECONDS", "300"))
+
+Handler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[None]]
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff exponencial: base, 2*base, 4*base, ... limitado a WEBHOOK_RETRY_MAX_SECONDS"""
+    return min(WEBHOOK_RETRY_MAX_SECONDS, WEBHOOK_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+
+
+class WebhookInboxWorkers:
+    """Recebe webhooks no inbox e os processa em background"""
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, batch_size: int = WEBHOOK_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+
+    def register(self, source: str, handler: Handler) -> None:
+        self._handlers[source] = handler
+
+    async def enqueue(self, db: AsyncSession, source: str, dedupe_key: str, payload: Dict[str, Any]) -> bool:
+        """Grava o webhook; retorna False se a mesma dedupe_key já foi recebida"""
+        db.add(WebhookInbox(
+            source=source,
+            dedupe_key=dedupe_key[:255],
+            payload=json.dumps(payload),
+            status=WebhookStatus.PENDING,
+            next_attempt_at=datetime.utcnow(),
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return False
+        if self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def _claim(self) -> List[int]:
+        now = datetime.utcnow()
+        claimable = (
+            select(WebhookInbox.id)
+            .where(or_(
+                (WebhookInbox.status == WebhookStatus.PENDING) & (WebhookInbox.next_attempt_at <= now),
+                (WebhookInbox.status == WebhookStatus.PROCESSING)
+                & (WebhookInbox.locked_at < now - timedelta(seconds=WEBHOOK_LOCK_TIMEOUT_SECONDS)),
+            ))
+            .order_by(WebhookInbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as db:
+            ids = (await db.scalars(
+                update(WebhookInbox)
+                .where(WebhookInbox.id.in_(claimable))
+                .values(status=WebhookStatus.PROCESSING, locked_at=now)
+                .returning(WebhookInbox.id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        return sorted(ids)
+
+    async def _process(self, item_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            item = await db.get(WebhookInbox, item_id)
+            if item is None or item.status != WebhookStatus.PROCESSING:
+                return
+            handler = self._handlers.get(item.source)
+            try:
+                if handler is None:
+                    raise RuntimeError(f"Nenhum handler registrado para '{item.source}'")
+                await handler(db, json.loads(item.payload))
+                # O efeito do webhook e a conclusão da linha são gravados juntos
+                item.status = WebhookStatus.DONE
+                item.processed_at = datetime.utcnow()
+                item.locked_at = None
+                item.last_error = None
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                item = await db.get(WebhookInbox, item_id)
+                item.attempts += 1
+                item.last_error = str(e)[:2000]
+                item.locked_at = None
+                if item.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                    item.status = WebhookStatus.DEAD
+                    print(f"Webhook {item_id} ({item.source}) movido para dead-letter: {e}")
+                else:
+                    item.status = WebhookStatus.PENDING
+                    item.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(item.attempts))
+                await db.commit()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                ids = await self._claim()
+                for item_id in ids:
+                    await self._process(item_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Erro no worker de webhooks: {e}")
+                ids = []
+            if ids:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), WEBHOOK_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._wake = asyncio.Event()
+        # SQLite tem um único escritor: mais workers só disputariam o lock do arquivo
+        count = 1 if async_engine.dialect.name == "sqlite" else self.workers
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(count)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._wake = None
+
+
+webhook_inbox = WebhookInboxWorkers()
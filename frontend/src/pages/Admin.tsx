@@ -450,6 +450,8 @@ function UsersTab({ token }: { token: string }) {
   const [error, setError] = useState('');
   const [addBalanceUser, setAddBalanceUser] = useState<{ id: number; username: string } | null>(null);
   const [addAmount, setAddAmount] = useState('');
+  // Mesma chave nas re-tentativas do mesmo lançamento: o backend aplica uma vez só
+  const [addBalanceKey, setAddBalanceKey] = useState('');
   const [addBalanceLoading, setAddBalanceLoading] = useState(false);
   const [addBalanceError, setAddBalanceError] = useState('');
 
@@ -482,7 +484,8 @@ function UsersTab({ token }: { token: string }) {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          'Idempotency-Key': addBalanceKey
         },
         body: JSON.stringify({ amount })
       });
@@ -534,7 +537,7 @@ function UsersTab({ token }: { token: string }) {
                   <td className="px-3 py-2">{u.is_active ? 'Ativo' : 'Inativo'}</td>
                   <td className="px-3 py-2">
                     <button
-                      onClick={() => setAddBalanceUser({ id: u.id, username: u.username })}
+                      onClick={() => { setAddBalanceUser({ id: u.id, username: u.username }); setAddBalanceKey(makeId()); }}
                       className="flex items-center gap-1 px-2 py-1 bg-emerald-600 hover:bg-emerald-500 rounded text-xs"
                     >
                       <Plus size={14} /> Adicionar Saldo
@@ -557,7 +560,7 @@ function UsersTab({ token }: { token: string }) {
               type="text"
               placeholder="Valor (ex: 100 ou 50,00)"
               value={addAmount}
-              onChange={e => { setAddAmount(e.target.value); setAddBalanceError(''); }}
+              onChange={e => { setAddAmount(e.target.value); setAddBalanceError(''); setAddBalanceKey(makeId()); }}
               className="w-full px-3 py-2 bg-gray-700 border border-gray-600 rounded mb-2 focus:outline-none focus:ring-1 focus:ring-emerald-500"
             />
             {addBalanceError && <p className="text-red-400 text-sm mb-2">{addBalanceError}</p>}